@@ -0,0 +1,304 @@
+from lib.benchmark import (
+    BenchmarkResultsT,
+    compare_results,
+    get_missing,
+    get_regressions,
+    run_benchmark,
+)
+from lib.components.synthesiser import Synthesiser
+from lib.constants import DEFAULT_SAMPLE_RATE
+from lib.cqt.base import BaseCQT
+from lib.cqt.cqt_librosa import LibrosaFullCQT, LibrosaSliceCQT, get_librosa_params
+from lib.cqt.cqt_nsgt import CQTNSGT, CQTNSGTSlicq, get_nsgt_params
+from lib.dtw.classical import ClassicalDTW
+from lib.dtw.multiscale import MultiscaleDTW
+from lib.dtw.oltw import OLTW
+from lib.dtw.oltw_numba import OLTWNumba
+from lib.dtw.shared import batch_cost, cost
+from lib.eprint import eprint
+from lib.midi import process_midi_to_note_info
+from lib.mputils import DequeQueue, consume_queue, write_list_to_queue
+from consts import BENCHMARK_RESULTS_PATH, BWV846_PATH
+from tap import Tap  # type: ignore
+from typing import Any, Callable, Dict, List, Optional
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import numpy as np
+
+# A benchmark sets up its inputs and returns a run, which returns the units of work done
+BenchmarkT = Callable[[], Callable[[], int]]
+
+FIXTURE_MIDI_PATH = os.path.join(BWV846_PATH, "prelude", "prelude.r.mid")
+HOP_LEN = 2048
+FRAME_LEN = 2048 * 4
+# offline nsgt needs a transition length that is a multiple of 100
+NSGT_OFFLINE_HOP_LEN = 2000
+AUDIO_DURATION = 10.0  # s
+
+
+class BenchmarkArguments(Tap):
+    # fmt: off
+    only: List[str] = []  # Only run the benchmarks whose names start with any of these.
+    repeat: int = 5  # Number of timed runs of each benchmark, after one warm-up run.
+    output: Optional[str] = None  # Path to write the JSON results to. Defaults to a timestamped file in `benchmark_results`.
+    baseline: Optional[str] = None  # Path to JSON results of a previous run to compare against. Exits with 1 if any benchmark regressed, failed, or is in the baseline but was not run.
+    threshold: float = 0.1  # Slowdown of the time per unit of work (e.g. 0.1 for 10%) beyond which a benchmark regressed.
+    list: bool = False  # Only list the benchmarks.
+    # fmt: on
+
+
+def _features(n: int, n_bins: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.random((n, n_bins))
+
+
+def _audio(duration: float, sample_rate: int = DEFAULT_SAMPLE_RATE) -> np.ndarray:
+    """
+    A few seconds of notes of a C major arpeggio with some noise.
+    """
+    rng = np.random.default_rng(42)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    midi_notes = np.array([60, 64, 67, 72])
+    freqs = 440.0 * 2 ** ((midi_notes[(t * 4).astype(int) % 4] - 69) / 12)
+    audio = np.sin(2 * np.pi * freqs * t) + 0.05 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+
+def _cost() -> Callable[[], int]:
+    a, b = _features(2, 61, 0)
+    n = 10000
+
+    def run() -> int:
+        for _ in range(n):
+            cost(a, b)
+        return n
+
+    return run
+
+
+def _batch_cost(window: int) -> BenchmarkT:
+    def setup() -> Callable[[], int]:
+        a = _features(1, 61, 0)[0]
+        B = _features(window, 61, 1)
+        n = 1000
+
+        def run() -> int:
+            for _ in range(n):
+                batch_cost(a, B)
+            return n
+
+        return run
+
+    return setup
+
+
+def _oltw(search_window: int, oltw_cls: Any = OLTW) -> BenchmarkT:
+    def setup() -> Callable[[], int]:
+        # performance is the score played a bit slower, with noise
+        S = _features(2000, 61, 0)
+        P = S[(np.arange(len(S)) * 0.75).astype(int)] + 0.05 * _features(len(S), 61, 1)
+        P_list = list(P)
+
+        def run() -> int:
+            P_queue = DequeQueue()
+            write_list_to_queue(P_list, P_queue)
+            output_queue = DequeQueue()
+            oltw_cls(P_queue, S, output_queue, 3, search_window).dtw()
+            return len(consume_queue(output_queue))  # type: ignore
+
+        return run
+
+    return setup
+
+
+def _classical(n: int) -> BenchmarkT:
+    def setup() -> Callable[[], int]:
+        P = _features(n, 61, 0)
+        S = _features(n, 61, 1)
+
+        def run() -> int:
+            ClassicalDTW(P, S).dtw()
+            return n * n  # cells
+
+        return run
+
+    return setup
+
+
+def _multiscale(n: int, radius: int = 10) -> BenchmarkT:
+    def setup() -> Callable[[], int]:
+        P = _features(n, 61, 0)
+        S = _features(n, 61, 1)
+
+        def run() -> int:
+            MultiscaleDTW(P, S, radius=radius).dtw()
+            return n  # frames
+
+        return run
+
+    return setup
+
+
+def _cqt_offline(cqt: str) -> BenchmarkT:
+    def setup() -> Callable[[], int]:
+        audio = _audio(AUDIO_DURATION)
+        extractor: BaseCQT
+        if cqt == "nsgt":
+            fmin, fmax = get_nsgt_params()
+            extractor = CQTNSGT(FRAME_LEN, NSGT_OFFLINE_HOP_LEN, fmin, fmax)
+        else:
+            fmin, n_bins = get_librosa_params()
+            extractor = LibrosaFullCQT(cqt, FRAME_LEN, HOP_LEN, fmin, n_bins)  # type: ignore
+
+        def run() -> int:
+            return len(extractor.extract(audio))  # frames
+
+        return run
+
+    return setup
+
+
+def _cqt_online(cqt: str) -> BenchmarkT:
+    def setup() -> Callable[[], int]:
+        audio = _audio(AUDIO_DURATION / 2)
+        slices = [
+            audio[i : i + FRAME_LEN]
+            for i in range(0, len(audio) - FRAME_LEN + 1, HOP_LEN)
+        ]
+        extractor: BaseCQT
+        if cqt == "nsgt":
+            fmin, fmax = get_nsgt_params()
+            extractor = CQTNSGTSlicq(FRAME_LEN, HOP_LEN, fmin, fmax)
+        else:
+            fmin, n_bins = get_librosa_params()
+            extractor = LibrosaSliceCQT(cqt, HOP_LEN, fmin, n_bins)  # type: ignore
+
+        def run() -> int:
+            for s in slices:
+                extractor.extract(s)
+            return len(slices)
+
+        return run
+
+    return setup
+
+
+def _midi_parse() -> Callable[[], int]:
+    def run() -> int:
+        return len(process_midi_to_note_info(FIXTURE_MIDI_PATH))  # notes
+
+    return run
+
+
+def _synthesis() -> Callable[[], int]:
+    synthesiser = Synthesiser(FIXTURE_MIDI_PATH, DEFAULT_SAMPLE_RATE)
+
+    def run() -> int:
+        path = synthesiser.synthesise()
+        shutil.rmtree(os.path.dirname(path))
+        return 1
+
+    return run
+
+
+benchmarks: Dict[str, BenchmarkT] = {
+    "cost": _cost,
+    **{f"batch_cost/{w}": _batch_cost(w) for w in [100, 500]},
+    **{f"oltw/search_window={c}": _oltw(c) for c in [100, 250, 500]},
+    **{f"oltw_numba/search_window={c}": _oltw(c, OLTWNumba) for c in [100, 500, 2000]},
+    **{f"classical/n={n}": _classical(n) for n in [250, 500, 1000]},
+    **{f"multiscale/n={n}": _multiscale(n) for n in [1000, 4000]},
+    **{
+        f"cqt/offline/{cqt}": _cqt_offline(cqt)
+        for cqt in ["nsgt", "librosa", "librosa_pseudo", "librosa_hybrid"]
+    },
+    **{
+        f"cqt/online/{cqt}": _cqt_online(cqt)
+        for cqt in ["nsgt", "librosa", "librosa_pseudo", "librosa_hybrid"]
+    },
+    "midi/parse": _midi_parse,
+    "midi/synthesise": _synthesis,
+}
+
+
+def _is_selected(name: str, args: BenchmarkArguments) -> bool:
+    return len(args.only) == 0 or any(name.startswith(prefix) for prefix in args.only)
+
+
+def main(args: BenchmarkArguments) -> int:
+    names = [name for name in benchmarks.keys() if _is_selected(name, args)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    results: BenchmarkResultsT = {}
+    errors: Dict[str, str] = {}
+    for name in names:
+        try:
+            run = benchmarks[name]()
+            result = run_benchmark(run, args.repeat)
+        except Exception as e:
+            # e.g. FluidSynth not installed
+            eprint(f"{name}: FAILED: {e!r}")
+            errors[name] = repr(e)
+            continue
+        results[name] = result
+        print(
+            f"{name}: median {result['median_s'] * 1000:.3f} ms, {result['units_per_s']:.1f} units/s"
+        )
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(BENCHMARK_RESULTS_PATH, exist_ok=True)
+        output_path = os.path.join(
+            BENCHMARK_RESULTS_PATH, f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+        )
+    with open(output_path, "w+") as f:
+        output = {
+            "meta": {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.platform(),
+            },
+            "results": results,
+            "errors": errors,
+        }
+        f.write(json.dumps(output, indent=4))
+    print(f"Results written to {output_path}")
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        baseline: BenchmarkResultsT = {
+            name: result
+            for name, result in json.loads(f.read())["results"].items()
+            if _is_selected(name, args)
+        }
+    ratios = compare_results(baseline, results)
+    print(f"Compared to {args.baseline} (time per unit, above 1 is slower):")
+    for name, ratio in ratios:
+        print(f"{name}: {ratio:.3f}")
+    failed = False
+    regressions = get_regressions(ratios, args.threshold)
+    if len(regressions) > 0:
+        eprint(
+            f"Regressed by more than {args.threshold:.0%}: {', '.join(name for name, _ in regressions)}"
+        )
+        failed = True
+    missing = get_missing(baseline, results)
+    if len(missing) > 0:
+        eprint(f"Missing from the results: {', '.join(missing)}")
+        failed = True
+    if len(errors) > 0:
+        eprint(f"Failed: {', '.join(errors.keys())}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(BenchmarkArguments().parse_args()))
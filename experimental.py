@@ -1,152 +1,77 @@
-from repro import _get_and_write_align_results, _write_overall_results
-from lib.runner import Runner
-from lib.args import Arguments
-from lib.sharedtypes import OverallResultsT
+from repro import AlignJob, _get_bach10_piece_paths, _run_align_jobs
 from consts import BACH10_PATH, EXPERIMENTAL_RESULTS_PATH
 from lib.eprint import eprint
+from lib.jobs import get_max_jobs, parse_jobs_arg
+from typing import Any, Callable, Dict, List
 import sys
 import os
-import re
 
 
-def w_a_search():
-    experimental_arg = "w_a_search"
-    w_a_range = [0.2, 0.4, 0.5, 0.6, 0.8, 1.0, 1.2, 1.4, 1.6, 1.8, 2.0]
-    bach10_piece_paths = [
-        f.path
-        for f in os.scandir(BACH10_PATH)
-        if f.is_dir() and bool(re.search(r"^[0-9]{2}-\w+$", os.path.basename(f.path)))
-    ]
-    for w_a in w_a_range:
-        overall_results: OverallResultsT = {}
-        output_base_dir = os.path.join(
-            EXPERIMENTAL_RESULTS_PATH, experimental_arg, str(w_a)
-        )
-        os.makedirs(output_base_dir, exist_ok=True)
-        for piece_path in bach10_piece_paths:
-            piece = os.path.basename(piece_path)
-            print("=============================================")
-            print(f"Starting to follow: {piece} with w_a: {w_a}")
-            print("=============================================")
-            score_midi_path = os.path.join(piece_path, f"{piece}.mid")
-            perf_wave_path = os.path.join(piece_path, f"{piece}.wav")
-
-            output_align_dir = os.path.join(output_base_dir, piece)
-            os.makedirs(output_align_dir, exist_ok=True)
-            output_align_path = os.path.join(output_align_dir, "align.txt")
-
-            args = Arguments().parse_args(
-                [
-                    "--score_midi_path",
-                    score_midi_path,
-                    "--cqt",
-                    "nsgt",
-                    "--perf_wave_path",
-                    perf_wave_path,
-                    "--backend_output",
-                    output_align_path,
-                    "--backend_backtrack",
-                    "--w_a",
-                    str(w_a),
-                ]
-            )
-
-            runner = Runner(args)
-            runner.start()
-
-            ref_align_path = os.path.join(BACH10_PATH, piece, f"{piece}.txt")
-            align_results_path = os.path.join(output_align_dir, "result.json")
-            align_results = _get_and_write_align_results(
-                output_align_path, ref_align_path, align_results_path
-            )
-
-            for thres, align_result in align_results.items():
-                if thres not in overall_results:
-                    overall_results[thres] = []
-                overall_results[thres].append(align_result)
-
-            print("=============================================")
-            print(f"Finished following: {piece} with w_a: {w_a}")
-            print("=============================================")
-        _write_overall_results(overall_results, output_base_dir)
-
-
-def backend_backtrack_search():
-    experimental_arg = "backend_backtrack_search"
-    bach10_piece_paths = [
-        f.path
-        for f in os.scandir(BACH10_PATH)
-        if f.is_dir() and bool(re.search(r"^[0-9]{2}-\w+$", os.path.basename(f.path)))
-    ]
-    for backend_backtrack in [True, False]:
-        overall_results: OverallResultsT = {}
+def _get_follow_jobs(
+    experimental_arg: str,
+    param: str,
+    values: List[Any],
+    get_args: Callable[[Any], List[str]],
+) -> List[AlignJob]:
+    """
+    Jobs following every Bach10 piece with every value of `param`, with the extra
+    Runner arguments given by `get_args(value)`.
+    """
+    bach10_piece_paths = _get_bach10_piece_paths()
+    align_jobs: List[AlignJob] = []
+    for value in values:
         output_base_dir = os.path.join(
-            EXPERIMENTAL_RESULTS_PATH, experimental_arg, str(backend_backtrack)
+            EXPERIMENTAL_RESULTS_PATH, experimental_arg, str(value)
         )
-        os.makedirs(output_base_dir, exist_ok=True)
         for piece_path in bach10_piece_paths:
             piece = os.path.basename(piece_path)
-            print(
-                "========================================================================"
-            )
-            print(
-                f"Starting to follow: {piece} with backend_backtrack: {backend_backtrack}"
-            )
-            print(
-                "========================================================================"
-            )
             score_midi_path = os.path.join(piece_path, f"{piece}.mid")
             perf_wave_path = os.path.join(piece_path, f"{piece}.wav")
-
-            output_align_dir = os.path.join(output_base_dir, piece)
-            os.makedirs(output_align_dir, exist_ok=True)
-            output_align_path = os.path.join(output_align_dir, "align.txt")
-
-            args_str = [
+            args = [
                 "--score_midi_path",
                 score_midi_path,
                 "--cqt",
                 "nsgt",
                 "--perf_wave_path",
                 perf_wave_path,
-                "--backend_output",
-                output_align_path,
-                "--w_a",
-                "0.5",
-            ]
-            if backend_backtrack:
-                args_str += ["--backend_backtrack"]
-
-            args = Arguments().parse_args(args_str)
-
-            runner = Runner(args)
-            runner.start()
-
+            ] + get_args(value)
             ref_align_path = os.path.join(BACH10_PATH, piece, f"{piece}.txt")
-            align_results_path = os.path.join(output_align_dir, "result.json")
-            align_results = _get_and_write_align_results(
-                output_align_path, ref_align_path, align_results_path
+            align_jobs.append(
+                AlignJob(
+                    "follow",
+                    piece,
+                    f"{param}: {value}",
+                    args,
+                    ref_align_path,
+                    output_base_dir,
+                )
             )
+    return align_jobs
 
-            for thres, align_result in align_results.items():
-                if thres not in overall_results:
-                    overall_results[thres] = []
-                overall_results[thres].append(align_result)
-
-            print(
-                "========================================================================"
-            )
-            print(
-                f"Finished following: {piece} with backend_backtrack: {backend_backtrack}"
-            )
-            print(
-                "========================================================================"
-            )
-        _write_overall_results(overall_results, output_base_dir)
 
-
-def search_window_search():
-    experimental_arg = "search_window_search"
+def w_a_search(jobs: int = 1):
+    w_a_range = [0.2, 0.4, 0.5, 0.6, 0.8, 1.0, 1.2, 1.4, 1.6, 1.8, 2.0]
+    align_jobs = _get_follow_jobs(
+        "w_a_search",
+        "w_a",
+        w_a_range,
+        lambda w_a: ["--backend_backtrack", "--w_a", str(w_a)],
+    )
+    _run_align_jobs(align_jobs, jobs, reuse_features=True)
+
+
+def backend_backtrack_search(jobs: int = 1):
+    align_jobs = _get_follow_jobs(
+        "backend_backtrack_search",
+        "backend_backtrack",
+        [True, False],
+        lambda backend_backtrack: ["--w_a", "0.5"]
+        + (["--backend_backtrack"] if backend_backtrack else []),
+    )
+    _run_align_jobs(align_jobs, jobs, reuse_features=True)
+
+
+def search_window_search(jobs: int = 1):
     search_window_range = [
         50,
         100,
@@ -169,197 +94,57 @@ def search_window_search():
         950,
         1000,
     ]
-    bach10_piece_paths = [
-        f.path
-        for f in os.scandir(BACH10_PATH)
-        if f.is_dir() and bool(re.search(r"^[0-9]{2}-\w+$", os.path.basename(f.path)))
-    ]
-    for search_window in search_window_range:
-        overall_results: OverallResultsT = {}
-        output_base_dir = os.path.join(
-            EXPERIMENTAL_RESULTS_PATH, experimental_arg, str(search_window)
-        )
-        os.makedirs(output_base_dir, exist_ok=True)
-        for piece_path in bach10_piece_paths:
-            piece = os.path.basename(piece_path)
-            print("=============================================")
-            print(f"Starting to follow: {piece} with search_window: {search_window}")
-            print("=============================================")
-            score_midi_path = os.path.join(piece_path, f"{piece}.mid")
-            perf_wave_path = os.path.join(piece_path, f"{piece}.wav")
-
-            output_align_dir = os.path.join(output_base_dir, piece)
-            os.makedirs(output_align_dir, exist_ok=True)
-            output_align_path = os.path.join(output_align_dir, "align.txt")
-
-            args = Arguments().parse_args(
-                [
-                    "--score_midi_path",
-                    score_midi_path,
-                    "--cqt",
-                    "nsgt",
-                    "--perf_wave_path",
-                    perf_wave_path,
-                    "--backend_output",
-                    output_align_path,
-                    "--backend_backtrack",
-                    "--w_a",
-                    "0.5",
-                    "--search_window",
-                    str(search_window),
-                ]
-            )
-
-            runner = Runner(args)
-            runner.start()
-
-            ref_align_path = os.path.join(BACH10_PATH, piece, f"{piece}.txt")
-            align_results_path = os.path.join(output_align_dir, "result.json")
-            align_results = _get_and_write_align_results(
-                output_align_path, ref_align_path, align_results_path
-            )
-
-            for thres, align_result in align_results.items():
-                if thres not in overall_results:
-                    overall_results[thres] = []
-                overall_results[thres].append(align_result)
-
-            print("=============================================")
-            print(f"Finished following: {piece} with search_window: {search_window}")
-            print("=============================================")
-        _write_overall_results(overall_results, output_base_dir)
-
-
-def max_run_count_search():
-    experimental_arg = "max_run_count_search"
+    align_jobs = _get_follow_jobs(
+        "search_window_search",
+        "search_window",
+        search_window_range,
+        lambda search_window: [
+            "--backend_backtrack",
+            "--w_a",
+            "0.5",
+            "--search_window",
+            str(search_window),
+        ],
+    )
+    _run_align_jobs(align_jobs, jobs, reuse_features=True)
+
+
+def max_run_count_search(jobs: int = 1):
     max_run_count_range = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-    bach10_piece_paths = [
-        f.path
-        for f in os.scandir(BACH10_PATH)
-        if f.is_dir() and bool(re.search(r"^[0-9]{2}-\w+$", os.path.basename(f.path)))
-    ]
-    for max_run_count in max_run_count_range:
-        overall_results: OverallResultsT = {}
-        output_base_dir = os.path.join(
-            EXPERIMENTAL_RESULTS_PATH, experimental_arg, str(max_run_count)
-        )
-        os.makedirs(output_base_dir, exist_ok=True)
-        for piece_path in bach10_piece_paths:
-            piece = os.path.basename(piece_path)
-            print("=============================================")
-            print(f"Starting to follow: {piece} with max_run_count: {max_run_count}")
-            print("=============================================")
-            score_midi_path = os.path.join(piece_path, f"{piece}.mid")
-            perf_wave_path = os.path.join(piece_path, f"{piece}.wav")
-
-            output_align_dir = os.path.join(output_base_dir, piece)
-            os.makedirs(output_align_dir, exist_ok=True)
-            output_align_path = os.path.join(output_align_dir, "align.txt")
-
-            args = Arguments().parse_args(
-                [
-                    "--score_midi_path",
-                    score_midi_path,
-                    "--cqt",
-                    "nsgt",
-                    "--perf_wave_path",
-                    perf_wave_path,
-                    "--backend_output",
-                    output_align_path,
-                    "--backend_backtrack",
-                    "--w_a",
-                    "0.5",
-                    "--search_window",
-                    "500",
-                    "--max_run_count",
-                    str(max_run_count),
-                ]
-            )
-
-            runner = Runner(args)
-            runner.start()
-
-            ref_align_path = os.path.join(BACH10_PATH, piece, f"{piece}.txt")
-            align_results_path = os.path.join(output_align_dir, "result.json")
-            align_results = _get_and_write_align_results(
-                output_align_path, ref_align_path, align_results_path
-            )
-
-            for thres, align_result in align_results.items():
-                if thres not in overall_results:
-                    overall_results[thres] = []
-                overall_results[thres].append(align_result)
-
-            print("=============================================")
-            print(f"Finished following: {piece} with max_run_count: {max_run_count}")
-            print("=============================================")
-        _write_overall_results(overall_results, output_base_dir)
-
-
-def hop_len_search():
-    experimental_arg = "hop_len_search"
+    align_jobs = _get_follow_jobs(
+        "max_run_count_search",
+        "max_run_count",
+        max_run_count_range,
+        lambda max_run_count: [
+            "--backend_backtrack",
+            "--w_a",
+            "0.5",
+            "--search_window",
+            "500",
+            "--max_run_count",
+            str(max_run_count),
+        ],
+    )
+    _run_align_jobs(align_jobs, jobs, reuse_features=True)
+
+
+def hop_len_search(jobs: int = 1):
     hop_len_range = [512, 1024, 2048, 4096, 8192, 16384]
-    bach10_piece_paths = [
-        f.path
-        for f in os.scandir(BACH10_PATH)
-        if f.is_dir() and bool(re.search(r"^[0-9]{2}-\w+$", os.path.basename(f.path)))
-    ]
-    for hop_len in hop_len_range:
-        overall_results: OverallResultsT = {}
-        output_base_dir = os.path.join(
-            EXPERIMENTAL_RESULTS_PATH, experimental_arg, str(hop_len)
-        )
-        os.makedirs(output_base_dir, exist_ok=True)
-        for piece_path in bach10_piece_paths:
-            piece = os.path.basename(piece_path)
-            print("=============================================")
-            print(f"Starting to follow: {piece} with hop_len: {hop_len}")
-            print("=============================================")
-            score_midi_path = os.path.join(piece_path, f"{piece}.mid")
-            perf_wave_path = os.path.join(piece_path, f"{piece}.wav")
-
-            output_align_dir = os.path.join(output_base_dir, piece)
-            os.makedirs(output_align_dir, exist_ok=True)
-            output_align_path = os.path.join(output_align_dir, "align.txt")
-
-            args = Arguments().parse_args(
-                [
-                    "--score_midi_path",
-                    score_midi_path,
-                    "--cqt",
-                    "nsgt",
-                    "--perf_wave_path",
-                    perf_wave_path,
-                    "--backend_output",
-                    output_align_path,
-                    "--backend_backtrack",
-                    "--w_a",
-                    "0.5",
-                    "--search_window",
-                    "500",
-                    "--hop_len",
-                    str(hop_len),
-                ]
-            )
-
-            runner = Runner(args)
-            runner.start()
-
-            ref_align_path = os.path.join(BACH10_PATH, piece, f"{piece}.txt")
-            align_results_path = os.path.join(output_align_dir, "result.json")
-            align_results = _get_and_write_align_results(
-                output_align_path, ref_align_path, align_results_path
-            )
-
-            for thres, align_result in align_results.items():
-                if thres not in overall_results:
-                    overall_results[thres] = []
-                overall_results[thres].append(align_result)
-
-            print("=============================================")
-            print(f"Finished following: {piece} with hop_len: {hop_len}")
-            print("=============================================")
-        _write_overall_results(overall_results, output_base_dir)
+    align_jobs = _get_follow_jobs(
+        "hop_len_search",
+        "hop_len",
+        hop_len_range,
+        lambda hop_len: [
+            "--backend_backtrack",
+            "--w_a",
+            "0.5",
+            "--search_window",
+            "500",
+            "--hop_len",
+            str(hop_len),
+        ],
+    )
+    _run_align_jobs(align_jobs, jobs, reuse_features=True)
 
 
 """
@@ -433,7 +218,8 @@ def slice_hop_ratio_search():
         _write_overall_results(overall_results, output_base_dir)
 """
 
-func_map = {
+# every function takes the maximum number of jobs to run at once
+func_map: Dict[str, Callable[[int], None]] = {
     "w_a_search": w_a_search,  # 0.5 chosen
     "backend_backtrack_search": backend_backtrack_search,  # no difference
     "search_window_search": search_window_search,  # 500 chosen
@@ -443,14 +229,15 @@ func_map = {
 }
 
 if __name__ == "__main__":
-    experimental_args = sys.argv[1:]
+    experimental_args, jobs = parse_jobs_arg(sys.argv[1:])
+    max_jobs = get_max_jobs(jobs)
     if len(experimental_args) == 0:
         eprint("No experimental arg given--running everything!")
         for name, f in func_map.items():
             print("++++++++++++++++++++++++++++++++++++")
             print(f"Starting: {name}")
             print("++++++++++++++++++++++++++++++++++++")
-            f()
+            f(max_jobs)
             print("++++++++++++++++++++++++++++++++++++")
             print(f"Finished: {name}")
             print("++++++++++++++++++++++++++++++++++++")
@@ -460,7 +247,7 @@ if __name__ == "__main__":
         sys.exit(1)
     experimental_arg = experimental_args[0]
     if experimental_arg in func_map:
-        func_map[experimental_arg]()
+        func_map[experimental_arg](max_jobs)
     else:
         eprint(f"Unknown experimental arg: {experimental_arg}.")
         sys.exit(1)
@@ -1,6 +1,18 @@
 from typing import Optional
-from .constants import DEFAULT_SAMPLE_RATE
-from .sharedtypes import ModeType, DTWType, CQTType, BackendType
+from .constants import (
+    DEFAULT_SAMPLE_RATE,
+    DEFAULT_SCORE_CACHE_DIR,
+    DEFAULT_SCORE_CACHE_MAX_MB,
+)
+from .sharedtypes import (
+    ModeType,
+    DTWType,
+    OLTWEngineType,
+    CQTType,
+    BackendType,
+    PipelineType,
+    TransportType,
+)
 from .utils import quantise_hz_midi
 from tap import Tap  # type: ignore
 from .eprint import eprint
@@ -11,10 +23,15 @@ from os import path
 class Arguments(Tap):
     # fmt: off
     mode: ModeType = "online"  # Mode: `offline` or `online`.
-    dtw: DTWType = "oltw"  # DTW Algo: `classical` or `oltw`. `classical` is only available for the `offline` mode.
+    dtw: DTWType = "oltw"  # DTW Algo: `classical`, `oltw` or `multiscale` (coarse-to-fine `classical`, in linear time and memory). `classical` and `multiscale` are only available for the `offline` mode.
     cqt: CQTType = "nsgt"  # CQT Algo: `nsgt`, `librosa_pseudo`, `librosa_hybrid` or `librosa`.
     max_run_count: int = 3  # `MaxRunCount` for `online` mode with `oltw` DTW.
     search_window: int = 500  # `SearchWindow` for `online` mode with `oltw` DTW.
+    min_search_window: int = 0  # Smallest `SearchWindow` of an adaptive search window for `oltw` DTW, which shrinks while the alignment is confident and grows back up to `search_window` when it is not. Fixed to `search_window` if 0. Only available for the `python` `oltw_engine`.
+    follower_max_lag: float = 0.0  # Time (s) of performance the follower may fall behind, beyond which the features queued for it are averaged into one frame, so that the alignment is coarser but output stays on time. Never if 0. Only available for `online` mode with `simulate_performance`.
+    oltw_engine: OLTWEngineType = "python"  # Implementation of `oltw` DTW: `python` or `numba` (compiled with numba, same output, for large `search_window`s).
+    classical_low_memory: bool = False  # Whether `classical` DTW only keeps checkpoints of the cost matrix and recomputes the rest when recovering the path. Slower, but needed for long recordings.
+    multiscale_radius: int = 10  # Frames by which `multiscale` DTW widens the path of every coarser level to align the next finer one. Larger is slower but closer to `classical` DTW.
     fmin: float = 130.8  # Minimum frequency (Hz) for CQT.
     fmax: float = 4186.0  # Maximum frequency (Hz) for CQT.
 
@@ -23,23 +40,41 @@ class Arguments(Tap):
 
     nsgt_multithreading: bool = False  # Whether to use multithreading for `nsgt` multithreading.
 
+    offline_workers: int = 1  # Number of processes extracting features in parallel in `offline` mode, each from a chunk of frames. Only effectual for `nsgt`, `librosa_pseudo` and `librosa_hybrid` cqt algos, as `librosa` computes the CQT of the whole signal at once.
+
+    transport: TransportType = "queue"  # How audio slices and features are passed between processes: `queue` (pickled through multiprocessing queues) or `shm` (copied through shared memory ring buffers).
+
+    pipeline: PipelineType = "process"  # How the pipeline stages run: `process` (one process per stage) or `thread` (threads of one process connected by deques, `transport` is then ignored).
+
     perf_wave_path: str  # Path to performance WAVE file.
     score_midi_path: Optional[str] = None  # Path to score MIDI.
 
-    score_pickle_path: Optional[str] = None  # Path to pickled score features.
+    score_pickle_path: Optional[str] = None  # Path to score features, as dumped from a previous run with `score_midi_path`. Legacy pickled score features are also accepted.
+
+    no_score_cache: bool = False  # Whether to extract score features from `score_midi_path` every time instead of reusing the cached features from a previous run with the same score and feature arguments.
+    score_cache_dir: str = DEFAULT_SCORE_CACHE_DIR  # Directory of the score feature cache.
+    score_cache_max_mb: float = DEFAULT_SCORE_CACHE_MAX_MB  # Size (MB) beyond which the least recently used score features are evicted from the cache.
 
     backend: BackendType = "alignment"  # Alignment result type: `alignment` or `timestamp`.
 
 
     backend_output = "stdout"  # Where the backend is output to. Either `stdout`, `stderr`, `udp:<HOSTNAME>:<PORT>` for UDP sockets + stderr, or a path to a text file.
 
+    backend_flush_interval: float = 0.0  # Time (s) the backend may buffer output lines for before flushing them. Lines are flushed as soon as they are output if 0.
+
+    backend_udp_batch: int = 1  # Maximum number of lines sent per UDP datagram, separated by newlines. Lines are sent once this many are buffered or when flushed, see `backend_flush_interval`.
+
     backend_backtrack: bool = False  # Whether the backend can "go back in time".
 
     no_backend_compensation: bool = False  # Whether to report timestamps frame_len ahead for compensation due to the nature of the streaming. Only effectual when backend is `timestamp`.
 
     simulate_performance: bool = False  # Whether to stream performance "live" into the system.
 
-    sleep_compensation: float = 0.0005  # When streaming performance, reduce sleep time between streaming slices as sleeping is not entirely precise.
+    virtual_clock: bool = False  # Whether to stream performance as fast as possible instead, and report detection times on a simulated timeline where each slice is released when it would be "live" and takes as long as it did to process. Only effectual in `online` mode with the `alignment` backend.
+
+    trace_output: Optional[str] = None  # Path to write a JSON trace of the run to: latency percentiles of each stage of the pipeline over all frames, queue depths over time, and the load shedding counters if the follower sheds frames. Only available for `online` mode.
+
+    sleep_compensation: float = 0.0005  # When streaming performance, sleep until this long (s) before each slice is due and busy-wait for the rest, as sleeping is not entirely precise.
 
     sample_rate: int = DEFAULT_SAMPLE_RATE  # Sample rate to synthesise score and load performance wave file.
 
@@ -63,6 +98,22 @@ class Arguments(Tap):
         if self.search_window < 0:
             self.__log_and_exit(f"search_window must be positive")
 
+        if self.min_search_window < 0:
+            self.__log_and_exit(f"min_search_window must be positive")
+
+        if self.min_search_window > self.search_window:
+            self.__log_and_exit(
+                f"min_search_window must not be greater than search_window"
+            )
+
+        if self.min_search_window > 0 and self.oltw_engine != "python":
+            self.__log_and_exit(
+                "`min_search_window` is only available for the `python` `oltw_engine`"
+            )
+
+        if self.multiscale_radius < 0:
+            self.__log_and_exit(f"multiscale_radius must be positive")
+
         if self.fmin < 0:
             self.__log_and_exit(f"fmin must be positive")
 
@@ -72,6 +123,9 @@ class Arguments(Tap):
         if self.fmax <= self.fmin:
             self.__log_and_exit(f"fmax > fmin not fulfilled")
 
+        if self.offline_workers < 1:
+            self.__log_and_exit(f"offline_workers must be at least 1")
+
         if self.hop_len < 0:
             self.__log_and_exit(f"hop_len must be positive")
 
@@ -110,11 +164,26 @@ class Arguments(Tap):
                 "Either one of `score_midi_path` or `score_pickle_path` must be set"
             )
 
+        if self.score_cache_max_mb < 0:
+            self.__log_and_exit(f"score_cache_max_mb must be positive")
+
         if self.hop_len % 100 != 0 and self.mode == "offline" and self.cqt == "nsgt":
             self.__log_and_exit(
                 f"hop_len ({self.hop_len}) for offline nsgt must be a multiple of 100"
             )
 
+        if self.transport not in ("queue", "shm"):
+            self.__log_and_exit("transport must be one of `queue` or `shm`")
+
+        if self.pipeline not in ("process", "thread"):
+            self.__log_and_exit("pipeline must be one of `process` or `thread`")
+
+        if self.backend_flush_interval < 0:
+            self.__log_and_exit(f"backend_flush_interval must be positive")
+
+        if self.backend_udp_batch < 1:
+            self.__log_and_exit(f"backend_udp_batch must be at least 1")
+
         if self.backend not in ("alignment", "timestamp"):
             self.__log_and_exit("backend must be one of `alignment` or `timestamp`")
 
@@ -123,6 +192,27 @@ class Arguments(Tap):
                 "`simulate_performance` must be set to True to enable `play_performance_audio`"
             )
 
+        if self.virtual_clock and self.simulate_performance:
+            self.__log_and_exit(
+                "`virtual_clock` and `simulate_performance` cannot both be set to True"
+            )
+
+        if self.virtual_clock and self.mode != "online":
+            self.__log_and_exit("`virtual_clock` is only available for `online` mode")
+
+        if self.trace_output and self.mode != "online":
+            self.__log_and_exit("`trace_output` is only available for `online` mode")
+
+        if self.follower_max_lag < 0:
+            self.__log_and_exit(f"follower_max_lag must be positive")
+
+        if self.follower_max_lag > 0 and not (
+            self.mode == "online" and self.simulate_performance
+        ):
+            self.__log_and_exit(
+                "`follower_max_lag` is only available for `online` mode with `simulate_performance`"
+            )
+
         # ---- MUTATIVE ----
 
         # quantize fmin and fmax
@@ -0,0 +1,71 @@
+from typing import Callable, Dict, List, Tuple, TypedDict
+import statistics
+import time
+
+
+class BenchmarkResult(TypedDict):
+    median_s: float  # median time of a run
+    min_s: float  # fastest run
+    repeat: int  # number of timed runs
+    units: int  # units of work per run, e.g. calls or DTW steps
+    units_per_s: float  # throughput of the median run
+
+
+BenchmarkResultsT = Dict[str, BenchmarkResult]
+
+
+def run_benchmark(run: Callable[[], int], repeat: int) -> BenchmarkResult:
+    """
+    Time `run`, which returns the units of work it did, `repeat` times after one
+    untimed warm-up run.
+    """
+    run()
+    times: List[float] = []
+    units = 0
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        units = run()
+        times.append(time.perf_counter() - start_time)
+    median_s = statistics.median(times)
+    return {
+        "median_s": median_s,
+        "min_s": min(times),
+        "repeat": repeat,
+        "units": units,
+        "units_per_s": units / median_s if median_s > 0 else float("inf"),
+    }
+
+
+def compare_results(
+    baseline: BenchmarkResultsT, results: BenchmarkResultsT
+) -> List[Tuple[str, float]]:
+    """
+    Ratio of the median time per unit of work to the baseline's, of every
+    benchmark in both. Above 1 is slower.
+    """
+    ratios: List[Tuple[str, float]] = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None or base["median_s"] <= 0 or result["units"] <= 0:
+            continue
+        ratio = (result["median_s"] / result["units"]) / (
+            base["median_s"] / base["units"]
+        )
+        ratios.append((name, ratio))
+    return ratios
+
+
+def get_missing(baseline: BenchmarkResultsT, results: BenchmarkResultsT) -> List[str]:
+    """
+    Benchmarks of the baseline without results, e.g. as they failed or were removed.
+    """
+    return [name for name in baseline.keys() if name not in results]
+
+
+def get_regressions(
+    ratios: List[Tuple[str, float]], threshold: float
+) -> List[Tuple[str, float]]:
+    """
+    Benchmarks more than `threshold` (e.g. 0.1 for 10%) slower than the baseline.
+    """
+    return [(name, ratio) for name, ratio in ratios if ratio > 1 + threshold]
@@ -1,7 +1,26 @@
-from ..mputils import write_list_to_queue
+from ..mputils import (
+    AnyEvent,
+    AnyOptionalQueue,
+    SharedMemoryQueue,
+    Worker,
+    create_queue,
+    create_worker,
+    write_list_to_queue,
+)
 from ..cqt.base import BaseCQT
+from ..cqt.chunked import extract_chunked
 from ..eprint import eprint
-from ..sharedtypes import CQTType, ExtractedFeature, ExtractedFeatureQueue, ModeType
+from ..scheduler import DeadlineScheduler
+from ..tracing import Tracer
+from ..virtualclock import get_slice_release_time
+from ..sharedtypes import (
+    CQTType,
+    ExtractedFeature,
+    ExtractedFeatureQueue,
+    ModeType,
+    PipelineType,
+    TransportType,
+)
 from ..cqt.cqt_nsgt import CQTNSGTSlicq, CQTNSGT
 from typing import Callable, Optional, Dict, List, Union
 from ..cqt.cqt_librosa import (
@@ -9,11 +28,13 @@ from ..cqt.cqt_librosa import (
     LibrosaSliceCQT,
     get_librosa_params,
 )
-import multiprocessing as mp
 import librosa  # type: ignore
 import time
 import numpy as np
 
+# Delay (s) before streaming the performance, on top of the first frame
+SLICER_START_DELAY = 0.2
+
 
 class Slicer:
     def __init__(
@@ -26,6 +47,8 @@ class Slicer:
         simulate_performance: bool = True,
         sleep_compensation: float = 0.0005,
         duration: Optional[float] = None,
+        trace_queue: Optional[AnyOptionalQueue] = None,
+        stop_event: Optional[AnyEvent] = None,
     ):
         self.wave_path = wave_path
         self.hop_length = hop_length
@@ -35,40 +58,45 @@ class Slicer:
         self.simulate_performance = simulate_performance
         self.sleep_compensation = sleep_compensation
         self.duration = duration
+        # set once the rest of the performance is no longer needed
+        self.stop_event = stop_event
+        self.__tracer = Tracer(self.__class__.__name__, trace_queue)
         self.__log("Initialised successfully")
 
     def start(self):
         self.__log("Starting...")
         audio_stream = librosa.stream(
             self.wave_path,
-            1,
-            self.frame_length,
-            self.hop_length,
+            block_length=1,
+            frame_length=self.frame_length,
+            hop_length=self.hop_length,
             mono=True,
             fill_value=0,
             duration=self.duration,
         )
 
-        # before starting, sleep for frame_length if performance
-        self.__sleep_if_performance(self.frame_length, time.perf_counter() + 0.2)
+        # if performance, slice k is streamed once it is complete
+        scheduler = DeadlineScheduler(self.sleep_compensation)
+        scheduler.start(time.perf_counter() + SLICER_START_DELAY)
 
-        for s in audio_stream:
-            pre_sleep_time = time.perf_counter()
+        for k, s in enumerate(audio_stream):
+            if self.simulate_performance:
+                scheduler.wait_until(
+                    get_slice_release_time(
+                        k, self.hop_length, self.frame_length, self.sample_rate
+                    )
+                )
+            if self.stop_event is not None and self.stop_event.is_set():
+                self.__log("Stopped")
+                break
             self.slice_queue.put(s)
-            # sleep for hop length if performance
-            self.__sleep_if_performance(self.hop_length, pre_sleep_time)
+            self.__tracer.record("slicer_put", k)
 
         self.slice_queue.put(None)  # end
-        self.__log("Finished")
-
-    def __sleep_if_performance(self, samples: int, pre_sleep_time: float):
+        self.__tracer.flush()
         if self.simulate_performance:
-            sleep_time = float(samples) / self.sample_rate
-            time.sleep(
-                sleep_time
-                - (time.perf_counter() - pre_sleep_time)
-                - self.sleep_compensation
-            )
+            self.__log(f"Streamed on schedule: {scheduler.stats()}")
+        self.__log("Finished")
 
     def __log(self, msg: str):
         eprint(f"[{self.__class__.__name__}] {msg}")
@@ -87,10 +115,17 @@ class FeatureExtractor:
         frame_len: int,
         sample_rate: int,
         nsgt_multithreading: bool = False,
+        offline_workers: int = 1,
+        trace_queue: Optional[AnyOptionalQueue] = None,
+        stop_event: Optional[AnyEvent] = None,
     ):
         self.mode = mode
         self.slice_queue = slice_queue
         self.output_queue = output_queue
+        self.offline_workers = offline_workers
+        # set once the rest of the performance is no longer needed
+        self.stop_event = stop_event
+        self.__tracer = Tracer(self.__class__.__name__, trace_queue)
         fmin, n_bins = get_librosa_params(fmin, fmax)
 
         extractor_map: Dict[ModeType, Dict[CQTType, Callable[[], BaseCQT]]] = {
@@ -143,27 +178,47 @@ class FeatureExtractor:
             )
         self.__extractor = extractor_lambda()
 
+        if (
+            self.mode == "offline"
+            and self.offline_workers > 1
+            and self.__extractor.independent_frames() is None
+        ):
+            self.__log(
+                f"Frames of cqt {cqt} cannot be extracted in parallel, extracting serially"
+            )
+
         self.__log("Initialised successfully")
 
     def start(self):
         self.__log("Starting...")
+        k = 0
         while True:
             sl: Optional[np.ndarray] = self.slice_queue.get()
             if sl is None:
                 break
-            o: Optional[
-                Union[ExtractedFeature, List[ExtractedFeature]]
-            ] = self.__extractor.extract(sl)
+            if self.stop_event is not None and self.stop_event.is_set():
+                self.__log("Stopped")
+                break
+            self.__tracer.record("extractor_get", k)
+            self.__tracer.record_depth("slice_queue", self.slice_queue)
+            o: Optional[Union[ExtractedFeature, List[ExtractedFeature]]] = (
+                extract_chunked(self.__extractor, sl, self.offline_workers)
+                if self.mode == "offline"
+                else self.__extractor.extract(sl)
+            )
             if self.mode == "online":
                 # o is of type ExtractedFeature
                 self.output_queue.put(o)
+                self.__tracer.record("extractor_put", k)
             elif self.mode == "offline":
                 # slice_queue has the whole audio piece
                 # o is of type List[ExtractedFeature]
                 write_list_to_queue(o, self.output_queue)
             else:
                 raise ValueError(f"Unknown mode: {self.mode}")
+            k += 1
         self.output_queue.put(None)  # end
+        self.__tracer.flush()
         self.__log("Finished")
 
     def __log(self, msg: str):
@@ -190,6 +245,19 @@ class AudioPreprocessor:
         nsgt_multithreading: bool = False,
         # testing
         duration: Optional[float] = None,
+        # how slices are passed to the feature extractor
+        transport: TransportType = "queue",
+        # whether the slicer and feature extractor run as processes or threads
+        pipeline: PipelineType = "process",
+        # number of processes extracting offline features in parallel
+        offline_workers: int = 1,
+        # where the slicer and feature extractor send their traces, if traced
+        trace_queue: Optional[AnyOptionalQueue] = None,
+        # queue passing slices to the feature extractor, owned (and freed) by the
+        # caller; created (and freed) by start if None
+        slice_queue: Optional[ExtractedFeatureQueue] = None,
+        # set by the caller to stop the slicer and feature extractor early
+        stop_event: Optional[AnyEvent] = None,
     ):
         self.sample_rate = sample_rate
         self.wave_path = wave_path
@@ -209,13 +277,24 @@ class AudioPreprocessor:
 
         self.duration = duration
 
+        self.transport = transport
+        self.pipeline = pipeline
+        self.offline_workers = offline_workers
+        self.trace_queue = trace_queue
+        self.slice_queue = slice_queue
+        self.stop_event = stop_event
+
         self.__log("Initialised successfully")
 
     def start(self):
         self.__log("Starting...")
-        slice_queue: ExtractedFeatureQueue = mp.Queue()
+        slice_queue = self.slice_queue
+        if slice_queue is None:
+            slice_queue = create_slice_queue(
+                self.transport, self.frame_len, self.pipeline
+            )
 
-        online_slicer_proc: Optional[mp.Process] = None
+        online_slicer_proc: Optional[Worker] = None
 
         if self.mode == "online":
             slicer = Slicer(
@@ -227,8 +306,10 @@ class AudioPreprocessor:
                 self.simulate_performance,
                 self.sleep_compensation,
                 self.duration,
+                self.trace_queue,
+                self.stop_event,
             )
-            online_slicer_proc = mp.Process(target=slicer.start)
+            online_slicer_proc = create_worker(slicer.start, self.pipeline)
             online_slicer_proc.start()
         elif self.mode == "offline":
             audio, _ = librosa.load(
@@ -250,14 +331,31 @@ class AudioPreprocessor:
             self.frame_len,
             self.sample_rate,
             self.nsgt_multithreading,
+            self.offline_workers,
+            self.trace_queue,
+            self.stop_event,
         )
-        feature_extractor_proc = mp.Process(target=feature_extractor.start)
+        feature_extractor_proc = create_worker(feature_extractor.start, self.pipeline)
         feature_extractor_proc.start()
 
         if online_slicer_proc:
             online_slicer_proc.join()
         feature_extractor_proc.join()
+        if self.slice_queue is None and isinstance(slice_queue, SharedMemoryQueue):
+            slice_queue.unlink()
         self.__log("Finished")
 
     def __log(self, msg: str):
         eprint(f"[{self.__class__.__name__}] {msg}")
+
+
+def create_slice_queue(
+    transport: TransportType, frame_len: int, pipeline: PipelineType
+) -> ExtractedFeatureQueue:
+    """
+    Queue passing audio slices (of at most frame_len samples in online mode) from
+    the slicer to the feature extractor.
+    """
+    return ExtractedFeatureQueue(
+        create_queue(transport, frame_len * np.dtype(np.float64).itemsize, pipeline)
+    )
@@ -1,5 +1,9 @@
 from ..eprint import eprint
-from typing import Callable, Iterator, List, Dict, Set
+from ..mputils import AnyOptionalQueue, consume_queue
+from ..sinks import SinkWriter, create_sink, parse_udp_output
+from ..tracing import Tracer
+from ..virtualclock import VirtualClock
+from typing import Any, Callable, Iterator, List, Dict, Optional
 from ..sharedtypes import (
     FollowerOutputQueue,
     ModeType,
@@ -8,8 +12,8 @@ from ..sharedtypes import (
     MultiprocessingConnection,
 )
 import time
+import numpy as np
 from sortedcontainers import SortedDict  # type: ignore
-import socket
 
 
 class Backend:
@@ -30,6 +34,10 @@ class Backend:
         sample_rate: int,
         backend_output: str,
         backend_backtrack: bool,
+        virtual_clock: bool = False,
+        trace_queue: Optional[AnyOptionalQueue] = None,
+        backend_flush_interval: float = 0.0,
+        backend_udp_batch: int = 1,
     ):
         self.mode = mode
         self.follower_output_queue = follower_output_queue
@@ -39,9 +47,11 @@ class Backend:
         self.backend_compensation = backend_compensation
         self.sample_rate = sample_rate
         self.backend_backtrack = backend_backtrack
+        self.virtual_clock = virtual_clock
+        self.__tracer = Tracer(self.__class__.__name__, trace_queue)
 
-        self.__sorted_note_onsets: SortedDict[float, NoteInfo] = get_sorted_note_onsets(
-            score_note_onsets
+        self.__note_onset_index = NoteOnsetIndex(
+            score_note_onsets, hop_len, sample_rate
         )
 
         backend_start_map: Dict[BackendType, Callable[[], None]] = {
@@ -52,66 +62,47 @@ class Backend:
         if self.__start is None:
             raise ValueError(f"Unknown backend mode: {backend}")
 
-        if backend_output == "stdout":
-
-            def p(x: str):
-                print(x, flush=True)
-
-            self.__output_func = p
-        elif backend_output == "stderr":
-
-            def p(x: str):
-                eprint(x, flush=True)
-
-            self.__output_func = p
-        elif len(backend_output) > 4 and backend_output[:4] == "udp:":
-            backend_output_without_udp_scheme = backend_output[4:]
-            # try to parse UDP IP and port
-            address_port = backend_output_without_udp_scheme.split(":")
-            if len(address_port) != 2:
-                raise ValueError(f"Unknown `backend_output`: {backend_output}")
-            addr = str(address_port[0])
-            port = int(address_port[1])
-
-            self.__socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.backend_output = backend_output
+        self.backend_flush_interval = backend_flush_interval
+        self.backend_udp_batch = backend_udp_batch
+        udp_addr_port = parse_udp_output(backend_output)
+        if udp_addr_port is not None:
+            addr, port = udp_addr_port
             self.__log(f"Backend will be outputting via UDP to {addr}:{port}")
 
-            def p(x: str):
-                eprint(x)
-                self.__socket.sendto(str(x).encode(), (addr, port))
-
-            self.__output_func = p
-        else:
-            # truncate the file first
-            with open(backend_output, "w+"):
-                pass
-
-            def p(x: str):
-                with open(backend_output, "a") as f:
-                    f.write(f"{x}\n")
-
-            self.__output_func = p
-
         self.__log("Initialised successfully")
 
     def start(self):
         self.__log("Starting...")
+        # output is written from another thread, off the path of the follower output
+        self.__writer = SinkWriter(
+            create_sink(self.backend_output, self.backend_udp_batch),
+            self.backend_flush_interval,
+        )
+        self.__writer.start()
         self.__start()
+        self.__writer.close()
+        self.__tracer.flush()
         self.__log("Finished")
 
     def __start_timestamp(self):
         prev_s = -1
+        n = 0  # output number
         while True:
             e = self.follower_output_queue.get()
             if e is None:
                 return
+            self.__tracer.record("backend_get", n)
+            self.__tracer.record_depth("output_queue", self.follower_output_queue)
             s = e[1]
             if (self.backend_backtrack and s != prev_s) or (
                 not self.backend_backtrack and s > prev_s
             ):
                 timestamp_s = self.__get_online_timestamp(s)
-                self.__output_func(timestamp_s)
+                self.__output(timestamp_s)
+                self.__tracer.record("backend_put", n)
                 prev_s = s
+            n += 1
 
     def __get_online_timestamp(self, s: int) -> float:
         if self.backend_compensation:
@@ -119,50 +110,89 @@ class Backend:
         return float(self.hop_len * s) / self.sample_rate
 
     def __start_alignment(self):
+        if self.mode == "offline":
+            self.__start_alignment_offline()
+            return
         # wait for the performance stream to start
         performance_start_time: float = self.performance_stream_start_conn.recv()
+        virtual_clock: Optional[VirtualClock] = None
+        if self.virtual_clock:
+            virtual_clock = VirtualClock(self.hop_len, self.frame_len, self.sample_rate)
+            virtual_clock.start(performance_start_time)
         prev_s = -1
-        seen_closest_notes_time: Set[float] = set()
+        seen_groups = np.zeros(len(self.__note_onset_index.groups), dtype=bool)
 
+        n = 0  # output number
         while True:
             e = self.follower_output_queue.get()
             if e is None:
                 return
-            p, s = e
+            self.__tracer.record("backend_get", n)
+            self.__tracer.record_depth("output_queue", self.follower_output_queue)
+            p, s = e[0], e[1]
+            # the output can be made no earlier than the last frame the follower took
+            consumed = max(p, e[2]) if len(e) > 2 else p  # type: ignore
+            # every output takes up processing time, even if it is not reported
+            virtual_time = virtual_clock.tick(consumed) if virtual_clock else 0.0
             if (self.backend_backtrack and s != prev_s) or (
                 not self.backend_backtrack and s > prev_s
             ):
                 prev_s = s
-                curr_time = time.perf_counter()
-                det_time_ms = (curr_time - performance_start_time) * 1000
+                if virtual_clock:
+                    det_time_ms = virtual_time * 1000
+                else:
+                    curr_time = time.perf_counter()
+                    det_time_ms = (curr_time - performance_start_time) * 1000
                 # use ms because NoteInfo are ms and the follower output for quantitative
                 # testbench is ms
                 timestamp_p_s = float(self.hop_len * p) / self.sample_rate
                 timestamp_p_ms = timestamp_p_s * 1000
-                timestamp_s_s = float(self.hop_len * s) / self.sample_rate
-                timestamp_s_ms = timestamp_s_s * 1000
 
-                closest_notes = get_closest_notes_before(
-                    self.__sorted_note_onsets, timestamp_s_ms
-                )
-                if len(closest_notes) == 0:
-                    # self.__log(f"Ignoring unfound closest notes at {timestamp_s_ms}")
+                group = self.__note_onset_index.frame_group(s)
+                if group < 0:
+                    # no notes start before s
                     pass
-                elif closest_notes[0].note_start not in seen_closest_notes_time:
-                    seen_closest_notes_time.add(closest_notes[0].note_start)
-                    for closest_note in closest_notes:
-                        if self.mode == "online":
-                            # MIREX format
-                            self.__output_func(
-                                f"{round(timestamp_p_ms)} {round(det_time_ms)} {round(closest_note.note_start)} {closest_note.midi_note_num}"
-                            )
-                        elif self.mode == "offline":
-                            # put det_time as est_time
-                            self.__output_func(
-                                f"{round(timestamp_p_ms)} {round(timestamp_p_ms)} {round(closest_notes[0].note_start)} {closest_note.midi_note_num}"
-                            )
-                        else:
-                            raise ValueError(f"Unknown mode: {self.mode}")
+                elif not seen_groups[group]:
+                    seen_groups[group] = True
+                    for closest_note in self.__note_onset_index.groups[group]:
+                        # MIREX format
+                        self.__output(
+                            f"{round(timestamp_p_ms)} {round(det_time_ms)} {round(closest_note.note_start)} {closest_note.midi_note_num}"
+                        )
+                    self.__tracer.record("backend_put", n)
+            n += 1
+
+    def __start_alignment_offline(self):
+        """
+        Resolve the whole alignment path at once.
+        """
+        path = consume_queue(self.follower_output_queue)
+        if len(path) == 0:
+            return
+        ps, ss = np.array(path, dtype=np.int64).T
+        # same filter as online, element by element
+        if self.backend_backtrack:
+            keep = ss != np.concatenate(([-1], ss[:-1]))
+        else:
+            keep = ss > np.maximum.accumulate(np.concatenate(([-1], ss[:-1])))
+        ps = ps[keep]
+        groups = self.__note_onset_index.frame_groups(ss[keep])
+        # only the first time each group of notes is reached
+        found = np.flatnonzero(groups >= 0)
+        _, first = np.unique(groups[found], return_index=True)
+        first = found[np.sort(first)]
+
+        timestamps_p_ms = self.__note_onset_index.frame_times_ms(ps[first]).tolist()
+        for timestamp_p_ms, group in zip(timestamps_p_ms, groups[first].tolist()):
+            closest_notes = self.__note_onset_index.groups[group]
+            for closest_note in closest_notes:
+                # put det_time as est_time
+                self.__output(
+                    f"{round(timestamp_p_ms)} {round(timestamp_p_ms)} {round(closest_notes[0].note_start)} {closest_note.midi_note_num}"
+                )
+
+    def __output(self, x: Any):
+        self.__writer.write(str(x))
 
     def __log(self, msg: str):
         eprint(f"[{self.__class__.__name__}] {msg}")
@@ -191,3 +221,40 @@ def get_closest_notes_before(
 
     closest_notes_before_key = next(closest_note_time_before_generator, None)
     return sorted_note_onsets.get(closest_notes_before_key, [])
+
+
+class NoteOnsetIndex:
+    """
+    The groups of notes starting at the same time, sorted by time, to look up the
+    closest group starting at or before a score frame as `get_closest_notes_before`
+    does, by index into `groups` (-1 if there is none).
+    """
+
+    def __init__(
+        self, score_note_onsets: List[NoteInfo], hop_len: int, sample_rate: int
+    ):
+        self.hop_len = hop_len
+        self.sample_rate = sample_rate
+        sorted_note_onsets = get_sorted_note_onsets(score_note_onsets)
+        self.onset_times = np.array(list(sorted_note_onsets.keys()), dtype=np.float64)
+        self.groups: List[List[NoteInfo]] = list(sorted_note_onsets.values())
+
+        # group of every frame up to past the last onset, after which it is the last
+        n_frames = 0
+        if len(self.groups) > 0:
+            n_frames = int(self.onset_times[-1] * sample_rate / (1000 * hop_len)) + 2
+        self.__frame_groups: List[int] = self.frame_groups(np.arange(n_frames)).tolist()
+
+    def frame_times_ms(self, frames: np.ndarray) -> np.ndarray:
+        return (self.hop_len * frames).astype(np.float64) / self.sample_rate * 1000
+
+    def frame_groups(self, frames: np.ndarray) -> np.ndarray:
+        return (
+            np.searchsorted(self.onset_times, self.frame_times_ms(frames), side="right")
+            - 1
+        )
+
+    def frame_group(self, frame: int) -> int:
+        if frame < len(self.__frame_groups):
+            return self.__frame_groups[frame]
+        return len(self.groups) - 1
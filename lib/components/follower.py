@@ -1,15 +1,21 @@
 from ..dtw.classical import ClassicalDTW
-from ..mputils import consume_queue, write_list_to_queue
+from ..dtw.multiscale import MultiscaleDTW
+from ..mputils import AnyOptionalQueue, consume_queue, write_list_to_queue
 from ..sharedtypes import (
     DTWType,
     ExtractedFeature,
+    ExtractedFeatureMatrix,
     ExtractedFeatureQueue,
     FollowerOutputQueue,
     ModeType,
+    OLTWEngineType,
 )
 from ..dtw.oltw import OLTW
+from ..loadshedding import SheddingFeatureQueue, SheddingOutputQueue
+from ..consumedframes import CountingFeatureQueue, ConsumedFrameOutputQueue
+from ..tracing import LOAD_SHEDDING_TRACER, Tracer
 from ..eprint import eprint
-from typing import Callable, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 
 class Follower:
@@ -25,10 +31,16 @@ class Follower:
         follower_output_queue: FollowerOutputQueue,
         # Performance and Score info
         P_queue: ExtractedFeatureQueue,
-        S: List[ExtractedFeature],
+        S: ExtractedFeatureMatrix,
         w_a: float,
         w_b: float,
         w_c: float,
+        classical_low_memory: bool = False,
+        trace_queue: Optional[AnyOptionalQueue] = None,
+        oltw_engine: OLTWEngineType = "python",
+        max_backlog: int = 0,
+        min_search_window: int = 0,
+        multiscale_radius: int = 10,
     ):
         self.mode = mode
         self.dtw = dtw
@@ -40,6 +52,14 @@ class Follower:
         self.w_a = w_a
         self.w_b = w_b
         self.w_c = w_c
+        self.classical_low_memory = classical_low_memory
+        self.trace_queue = trace_queue
+        self.oltw_engine = oltw_engine
+        # performance features queued beyond which they are shed, 0 to never shed
+        self.max_backlog = max_backlog
+        # adaptive search window down to min_search_window, fixed if 0
+        self.min_search_window = min_search_window
+        self.multiscale_radius = multiscale_radius
 
         follower_start_map: Dict[ModeType, Dict[DTWType, Callable[[], None]]] = {
             "online": {
@@ -48,6 +68,7 @@ class Follower:
             "offline": {
                 "oltw": self.__start_oltw,
                 "classical": self.__start_classical,
+                "multiscale": self.__start_multiscale,
             },
         }
         dtwtype_start_map = follower_start_map.get(self.mode)
@@ -58,6 +79,19 @@ class Follower:
             raise ValueError(
                 f"Invalid or unknown combination of mode {self.mode} and dtw type {self.dtw}"
             )
+        if self.oltw_engine not in ["python", "numba"]:
+            raise ValueError(f"Unknown OLTW engine: {self.oltw_engine}")
+        if self.min_search_window > 0 and self.oltw_engine != "python":
+            raise ValueError(
+                f"Adaptive search window unavailable for OLTW engine: {self.oltw_engine}"
+            )
+        if self.dtw == "oltw" and self.oltw_engine == "numba":
+            # imported here as numba is slow to import, and compiled before the
+            # performance starts
+            from ..dtw.oltw_numba import compile_oltw_numba
+
+            self.__log("Compiling OLTW steps")
+            compile_oltw_numba()
         self.__log("Initialised successfully")
 
     def start(self):
@@ -66,23 +100,72 @@ class Follower:
         self.__log("Finished")
 
     def __start_oltw(self):
-        oltw = OLTW(
-            self.P_queue,
+        oltw_cls: Any = OLTW
+        oltw_kwargs: Dict[str, Any] = {}
+        if self.oltw_engine == "numba":
+            from ..dtw.oltw_numba import OLTWNumba
+
+            oltw_cls = OLTWNumba
+        elif self.min_search_window > 0:
+            oltw_kwargs["min_search_window"] = self.min_search_window
+        P_queue: Any = self.P_queue
+        follower_output_queue: Any = self.follower_output_queue
+        shedding_queue: Optional[SheddingFeatureQueue] = None
+        if self.mode == "online" and self.max_backlog > 0:
+            shedding_queue = SheddingFeatureQueue(self.P_queue, self.max_backlog)
+            P_queue = shedding_queue
+            follower_output_queue = ConsumedFrameOutputQueue(
+                self.follower_output_queue,
+                lambda: shedding_queue.frames_received - 1,  # type: ignore
+            )
+            follower_output_queue = SheddingOutputQueue(
+                follower_output_queue, shedding_queue
+            )
+            # traced by the performance frames rather than the averaged ones
+            oltw_kwargs["get_frame"] = shedding_queue.get_frame
+        elif self.mode == "online":
+            # outputs carry the last frame taken, for the backend's virtual clock
+            counting_queue = CountingFeatureQueue(self.P_queue)
+            P_queue = counting_queue
+            follower_output_queue = ConsumedFrameOutputQueue(
+                self.follower_output_queue,
+                lambda: counting_queue.frames_received - 1,
+            )
+        oltw = oltw_cls(
+            P_queue,
             self.S,
-            self.follower_output_queue,
+            follower_output_queue,
             self.max_run_count,
             self.search_window,
             self.w_a,
             self.w_b,
             self.w_c,
+            self.trace_queue,
+            **oltw_kwargs,
         )
         oltw.dtw()
+        if shedding_queue:
+            self.__log(f"Load shedding: {shedding_queue.stats()}")
+            tracer = Tracer(LOAD_SHEDDING_TRACER, self.trace_queue)
+            for counter_name, value in shedding_queue.counters().items():
+                tracer.record_counter(counter_name, value)
+            tracer.flush()
 
     def __start_classical(self):
         P: List[ExtractedFeature] = consume_queue(self.P_queue)
-        classical = ClassicalDTW(P, self.S, self.w_a, self.w_b, self.w_c)
+        classical = ClassicalDTW(
+            P, self.S, self.w_a, self.w_b, self.w_c, self.classical_low_memory
+        )
         dtw_elems = classical.dtw()
         write_list_to_queue(dtw_elems, self.follower_output_queue)
 
+    def __start_multiscale(self):
+        P: List[ExtractedFeature] = consume_queue(self.P_queue)
+        multiscale = MultiscaleDTW(
+            P, self.S, self.w_a, self.w_b, self.w_c, self.multiscale_radius
+        )
+        dtw_elems = multiscale.dtw()
+        write_list_to_queue(dtw_elems, self.follower_output_queue)
+
     def __log(self, msg: str):
         eprint(f"[{self.__class__.__name__}] {msg}")
@@ -3,3 +3,10 @@ import os
 DEFAULT_SAMPLE_RATE = 44100
 
 REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+
+DEFAULT_SCORE_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "flippy",
+    "scores",
+)
+DEFAULT_SCORE_CACHE_MAX_MB = 1024.0
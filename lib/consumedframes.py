@@ -0,0 +1,48 @@
+from .sharedtypes import (
+    DTWPathElemType,
+    ExtractedFeature,
+    FollowerOutputQueue,
+)
+from typing import Any, Callable, Optional
+
+
+class CountingFeatureQueue:
+    """
+    Performance features for the follower, counting the frames it has taken.
+    """
+
+    def __init__(self, P_queue: Any):
+        self.P_queue = P_queue
+        self.frames_received = 0
+
+    def get(self) -> Optional[ExtractedFeature]:
+        x = self.P_queue.get()
+        if x is not None:
+            self.frames_received += 1
+        return x
+
+    def qsize(self) -> int:
+        return self.P_queue.qsize()
+
+
+class ConsumedFrameOutputQueue:
+    """
+    Adds the last performance frame the follower has taken to each of its outputs,
+    as (p, s, consumed frame). The follower may output a p well before that frame,
+    while the output cannot be made before that frame is available.
+    """
+
+    def __init__(
+        self,
+        follower_output_queue: FollowerOutputQueue,
+        get_consumed_frame: Callable[[], int],
+    ):
+        self.follower_output_queue = follower_output_queue
+        self.get_consumed_frame = get_consumed_frame
+
+    def put(self, e: Optional[DTWPathElemType]):
+        if e is None:
+            self.follower_output_queue.put(None)
+            return
+        p, s = e
+        self.follower_output_queue.put((p, s, self.get_consumed_frame()))
@@ -1,4 +1,4 @@
-from typing import Union, List
+from typing import Optional, Tuple, Union, List
 import numpy as np
 from ..sharedtypes import ExtractedFeature
 
@@ -12,3 +12,11 @@ class BaseCQT:
         Online:  Returns Extracted Feature for a slice
         """
         raise NotImplementedError("Override this")
+
+    def independent_frames(self) -> Optional[Tuple[int, int]]:
+        """
+        Offline: Returns (frame length, hop length) if the k-th feature only depends on
+        audio[k * hop length : k * hop length + frame length], so that chunks of frames
+        can be extracted separately. Otherwise returns None.
+        """
+        return None
@@ -0,0 +1,49 @@
+from ..cqt.base import BaseCQT
+from ..sharedtypes import ExtractedFeature
+from typing import List, Tuple
+import multiprocessing as mp
+import numpy as np
+
+# Number of chunks given to each worker, so that a slow chunk does not hold up the rest
+CHUNKS_PER_WORKER = 4
+
+
+def get_chunks(
+    n_samples: int, frame_len: int, hop_len: int, n_chunks: int
+) -> List[Tuple[int, int]]:
+    """
+    Split the frames k * hop_len .. k * hop_len + frame_len of a signal with n_samples
+    samples into at most n_chunks runs of consecutive frames.
+    Returns the (start, end) sample range covering the frames of each chunk.
+    """
+    if n_samples < frame_len:
+        return []
+    n_frames = (n_samples - frame_len) // hop_len + 1
+    bounds = np.linspace(0, n_frames, min(n_chunks, n_frames) + 1).astype(int)
+    return [
+        (first * hop_len, (last - 1) * hop_len + frame_len)
+        for first, last in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def extract_chunked(
+    extractor: BaseCQT, audio: np.ndarray, workers: int
+) -> List[ExtractedFeature]:
+    """
+    Offline extraction with the frames split into chunks extracted by a pool of
+    worker processes, then stitched back in order. The result is identical to
+    extractor.extract(audio).
+
+    Falls back to extractor.extract(audio) when the frames are not independent.
+    """
+    frames = extractor.independent_frames()
+    if frames is None or workers <= 1:
+        return extractor.extract(audio)  # type: ignore
+    frame_len, hop_len = frames
+
+    chunks = get_chunks(len(audio), frame_len, hop_len, workers * CHUNKS_PER_WORKER)
+    with mp.Pool(workers) as pool:
+        chunk_features = pool.map(
+            extractor.extract, [audio[start:end] for start, end in chunks], 1
+        )
+    return [feature for features in chunk_features for feature in features]
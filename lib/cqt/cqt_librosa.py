@@ -1,11 +1,21 @@
 from ..cqt.base import BaseCQT
-from typing import Any, Callable, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from ..utils import quantise_hz_midi
 import librosa  # type: ignore
 import numpy as np  # type: ignore
+import scipy.sparse  # type: ignore
 from ..sharedtypes import ExtractedFeature, ExtractorFunctionType, LibrosaCQTs
 from ..constants import DEFAULT_SAMPLE_RATE
 
+# cqt functions whose framed features full_cqt_helper can get from a PseudoCQTKernel
+KERNEL_CQTS: Dict[Any, LibrosaCQTs] = {
+    librosa.pseudo_cqt: "librosa_pseudo",
+    librosa.hybrid_cqt: "librosa_hybrid",
+}
+
+# Number of frames transformed at once by PseudoCQTKernel.extract_frames
+PSEUDO_CQT_BATCH_FRAMES = 64
+
 
 def get_librosa_params(
     fmin: float = 130.8,
@@ -36,17 +46,20 @@ def full_cqt_helper(
     consider_frames: bool = False,
 ) -> np.ndarray:
     if consider_frames:
-        cqt = np.ndarray(
+        frames = get_frames(audio, frame_len, hop_len)
+        kernel_cqt = KERNEL_CQTS.get(cqt_func)
+        if kernel_cqt is not None and is_all_pseudo(
+            kernel_cqt, frame_len, fmin, n_bins, fs
+        ):
+            # all frames at once, as slice_cqt_helper
+            cqt = PseudoCQTKernel(frame_len, fmin, n_bins, fs).extract_frames(frames)
+            cqt = cqt[:, :hop_len]
+            cqt = librosa.util.normalize(cqt, norm=1, axis=1)
+            return cqt
+        cqt = np.array(
             [
-                slice_cqt_helper(
-                    cqt_func,
-                    audio[i : min(len(audio), i + frame_len)],
-                    hop_len,
-                    fmin,
-                    n_bins,
-                    fs,
-                )
-                for i in range(0, len(audio) - frame_len + 1, hop_len)
+                slice_cqt_helper(cqt_func, frame, hop_len, fmin, n_bins, fs)
+                for frame in frames
             ]
         )
         return cqt
@@ -61,6 +74,20 @@ def full_cqt_helper(
         return cqt
 
 
+def get_frames(audio: np.ndarray, frame_len: int, hop_len: int) -> np.ndarray:
+    """
+    Returns a read-only view of shape (n_frames, frame_len) of the frames
+    audio[i : i + frame_len] for i in range(0, len(audio) - frame_len + 1, hop_len).
+    """
+    n_frames = max(0, (len(audio) - frame_len) // hop_len + 1)
+    return np.lib.stride_tricks.as_strided(
+        audio,
+        shape=(n_frames, frame_len),
+        strides=(hop_len * audio.strides[0], audio.strides[0]),
+        writeable=False,
+    )
+
+
 def extract_features_librosa_cqt(
     audio: np.ndarray,
     frame_len: int,
@@ -217,6 +244,123 @@ def extract_slice_features_librosa_hybrid_cqt(
     )
 
 
+def get_constant_q_lengths(
+    fmin: float,
+    n_bins: int,
+    fs: int = DEFAULT_SAMPLE_RATE,
+    bins_per_octave: int = 12,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (centre frequencies, filter lengths) of the constant-Q filters.
+    """
+    Q = 1.0 / (2.0 ** (1.0 / bins_per_octave) - 1)
+    freqs = fmin * (2.0 ** (np.arange(n_bins, dtype=float) / bins_per_octave))
+    return freqs, Q * fs / freqs
+
+
+def is_all_pseudo(
+    cqt: LibrosaCQTs,
+    slice_len: int,
+    fmin: float,
+    n_bins: int,
+    fs: int = DEFAULT_SAMPLE_RATE,
+) -> bool:
+    """
+    Whether librosa computes every bin with the pseudo CQT for slices of slice_len
+    taken as one frame each.
+    """
+    if cqt == "librosa_pseudo":
+        return True
+    if cqt == "librosa_hybrid":
+        # as librosa.hybrid_cqt with hop_length=slice_len
+        _, lengths = get_constant_q_lengths(fmin, n_bins, fs)
+        return bool(np.all(2.0 ** np.ceil(np.log2(lengths)) < 2 * slice_len))
+    # the full CQT resamples the slice octave by octave
+    return False
+
+
+class PseudoCQTKernel:
+    """
+    Streaming `librosa.pseudo_cqt` of slices of a fixed length, keeping only the first
+    frame as slice_cqt_helper does.
+
+    The sparse spectral kernel (the magnitude FFT of the constant-Q filters), which
+    librosa rebuilds on every call, is built once here, so each slice costs one FFT
+    plus a sparse matrix-vector product. Follows librosa 0.8.0 with its defaults
+    (tuning=0.0, filter_scale=1, norm=1, sparsity=0.01, hann window, scale=True,
+    reflect padding).
+    """
+
+    def __init__(
+        self,
+        slice_len: int,
+        fmin: float,
+        n_bins: int,
+        fs: int = DEFAULT_SAMPLE_RATE,
+        bins_per_octave: int = 12,
+        pad_mode: str = "reflect",
+    ):
+        self.pad_mode = pad_mode
+
+        # filters.constant_q
+        freqs, lengths = get_constant_q_lengths(fmin, n_bins, fs, bins_per_octave)
+        n_fft = int(2.0 ** (np.ceil(np.log2(max(lengths)))))
+        basis = np.zeros((n_bins, n_fft), dtype=np.complex64)
+        for k, (ilen, freq) in enumerate(zip(lengths, freqs)):
+            t = np.arange(-ilen // 2, ilen // 2, dtype=float)
+            sig = np.exp(t * 1j * 2 * np.pi * freq / fs)
+            sig = sig * librosa.filters.get_window("hann", len(sig))
+            sig = librosa.util.normalize(sig, norm=1)
+            lpad = (n_fft - len(sig)) // 2
+            basis[k, lpad : lpad + len(sig)] = sig
+
+        # constantq.__cqt_filter_fft
+        if n_fft < 2.0 ** (1 + np.ceil(np.log2(slice_len))):
+            n_fft = int(2.0 ** (1 + np.ceil(np.log2(slice_len))))
+        basis *= lengths[:, np.newaxis] / float(n_fft)
+        fft_basis = np.fft.fft(basis.astype(np.complex128), n=n_fft, axis=1)
+        fft_basis = librosa.util.sparsify_rows(
+            fft_basis[:, : (n_fft // 2) + 1], quantile=0.01, dtype=np.complex64
+        )
+
+        self.n_fft = n_fft
+        self.abs_fft_basis: scipy.sparse.csr_matrix = np.abs(fft_basis)
+        self.fft_window = librosa.filters.get_window("hann", n_fft, fftbins=True)
+
+    def extract(self, audio_slice: np.ndarray) -> np.ndarray:
+        """
+        Magnitude pseudo CQT of the first (centered) frame of audio_slice.
+        """
+        return self.extract_frames(audio_slice[np.newaxis])[0]
+
+    def extract_frames(
+        self, audio_slices: np.ndarray, batch_frames: int = PSEUDO_CQT_BATCH_FRAMES
+    ) -> np.ndarray:
+        """
+        extract for every row of audio_slices, batch_frames rows at a time to bound
+        the memory taken by the padded frames and their spectra.
+        """
+        if len(audio_slices) <= batch_frames:
+            return self.__extract_batch(audio_slices)
+        return np.concatenate(
+            [
+                self.__extract_batch(audio_slices[start : start + batch_frames])
+                for start in range(0, len(audio_slices), batch_frames)
+            ]
+        )
+
+    def __extract_batch(self, audio_slices: np.ndarray) -> np.ndarray:
+        half = self.n_fft // 2
+        frames = np.pad(
+            audio_slices[:, : half + 1], ((0, 0), (half, half)), mode=self.pad_mode
+        )[:, : self.n_fft]
+        dtype = librosa.util.dtype_r2c(audio_slices.dtype)
+        spectra = np.abs(np.fft.rfft(self.fft_window * frames, axis=1).astype(dtype))
+        cqt = self.abs_fft_basis.dot(spectra.T).T
+        cqt /= np.sqrt(self.n_fft)
+        return cqt
+
+
 ## Experimental: Bad results
 # def extract_slice_features_librosa_cqt(
 #     audio_slice: np.ndarray,
@@ -249,6 +393,10 @@ class LibrosaSliceCQT(BaseCQT):
         self.n_bins = n_bins
         self.fs = fs
         self.hop_len = hop_len
+        self.cqt = cqt
+        # kernels by slice length (slices normally all have the same length), or None
+        # if the slices go through librosa
+        self.__kernels: Dict[int, Optional[PseudoCQTKernel]] = {}
 
         f_map: Dict[
             LibrosaCQTs, Callable[[np.ndarray, int, float, int, int], ExtractedFeature]
@@ -262,7 +410,23 @@ class LibrosaSliceCQT(BaseCQT):
             raise ValueError(f"Unknown or unsupported cqt algo: {cqt}")
 
     def extract(self, audio: np.ndarray) -> ExtractedFeature:
-        return self.__f(audio, self.hop_len, self.fmin, self.n_bins, self.fs)  # type: ignore
+        kernel = self.__get_kernel(len(audio))
+        if kernel is None:
+            return self.__f(audio, self.hop_len, self.fmin, self.n_bins, self.fs)  # type: ignore
+        # as slice_cqt_helper
+        cqt = kernel.extract(audio)
+        cqt = cqt[: self.hop_len]
+        cqt = librosa.util.normalize(cqt, norm=1)
+        return ExtractedFeature(cqt)
+
+    def __get_kernel(self, slice_len: int) -> Optional[PseudoCQTKernel]:
+        if slice_len not in self.__kernels:
+            self.__kernels[slice_len] = (
+                PseudoCQTKernel(slice_len, self.fmin, self.n_bins, self.fs)
+                if is_all_pseudo(self.cqt, slice_len, self.fmin, self.n_bins, self.fs)
+                else None
+            )
+        return self.__kernels[slice_len]
 
 
 class LibrosaFullCQT(BaseCQT):
@@ -280,6 +444,9 @@ class LibrosaFullCQT(BaseCQT):
         self.frame_len = frame_len
         self.hop_len = hop_len
         self.fs = fs
+        # the full CQT pads and downsamples the whole signal, so every frame depends
+        # on its neighbours
+        self.__frames_independent = cqt != "librosa"
 
         f_map: Dict[
             LibrosaCQTs,
@@ -295,3 +462,8 @@ class LibrosaFullCQT(BaseCQT):
 
     def extract(self, audio: np.ndarray) -> List[ExtractedFeature]:
         return [x for x in self.__f(audio, self.frame_len, self.hop_len, self.fmin, self.n_bins, self.fs)]  # type: ignore
+
+    def independent_frames(self) -> Optional[Tuple[int, int]]:
+        if self.__frames_independent:
+            return self.frame_len, self.hop_len
+        return None
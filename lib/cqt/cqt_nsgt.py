@@ -2,11 +2,19 @@ from ..cqt.base import BaseCQT
 from ..sharedtypes import ExtractedFeature
 from ..utils import quantise_hz_midi
 from nsgt import CQ_NSGT_sliced, CQ_NSGT  # type: ignore
-from typing import List, Tuple
+from nsgt.slicing import makewnd  # type: ignore
+from typing import List, Optional, Tuple
+from math import ceil
 import librosa  # type: ignore
 import numpy as np  # type: ignore
 from ..constants import DEFAULT_SAMPLE_RATE
 
+# Number of windows transformed at once by extract_features_nsgt_slicq_batch
+NSGT_BATCH_WINDOWS = 32
+# Attributes of CQ_NSGT_sliced read by nsgt_forward_batch and get_nsgt_slices,
+# which are internal to nsgt (as of nsgt 0.18)
+NSGT_BATCH_ATTRIBUTES = ("g", "M", "wins", "nn", "real", "reducedform", "tr_area")
+
 
 def get_nsgt_params(
     fmin: float = 130.8,
@@ -122,6 +130,128 @@ def extract_features_nsgt_slicq(
     return cqt
 
 
+def extract_features_nsgt_slicq_batch(
+    slicq: CQ_NSGT_sliced,
+    tr_len: int,
+    audio: np.ndarray,
+) -> np.ndarray:
+    """
+    Extract features for every window audio[k * tr_len : k * tr_len + sl_len] that
+    fits in audio--the same as extract_features_nsgt_slicq on each window in turn.
+
+    The 3 slices which slicq.forward cuts from each zero-padded window are built for
+    a batch of windows at once, and the forward transform, the rearrangement of the
+    coefficients and the reduction to features are all vectorised over the batch.
+    Returns an ndarray of shape (n_windows, n_bins).
+
+    Falls back to extract_features_nsgt_slicq on each window if slicq lacks any of
+    NSGT_BATCH_ATTRIBUTES, e.g. with another version of nsgt.
+    """
+    sl_len = slicq.sl_len
+    audio = np.asarray(audio, dtype=float)
+    if len(audio) < sl_len:
+        return np.empty((0, 0))
+    n_windows = (len(audio) - sl_len) // tr_len + 1
+    windows = np.lib.stride_tricks.as_strided(
+        audio,
+        shape=(n_windows, sl_len),
+        strides=(tr_len * audio.strides[0], audio.strides[0]),
+        writeable=False,
+    )
+    if not has_nsgt_batch_attributes(slicq):
+        return np.array(
+            [extract_features_nsgt_slicq(slicq, tr_len, w) for w in windows]
+        )
+
+    feats: List[np.ndarray] = []
+    for start in range(0, len(windows), NSGT_BATCH_WINDOWS):
+        f_slices = get_nsgt_slices(slicq, windows[start : start + NSGT_BATCH_WINDOWS])
+        # shape: (n_windows * 3, n_bins, n_coefs)
+        cqt = nsgt_forward_batch(slicq, f_slices)
+        # shape: (n_windows, 3, n_bins, n_coefs)
+        cqt = cqt.reshape((-1, 3) + cqt.shape[1:])
+        # Undo the rotation of the slices, which alternates between slices
+        n_coefs = cqt.shape[-1]
+        cqt[:, 0::2] = np.roll(cqt[:, 0::2], -(3 * n_coefs // 4), axis=-1)
+        cqt[:, 1] = np.roll(cqt[:, 1], -(n_coefs // 4), axis=-1)
+        # Take abs value
+        cqt = np.abs(cqt)
+        # Average along the 3 slices
+        cqt = np.average(cqt, axis=1)
+        # Take only the slice region of the time slices and average over them
+        cqt = np.average(cqt[:, :, :tr_len], axis=2)
+        feats.append(cqt)
+
+    # L1 normalize
+    return librosa.util.normalize(np.concatenate(feats), norm=1, axis=1)
+
+
+def has_nsgt_batch_attributes(slicq: CQ_NSGT_sliced) -> bool:
+    """
+    Whether slicq has the internals that extract_features_nsgt_slicq_batch needs.
+    """
+    return all(hasattr(slicq, attr) for attr in NSGT_BATCH_ATTRIBUTES)
+
+
+def get_nsgt_slices(slicq: CQ_NSGT_sliced, windows: np.ndarray) -> np.ndarray:
+    """
+    The slices cut by slicq.forward from each window on its own, i.e. the
+    window zero-padded by half a slice on both sides, in 3 half-overlapping slices
+    weighted by the slicing window and rotated in alternating phases.
+    Returns an ndarray of shape (n_windows * 3, sl_len).
+    """
+    sl_len = slicq.sl_len
+    hhop = sl_len // 4
+    tw = makewnd(sl_len, slicq.tr_area)
+    padded = np.zeros((len(windows), sl_len * 2), dtype=float)
+    padded[:, 2 * hhop : 2 * hhop + sl_len] = windows
+    f_slices = np.empty((len(windows), 3, sl_len), dtype=float)
+    for k in range(3):
+        f_slices[:, k] = padded[:, 2 * k * hhop : 2 * k * hhop + sl_len] * tw
+        f_slices[:, k] = np.roll(f_slices[:, k], (3 - 2 * (k % 2)) * hhop, axis=-1)
+    return f_slices.reshape((-1, sl_len))
+
+
+def nsgt_forward_batch(slicq: CQ_NSGT_sliced, f_slices: np.ndarray) -> np.ndarray:
+    """
+    nsgt.nsgtf.nsgtf_sl for a 2D array of slices, with the FFTs over all the
+    slices done at once per frequency bin.
+    Returns an ndarray of shape (n_slices, n_bins, n_coefs) with slicq in matrixform.
+    """
+    g = slicq.g
+    if slicq.real:
+        sl = slice(slicq.reducedform, len(g) // 2 + 1 - slicq.reducedform)
+    else:
+        sl = slice(0, None)
+
+    n, Ls = f_slices.shape
+    ft = np.fft.fft(f_slices, axis=-1)
+    if slicq.nn > Ls:
+        ft = np.concatenate((ft, np.zeros((n, slicq.nn - Ls), dtype=ft.dtype)), axis=-1)
+
+    c: List[np.ndarray] = []
+    for mii, gii, win_range in zip(slicq.M[sl], g[sl], slicq.wins[sl]):
+        Lg = len(gii)
+        col = int(ceil(float(Lg) / mii))
+        temp = np.empty((n, col * mii), dtype=ft.dtype)
+        t1 = temp[:, : (Lg + 1) // 2]
+        t1[:] = gii[: (Lg + 1) // 2]
+        t2 = temp[:, -(Lg // 2) :]
+        t2[:] = gii[-(Lg // 2) :]
+
+        ftw = ft[:, win_range]
+        t2 *= ftw[:, : Lg // 2]
+        t1 *= ftw[:, Lg // 2 :]
+
+        temp[:, (Lg + 1) // 2 : -(Lg // 2)] = 0  # clear gap (if any)
+
+        if col > 1:
+            temp = np.sum(temp.reshape((n, mii, -1)), axis=2)
+
+        c.append(np.fft.ifft(temp, axis=-1))
+    return np.stack(c, axis=1)
+
+
 class CQTNSGTSlicq(BaseCQT):
     def __init__(
         self,
@@ -165,15 +295,15 @@ class CQTNSGT(BaseCQT):
             self.fs,
             self.multithreading,
         )
-        res: List[ExtractedFeature] = []
-        hop_start: int = 0
-        while hop_start <= len(audio_slice) - self.sl_len:
-            feat = slicq_extractor.extract(
-                audio_slice[hop_start : hop_start + self.sl_len]
+        return [
+            x
+            for x in extract_features_nsgt_slicq_batch(
+                slicq_extractor.slicq, self.tr_len, audio_slice
             )
-            res.append(feat)
-            hop_start += self.tr_len
-        return res
+        ]
+
+    def independent_frames(self) -> Optional[Tuple[int, int]]:
+        return self.sl_len, self.tr_len
 
     def full_extract(self, audio_slice: np.ndarray) -> List[ExtractedFeature]:
         """
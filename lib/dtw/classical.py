@@ -1,45 +1,62 @@
 from ..eprint import eprint
-from typing import List
-from ..dtw.shared import cost
-from ..sharedtypes import DTWPathElemType, ExtractedFeature
+from typing import Dict, List, Optional, Tuple, Union
+from ..dtw.shared import pairwise_cost
+from ..sharedtypes import DTWPathElemType, ExtractedFeature, ExtractedFeatureMatrix
+import math
 import numpy as np
 
+# A stored anti-diagonal: (first row index, cumulative costs of its cells)
+CompactDiagonal = Tuple[int, np.ndarray]
+
 
 class ClassicalDTW:
     def __init__(
         self,
-        P: List[ExtractedFeature],
-        S: List[ExtractedFeature],
+        P: Union[ExtractedFeatureMatrix, List[ExtractedFeature]],
+        S: Union[ExtractedFeatureMatrix, List[ExtractedFeature]],
         w_a: float = 1.0,
         w_b: float = 1.0,
         w_c: float = 1.0,
+        low_memory: bool = False,
     ):
+        """
+        The cumulative cost matrix is filled bottom-up one anti-diagonal at a time,
+        as every cell of an anti-diagonal only depends on the previous two.
+
+        With low_memory, only every ~sqrt(len(P) + len(S))-th pair of anti-diagonals
+        is kept and the rest are recomputed block by block while recovering the path.
+        This costs one extra pass over the matrix, but memory grows with
+        (len(P) + len(S)) ** 1.5 rather than len(P) * len(S).
+        """
         if len(P) == 0:
             raise ValueError(f"Empty P")
         if len(S) == 0:
             raise ValueError(f"Empty S")
-        if len(P[0].shape) != 1:
+        P = np.ascontiguousarray(P)
+        S = np.ascontiguousarray(S)
+        if len(P.shape) != 2:
             raise ValueError(f"P must be 2D")
-        if len(S[0].shape) != 1:
+        if len(S.shape) != 2:
             raise ValueError(f"S must be 2D")
 
         self.w_a = w_a
         self.w_b = w_b
         self.w_c = w_c
-
-        import sys
-
-        sys.setrecursionlimit(10 ** 7)
-        self.__log("Set recursion limit to 10**7")
+        self.low_memory = low_memory
 
         self.P = P  # performance
         self.S = S  # score
 
         self.D_shape = (len(P), len(S))
-        self.D_calc = np.zeros(
-            self.D_shape, dtype=bool
-        )  # whether the entry in self.D is calculated
-        self.D = np.zeros(self.D_shape, dtype=np.float64)
+        self.__n_diagonals = len(P) + len(S) - 1
+        # Number of anti-diagonals between checkpoints in low_memory mode
+        self.__block_len = max(2, math.isqrt(self.__n_diagonals))
+        # Anti-diagonals kept from the forward pass: all of them, or only the
+        # checkpoints in low_memory mode
+        self.__diagonals: Dict[int, CompactDiagonal] = {}
+        # Anti-diagonals of the block recomputed for path recovery
+        self.__block: Dict[int, CompactDiagonal] = {}
+        self.__block_idx: Optional[int] = None
 
         self.__log("Initialised successfully")
 
@@ -50,13 +67,16 @@ class ClassicalDTW:
         """
         path: List[DTWPathElemType] = []
 
+        self.__fill()
+
         r, c = self.D_shape
         r -= 1
         c -= 1
-        self.__dtw_helper(r, c)
 
         while r >= 0 and c >= 0:
             path.append((r, c))
+            if self.low_memory:
+                self.__load_block_for(r + c)
             r_pos = r > 0
             c_pos = c > 0
             diag_cost = np.inf
@@ -64,11 +84,11 @@ class ClassicalDTW:
             down_cost = np.inf
 
             if r_pos and c_pos:
-                diag_cost = self.D[r - 1][c - 1]
+                diag_cost = self.__D_get(r - 1, c - 1)
             if r_pos:
-                left_cost = self.D[r - 1][c]
+                left_cost = self.__D_get(r - 1, c)
             if c_pos:
-                down_cost = self.D[r][c - 1]
+                down_cost = self.__D_get(r, c - 1)
 
             min_cost = min(diag_cost, left_cost, down_cost)
 
@@ -86,37 +106,100 @@ class ClassicalDTW:
 
         return path
 
-    def __dtw_helper(self, r: int, c: int) -> float:
+    def __fill(self):
+        """
+        Forward pass over all anti-diagonals.
         """
-        Helper function. For an entry (r, c) in the distance matrix return the current cumulative cost
-        and the immediate backward direction of the optimal path.
+        prev2 = self.__empty_diagonal()
+        prev1 = self.__empty_diagonal()
+        for k in range(self.__n_diagonals):
+            curr = self.__compute_diagonal(k, prev1, prev2)
+            if not self.low_memory or self.__is_checkpoint(k):
+                self.__diagonals[k] = self.__compact(k, curr)
+            prev2, prev1 = prev1, curr
+
+    def __is_checkpoint(self, k: int) -> bool:
+        # pairs (q * block_len - 1, q * block_len) are needed to restart a block
+        return k % self.__block_len in (0, self.__block_len - 1)
+
+    def __load_block_for(self, k: int):
         """
-        if r >= self.D_shape[0] or c >= self.D_shape[1]:
-            raise ValueError(
-                f"Out of range: want ({r}, {c}) from distance matrix of shape {self.D_shape}"
+        Make sure that the anti-diagonals k - 1 and k - 2, needed to step back
+        from a cell on anti-diagonal k, are available.
+        """
+        if k < 1:
+            return
+        block_idx = (k - 1) // self.__block_len
+        if block_idx == self.__block_idx:
+            return
+        self.__block_idx = block_idx
+        self.__block = {}
+
+        start = block_idx * self.__block_len
+        end = min(start + self.__block_len, self.__n_diagonals)
+        prev2 = (
+            self.__expand(start - 1, self.__diagonals[start - 1])
+            if start > 0
+            else self.__empty_diagonal()
+        )
+        prev1 = self.__expand(start, self.__diagonals[start])
+        for k in range(start + 1, end):
+            curr = self.__compute_diagonal(k, prev1, prev2)
+            self.__block[k] = self.__compact(k, curr)
+            prev2, prev1 = prev1, curr
+
+    def __compute_diagonal(
+        self, k: int, prev1: np.ndarray, prev2: np.ndarray
+    ) -> np.ndarray:
+        """
+        Cumulative costs of the cells (r, k - r) given the previous two anti-diagonals.
+        Anti-diagonals are held in arrays of length len(P) + 1 indexed by r + 1, with
+        inf for every cell outside the matrix.
+        """
+        r_lo, r_hi = self.__row_range(k)
+        # columns k - r_hi .. k - r_lo, reversed to match rows r_lo .. r_hi
+        d = pairwise_cost(
+            self.P[r_lo : r_hi + 1],
+            self.S[k - r_hi : k - r_lo + 1][::-1],
+        )
+
+        curr = self.__empty_diagonal()
+        if k == 0:
+            curr[1] = d[0]
+        else:
+            diag_cost = prev2[r_lo : r_hi + 1]  # (r - 1, c - 1)
+            left_cost = prev1[r_lo : r_hi + 1]  # (r - 1, c)
+            down_cost = prev1[r_lo + 1 : r_hi + 2]  # (r, c - 1)
+            min_cost = np.minimum(
+                np.minimum(self.w_a * d + diag_cost, self.w_b * d + left_cost),
+                self.w_c * d + down_cost,
             )
-        if r < 0 or c < 0:
-            return np.inf
-
-        if not self.D_calc[r][c]:
-            self.D_calc[r][c] = True
-            p = self.P[r]
-            s = self.S[c]
-            d = cost(s, p)
-
-            if (r, c) == (0, 0):
-                self.D[r][c] = d
-            else:
-                min_cost = min(
-                    self.w_a * d + self.__dtw_helper(r - 1, c - 1),
-                    self.w_b * d + self.__dtw_helper(r - 1, c),
-                    self.w_c * d + self.__dtw_helper(r, c - 1),
-                )
-
-                curr_cost = d + min_cost
-                self.D[r][c] = curr_cost
-
-        return self.D[r][c]
+            curr[r_lo + 1 : r_hi + 2] = d + min_cost
+        return curr
+
+    def __row_range(self, k: int) -> Tuple[int, int]:
+        return max(0, k - self.D_shape[1] + 1), min(k, self.D_shape[0] - 1)
+
+    def __empty_diagonal(self) -> np.ndarray:
+        return np.full(self.D_shape[0] + 1, np.inf, dtype=np.float64)
+
+    def __compact(self, k: int, diagonal: np.ndarray) -> CompactDiagonal:
+        r_lo, r_hi = self.__row_range(k)
+        return r_lo, diagonal[r_lo + 1 : r_hi + 2].copy()
+
+    def __expand(self, k: int, compact: CompactDiagonal) -> np.ndarray:
+        r_lo, values = compact
+        diagonal = self.__empty_diagonal()
+        diagonal[r_lo + 1 : r_lo + 1 + len(values)] = values
+        return diagonal
+
+    def __D_get(self, r: int, c: int) -> np.float64:
+        k = r + c
+        compact = self.__diagonals.get(k)
+        if compact is None:
+            compact = self.__block[k]
+        r_lo, values = compact
+        return values[r - r_lo]
 
     def __log(self, msg: str):
         eprint(f"[{self.__class__.__name__}] {msg}")
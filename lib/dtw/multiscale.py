@@ -0,0 +1,201 @@
+from ..eprint import eprint
+from typing import List, Tuple, Union
+from ..dtw.shared import batch_cost
+from ..sharedtypes import DTWPathElemType, ExtractedFeature, ExtractedFeatureMatrix
+import numpy as np
+
+# A row of the window: (first column index, cumulative costs of its cells)
+WindowRow = Tuple[int, np.ndarray]
+
+
+class MultiscaleDTW:
+    def __init__(
+        self,
+        P: Union[ExtractedFeatureMatrix, List[ExtractedFeature]],
+        S: Union[ExtractedFeatureMatrix, List[ExtractedFeature]],
+        w_a: float = 1.0,
+        w_b: float = 1.0,
+        w_c: float = 1.0,
+        radius: int = 10,
+    ):
+        """
+        Coarse-to-fine DTW (as FastDTW): P and S are halved repeatedly by averaging
+        pairs of frames until either has at most radius + 2 frames, which are aligned
+        with the full cost matrix. The path of every level is then projected onto
+        the next finer level, widened by radius cells on every side, and that level
+        is aligned within this window only.
+
+        Time and memory grow linearly with len(P) + len(S) (and radius). The path is
+        the same as ClassicalDTW's if the window contains it, otherwise close to it.
+        """
+        if len(P) == 0:
+            raise ValueError(f"Empty P")
+        if len(S) == 0:
+            raise ValueError(f"Empty S")
+        P = np.ascontiguousarray(P)
+        S = np.ascontiguousarray(S)
+        if len(P.shape) != 2:
+            raise ValueError(f"P must be 2D")
+        if len(S.shape) != 2:
+            raise ValueError(f"S must be 2D")
+        if radius < 0:
+            raise ValueError(f"radius must be positive")
+
+        self.w_a = w_a
+        self.w_b = w_b
+        self.w_c = w_c
+        self.radius = radius
+
+        self.P = P  # performance
+        self.S = S  # score
+
+        self.__log("Initialised successfully")
+
+    def dtw(self) -> List[DTWPathElemType]:
+        """
+        Perform dtw.
+        Returns the path (shape: (len(S), 2)) from (0, 0) to (len(S), len(P))
+        """
+        # levels from the finest (P, S) to the coarsest
+        levels: List[Tuple[np.ndarray, np.ndarray]] = [(self.P, self.S)]
+        min_len = self.radius + 2
+        while min(len(levels[-1][0]), len(levels[-1][1])) > min_len:
+            P, S = levels[-1]
+            levels.append((self.__pool(P), self.__pool(S)))
+
+        P, S = levels[-1]
+        window = [(0, len(S) - 1)] * len(P)
+        path = self.__dtw_window(P, S, window)
+        for P, S in reversed(levels[:-1]):
+            window = self.__project(path, len(P), len(S))
+            path = self.__dtw_window(P, S, window)
+        return path
+
+    @staticmethod
+    def __pool(X: np.ndarray) -> np.ndarray:
+        """
+        Average every pair of frames, the last frame alone if len(X) is odd.
+        """
+        n = len(X) // 2
+        pooled = (X[0 : 2 * n : 2] + X[1 : 2 * n : 2]) / 2
+        if len(X) % 2 == 1:
+            pooled = np.concatenate((pooled, X[-1:]))
+        return pooled
+
+    def __project(
+        self, path: List[DTWPathElemType], n_P: int, n_S: int
+    ) -> List[Tuple[int, int]]:
+        """
+        Columns (first, last) of every row of the window at the level with n_P
+        rows and n_S columns, from the path of the coarser level: the cells each
+        cell of the path covers, widened by radius cells on every side.
+        """
+        lo = np.full(n_P, n_S, dtype=np.int64)
+        hi = np.full(n_P, -1, dtype=np.int64)
+        for r, c in path:
+            for fine_r in range(2 * r, min(2 * r + 2, n_P)):
+                lo[fine_r] = min(lo[fine_r], 2 * c)
+                hi[fine_r] = max(hi[fine_r], min(2 * c + 1, n_S - 1))
+
+        widened_lo = lo.copy()
+        widened_hi = hi.copy()
+        for offset in range(1, self.radius + 1):
+            widened_lo[offset:] = np.minimum(widened_lo[offset:], lo[:-offset])
+            widened_lo[:-offset] = np.minimum(widened_lo[:-offset], lo[offset:])
+            widened_hi[offset:] = np.maximum(widened_hi[offset:], hi[:-offset])
+            widened_hi[:-offset] = np.maximum(widened_hi[:-offset], hi[offset:])
+        widened_lo = np.maximum(0, widened_lo - self.radius)
+        widened_hi = np.minimum(n_S - 1, widened_hi + self.radius)
+        return list(zip(widened_lo.tolist(), widened_hi.tolist()))
+
+    def __dtw_window(
+        self, P: np.ndarray, S: np.ndarray, window: List[Tuple[int, int]]
+    ) -> List[DTWPathElemType]:
+        """
+        Same as ClassicalDTW, over the cells of the window only: window[r] holds the
+        first and last columns of row r, every other cell costs inf.
+        """
+        D: List[WindowRow] = []
+        prev_lo, prev_row = 0, np.empty(0, dtype=np.float64)
+        for r, (lo, hi) in enumerate(window):
+            d = batch_cost(P[r], S[lo : hi + 1])
+            if r == 0:
+                other = np.full(d.shape, np.inf)
+            else:
+                diag = self.__get_row(prev_lo, prev_row, lo - 1, hi - 1)
+                left = self.__get_row(prev_lo, prev_row, lo, hi)
+                other = np.minimum(self.w_a * d + diag, self.w_b * d + left)
+            row = self.__accumulate(d, other, self.w_c, r == 0 and lo == 0)
+            D.append((lo, row))
+            prev_lo, prev_row = lo, row
+
+        path: List[DTWPathElemType] = []
+        r = len(P) - 1
+        c = len(S) - 1
+        while r >= 0 and c >= 0:
+            path.append((r, c))
+            diag_cost = self.__D_get(D, r - 1, c - 1)
+            left_cost = self.__D_get(D, r - 1, c)
+            down_cost = self.__D_get(D, r, c - 1)
+
+            min_cost = min(diag_cost, left_cost, down_cost)
+
+            if r == 0 and c == 0:
+                break
+            if min_cost == diag_cost:
+                # prefer diag if tie
+                r -= 1
+                c -= 1
+            elif min_cost == left_cost:
+                r -= 1
+            else:
+                c -= 1
+
+        # Reverse path.
+        path = list(reversed(path))
+
+        return path
+
+    @staticmethod
+    def __get_row(lo: int, row: np.ndarray, first: int, last: int) -> np.ndarray:
+        """
+        Cumulative costs of columns first..last (inclusive) of a row starting at
+        column lo, inf outside of it.
+        """
+        res = np.full(last - first + 1, np.inf, dtype=np.float64)
+        start = max(first, lo)
+        end = min(last, lo + len(row) - 1)
+        if start <= end:
+            res[start - first : end - first + 1] = row[start - lo : end - lo + 1]
+        return res
+
+    @staticmethod
+    def __accumulate(
+        d: np.ndarray, other: np.ndarray, w: float, is_origin: bool
+    ) -> np.ndarray:
+        """
+        Run the cumulative cost recurrence along a row, where `other` holds the
+        already-weighted costs from the previous row. The first cell of the matrix,
+        (0, 0), costs d alone.
+        """
+        res = np.empty(d.shape, dtype=np.float64)
+        prev = np.inf
+        for k, (d_k, other_k) in enumerate(zip(d.tolist(), other.tolist())):
+            if is_origin and k == 0:
+                prev = d_k
+            else:
+                prev = d_k + min(other_k, w * d_k + prev)
+            res[k] = prev
+        return res
+
+    @staticmethod
+    def __D_get(D: List[WindowRow], r: int, c: int) -> float:
+        if r < 0 or c < 0:
+            return np.inf
+        lo, row = D[r]
+        if c < lo or c >= lo + len(row):
+            return np.inf
+        return row[c - lo]
+
+    def __log(self, msg: str):
+        eprint(f"[{self.__class__.__name__}] {msg}")
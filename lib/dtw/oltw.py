@@ -1,7 +1,14 @@
 from ..eprint import eprint
-from ..dtw.shared import cost
-from ..sharedtypes import ExtractedFeature, ExtractedFeatureQueue, FollowerOutputQueue
-from typing import Set, Tuple, List
+from ..dtw.shared import batch_cost, cost
+from ..mputils import AnyOptionalQueue
+from ..tracing import Tracer
+from ..sharedtypes import (
+    ExtractedFeature,
+    ExtractedFeatureMatrix,
+    ExtractedFeatureQueue,
+    FollowerOutputQueue,
+)
+from typing import Callable, Optional, Set, Tuple, List, Union
 import numpy as np
 from enum import Enum
 
@@ -15,24 +22,46 @@ DIR_I = set([Direction.I])
 DIR_J = set([Direction.J])
 DIR_IJ = set([Direction.I, Direction.J])
 
+# With an adaptive search window, every step it shrinks by SEARCH_WINDOW_SHRINK
+# while the margin of the best cell is at least SEARCH_WINDOW_SHRINK_MARGIN, and
+# grows by SEARCH_WINDOW_GROW while it is below SEARCH_WINDOW_GROW_MARGIN. Margins
+# are in mean costs per step of the best cell's path. While following confidently,
+# margins are mostly in the hundreds (rarely below 80) and through unrelated
+# features they are mostly below 10, so both thresholds sit between the two; the
+# gap between them keeps the window from flipping between shrinking and growing.
+SEARCH_WINDOW_SHRINK = 0.95
+SEARCH_WINDOW_GROW = 2.0
+SEARCH_WINDOW_SHRINK_MARGIN = 40.0
+SEARCH_WINDOW_GROW_MARGIN = 20.0
+
 
 class OLTW:
     def __init__(
         self,
         P_queue: ExtractedFeatureQueue,
-        S: List[ExtractedFeature],
+        S: Union[ExtractedFeatureMatrix, List[ExtractedFeature]],
         follower_output_queue: FollowerOutputQueue,
         max_run_count: int,
         search_window: int,  # c
         w_a: float = 1.0,
         w_b: float = 1.0,
         w_c: float = 1.0,
+        trace_queue: Optional[AnyOptionalQueue] = None,
+        get_frame: Optional[Callable[[int], int]] = None,
+        min_search_window: int = 0,
     ):
+        """
+        With a min_search_window between 0 and search_window, the search window
+        adapts between the two: it shrinks while the best cell stands out from the
+        cells away from it, and grows back when it no longer does (e.g. after a
+        jump or an unclear passage).
+        """
         if len(S) == 0:
             raise ValueError(f"Empty S")
-        if len(S[0].shape) != 1:
+        S = np.ascontiguousarray(S)
+        if len(S.shape) != 2:
             raise ValueError(
-                f"S must be a list of 1D ndarrays, got a list of {S[0].shape} ndarrays"
+                f"S must be a list of 1D ndarrays or a 2D ndarray, got shape {S.shape}"
             )
 
         self.S = S  # score
@@ -40,14 +69,24 @@ class OLTW:
         self.follower_output_queue = follower_output_queue
         self.MAX_RUN_COUNT = max_run_count
         self.run_count: int = 1
-        self.C = search_window
-        # Preallocate D to a square self.S
-        self.D = np.ones((len(self.S), len(self.S)), dtype=np.float64) * np.inf
-        # Preallocate P
-        self.P = np.zeros((self.S[0].shape[0], self.S[0].shape[0]), dtype=np.float64)
+        self.C = search_window  # current search window
+        self.C_max = search_window
+        self.C_min = min(max(1, min_search_window), search_window)
+        self.adaptive = 0 < min_search_window < search_window
+        # Only cells within C of the current (i, j) are ever read, so D and P are
+        # circular buffers of C_max + 1 rows (and columns) indexed modulo their size.
+        # Cell (i, j) of the full matrix lives at self.D[i % R][j % R].
+        self.R = self.C_max + 1
+        self.D = np.full((self.R, self.R), np.inf, dtype=np.float64)
+        self.P = np.zeros((self.R, self.S.shape[1]), dtype=np.float64)
+        # offsets of the cells searched for the lowest cost from the current (i, j)
+        self.__offsets = np.arange(self.R)
         self.w_a = w_a
         self.w_b = w_b
         self.w_c = w_c
+        self.__tracer = Tracer(self.__class__.__name__, trace_queue)
+        # performance frame of each row i for the trace, if rows are not frames
+        self.__get_frame = get_frame if get_frame is not None else lambda i: i
 
         self.__log("Initialised successfully")
 
@@ -56,6 +95,10 @@ class OLTW:
         Performs oltw
         Writes to self.follower_output_queue
         """
+        self.__dtw()
+        self.__tracer.flush()
+
+    def __dtw(self):
         ### Step 1
         i = 0
         j = 0
@@ -66,19 +109,21 @@ class OLTW:
         j_prime = 0
         # write to output queue
         self.follower_output_queue.put((i_prime, j_prime))
+        self.__tracer.record("follower_put", -1)  # before any frame
 
         ### Step 2
         p_i = self.P_queue.get()
         if p_i is None:
             self.follower_output_queue.put(None)
             return
+        self.__tracer.record("follower_get", self.__get_frame(i))
+        self.__tracer.record_depth("feature_queue", self.P_queue)
         self.__receive_p_i(i, p_i)
         s_j = self.S[j]
 
         ### Step 3
         d = cost(p_i, s_j)
-        self.__D_set(i, j, d)
-        # print(np.flipud(self.D.T))
+        self.D[0][0] = d
 
         while True:
             # Abort if last of S reached
@@ -98,22 +143,18 @@ class OLTW:
                 if p_i is None:
                     self.follower_output_queue.put(None)
                     return
+                self.__tracer.record("follower_get", self.__get_frame(i))
+                self.__tracer.record_depth("feature_queue", self.P_queue)
                 self.__receive_p_i(i, p_i)
                 # compute required D elements
-                for J in range(max(0, j - self.C + 1), j + 1):
-                    s_J = self.S[J]
-                    d = cost(p_i, s_J)
-                    self.__D_set(i, J, d)
+                self.__expand_row(i, max(0, j - self.C + 1), j)
 
             if Direction.J in current:
                 # increment j
                 j += 1
-                s_j = self.S[j]
+                self.D[:, j % self.R] = np.inf
                 # compute required D elements
-                for I in range(max(0, i - self.C + 1), i + 1):
-                    p_I = self.P[I]
-                    d = cost(p_I, s_j)
-                    self.__D_set(I, j, d)
+                self.__expand_col(j, max(0, i - self.C + 1), i)
 
             ### Step 6
             if current == previous and previous != DIR_IJ:
@@ -123,26 +164,64 @@ class OLTW:
             previous = current
 
             ### update i_prime and j_prime and write to follower_output_queue
-            i_prime, j_prime = self.__get_i_j_prime(i, j)
+            i_prime, j_prime, _, margin = self.__get_i_j_prime(i, j)
+            if self.adaptive:
+                self.__adapt_search_window(margin)
             # print(np.flipud(self.D.T))
             self.follower_output_queue.put((i_prime, j_prime))
+            self.__tracer.record("follower_put", self.__get_frame(i))
+
+    def __get_i_j_prime(self, i: int, j: int) -> Tuple[int, int, float, float]:
+        """
+        Return the cell with the lowest cumulative cost out of the last C cells of
+        column j (from row i down) and the C - 1 cells of row i before column j,
+        with its cost. Ties go to the first of these in that order.
+
+        With an adaptive search window, also return the margin of that cell (see
+        __get_margin), 0 otherwise.
+        """
+        R = self.R
+        n_col = max(0, min(i + 1, self.C))
+        n_row = max(0, min(j, self.C - 1))
+        if n_col == 0:
+            return i, j, np.inf, 0.0
+        # both runs of cells in one array, in the order they are compared
+        costs = np.concatenate(
+            (
+                self.D[(i - self.__offsets[:n_col]) % R, j % R],
+                self.D[i % R, (j - 1 - self.__offsets[:n_row]) % R],
+            )
+        )
+        k = int(np.argmin(costs))
+        best = float(costs[k])
+        if k < n_col:
+            i_prime, j_prime = i - k, j
+        else:
+            i_prime, j_prime = i, j - 1 - (k - n_col)
+        margin = 0.0
+        if self.adaptive:
+            margin = self.__get_margin(costs, k, n_col, n_row, best / (i + j + 1))
+        return i_prime, j_prime, best, margin
+
+    def __get_margin(
+        self, costs: np.ndarray, k: int, n_col: int, n_row: int, step_cost: float
+    ) -> float:
+        """
+        How far ahead of the best of the cells more than C_min // 2 cells away from
+        it (along column j and row i) the best cell k is, in step_cost units.
+        """
+        # position of every cell along column j and row i, from the corner (i, j)
+        pos = np.concatenate((self.__offsets[:n_col], -1 - self.__offsets[:n_row]))
+        far = costs[np.abs(pos - pos[k]) > self.C_min // 2]
+        if len(far) == 0 or step_cost <= 0:
+            return np.inf
+        return float((np.min(far) - costs[k]) / step_cost)
 
-    def __get_i_j_prime(self, i: int, j: int) -> Tuple[int, int]:
-        i_prime, j_prime = (i, j)
-        min_D = np.inf
-        curr_i = i
-        while curr_i >= 0 and curr_i > (i - self.C):
-            if self.D[curr_i][j] < min_D:
-                i_prime, j_prime = (curr_i, j)
-                min_D = self.D[i_prime][j_prime]
-            curr_i -= 1
-        curr_j = j - 1
-        while curr_j >= 0 and curr_j > (j - self.C):
-            if self.D[i][curr_j] < min_D:
-                i_prime, j_prime = (i, curr_j)
-                min_D = self.D[i_prime][j_prime]
-            curr_j -= 1
-        return i_prime, j_prime
+    def __adapt_search_window(self, margin: float):
+        if margin >= SEARCH_WINDOW_SHRINK_MARGIN:
+            self.C = max(self.C_min, int(self.C * SEARCH_WINDOW_SHRINK))
+        elif margin < SEARCH_WINDOW_GROW_MARGIN:
+            self.C = min(self.C_max, int(self.C * SEARCH_WINDOW_GROW))
 
     def __get_next_direction(
         self, i: int, j: int, i_prime: int, j_prime: int, previous: Set[Direction]
@@ -160,45 +239,69 @@ class OLTW:
             return DIR_I
         return DIR_IJ
 
-    def __D_set(self, i: int, j: int, d: np.float64):
+    def __expand_row(self, i: int, J_start: int, J_end: int):
         """
-        at (i, j) and cost d assign to self.D
+        Compute row i of self.D for columns J_start..J_end (inclusive).
+        The costs are computed in one batch; the cumulative costs are then
+        accumulated along the row as each cell depends on its left neighbour.
         """
-        if i >= self.D.shape[0]:
-            required_len = int(i * 1.5)  # 1.5x leeway
-            to_add = required_len - self.P.shape[0]
-            self.D = np.append(
-                self.D,
-                np.ones((to_add, len(self.S)), dtype=np.float64) * np.inf,
-                axis=0,
-            )
-        if (i, j) == (0, 0):
-            self.D[i][j] = d
+        R = self.R
+        d = batch_cost(self.P[i % R], self.S[J_start : J_end + 1])
+        cols = np.arange(J_start, J_end + 1) % R
+        row = self.D[i % R]
+        if i == 0:
+            vert = np.full(d.shape, np.inf)
         else:
-            self.D[i][j] = d + min(
-                self.w_a * d + self.__D_get(i - 1, j - 1),
-                self.w_b * d + self.__D_get(i - 1, j),
-                self.w_c * d + self.__D_get(i, j - 1),
-            )
+            prev_row = self.D[(i - 1) % R]
+            diag = np.empty(d.shape, dtype=np.float64)
+            diag[1:] = prev_row[cols[:-1]]
+            diag[0] = prev_row[(J_start - 1) % R] if J_start > 0 else np.inf
+            vert = np.minimum(self.w_a * d + diag, self.w_b * d + prev_row[cols])
+        prev = row[(J_start - 1) % R] if J_start > 0 else np.inf
+        row[cols] = self.__accumulate(d, vert, prev, self.w_c)
 
-    def __D_get(self, i: int, j: int) -> np.float64:
-        if i >= self.D.shape[0] or j >= self.D.shape[1]:
-            raise ValueError(
-                f"Out of range: want ({i}, {j}) from distance matrix of shape {self.D.shape}"
-            )
-        if i < 0 or j < 0:
-            return np.float64(np.inf)
+    def __expand_col(self, j: int, I_start: int, I_end: int):
+        """
+        Compute column j of self.D for rows I_start..I_end (inclusive).
+        Same as __expand_row with the roles of the neighbours swapped.
+        """
+        R = self.R
+        rows = np.arange(I_start, I_end + 1) % R
+        d = batch_cost(self.S[j], self.P[rows])
+        col = self.D[:, j % R]
+        if j == 0:
+            horiz = np.full(d.shape, np.inf)
+        else:
+            prev_col = self.D[:, (j - 1) % R]
+            diag = np.empty(d.shape, dtype=np.float64)
+            diag[1:] = prev_col[rows[:-1]]
+            diag[0] = prev_col[(I_start - 1) % R] if I_start > 0 else np.inf
+            horiz = np.minimum(self.w_a * d + diag, self.w_c * d + prev_col[rows])
+        prev = col[(I_start - 1) % R] if I_start > 0 else np.inf
+        col[rows] = self.__accumulate(d, horiz, prev, self.w_b)
 
-        return self.D[i][j]
+    @staticmethod
+    def __accumulate(
+        d: np.ndarray, other: np.ndarray, prev: float, w: float
+    ) -> List[float]:
+        """
+        Run the cumulative cost recurrence along a new row or column, where
+        `other` holds the already-weighted costs from the two neighbours that
+        are not in the row or column and `prev` is the cumulative cost
+        preceding the first cell.
+        """
+        res: List[float] = []
+        for d_k, other_k in zip(d.tolist(), other.tolist()):
+            prev = d_k + min(other_k, w * d_k + prev)
+            res.append(prev)
+        return res
 
     def __receive_p_i(self, i: int, p_i: np.ndarray):
-        if i >= self.P.shape[0]:
-            required_len = int(i * 1.5)  # 1.5x leeway
-            to_add = required_len - self.P.shape[0]
-            self.P = np.append(
-                self.P, np.zeros((to_add, self.S[0].shape[0]), dtype=np.float64), axis=0
-            )
-        self.P[i] = p_i
+        """
+        Store p_i and clear the row of self.D it reuses.
+        """
+        self.P[i % self.R] = p_i
+        self.D[i % self.R] = np.inf
 
     def __log(self, msg: str):
         eprint(f"[{self.__class__.__name__}] {msg}")
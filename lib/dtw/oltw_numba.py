@@ -0,0 +1,376 @@
+from ..eprint import eprint
+from ..mputils import AnyOptionalQueue
+from ..tracing import Tracer
+from ..sharedtypes import (
+    ExtractedFeature,
+    ExtractedFeatureMatrix,
+    ExtractedFeatureQueue,
+    FollowerOutputQueue,
+)
+from typing import Callable, List, Optional, Tuple, Union
+from numba import njit  # type: ignore
+import numpy as np
+
+# Directions as bit flags, 0 before the first step
+DIR_I = 1
+DIR_J = 2
+DIR_IJ = DIR_I | DIR_J
+
+# Block size below which NumPy sums without splitting
+PW_BLOCKSIZE = 128
+
+
+class OLTWNumba:
+    """
+    Same as OLTW, with every step compiled by numba: a step costs a single call
+    into compiled code, so much larger search windows can be followed live.
+
+    The output is identical to OLTW's, as the costs are summed in the same order
+    as NumPy sums them.
+    """
+
+    def __init__(
+        self,
+        P_queue: ExtractedFeatureQueue,
+        S: Union[ExtractedFeatureMatrix, List[ExtractedFeature]],
+        follower_output_queue: FollowerOutputQueue,
+        max_run_count: int,
+        search_window: int,  # c
+        w_a: float = 1.0,
+        w_b: float = 1.0,
+        w_c: float = 1.0,
+        trace_queue: Optional[AnyOptionalQueue] = None,
+        get_frame: Optional[Callable[[int], int]] = None,
+    ):
+        if len(S) == 0:
+            raise ValueError(f"Empty S")
+        S = np.ascontiguousarray(S, dtype=np.float64)
+        if len(S.shape) != 2:
+            raise ValueError(
+                f"S must be a list of 1D ndarrays or a 2D ndarray, got shape {S.shape}"
+            )
+
+        self.S = S  # score
+        self.P_queue = P_queue
+        self.follower_output_queue = follower_output_queue
+        # typed as in compile_oltw_numba, so that nothing is compiled while following
+        self.MAX_RUN_COUNT = int(max_run_count)
+        self.C = int(search_window)
+        # circular buffers, as in OLTW
+        self.R = self.C + 1
+        self.D = np.full((self.R, self.R), np.inf, dtype=np.float64)
+        self.P = np.zeros((self.R, self.S.shape[1]), dtype=np.float64)
+        self.w_a = float(w_a)
+        self.w_b = float(w_b)
+        self.w_c = float(w_c)
+        self.__tracer = Tracer(self.__class__.__name__, trace_queue)
+        # performance frame of each row i for the trace, if rows are not frames
+        self.__get_frame = get_frame if get_frame is not None else lambda i: i
+
+        compile_oltw_numba()
+        self.__log("Initialised successfully")
+
+    def dtw(self):
+        """
+        Performs oltw
+        Writes to self.follower_output_queue
+        """
+        self.__dtw()
+        self.__tracer.flush()
+
+    def __dtw(self):
+        ### Step 1
+        i = 0
+        j = 0
+        previous = 0
+        run_count = 1
+
+        i_prime = 0
+        j_prime = 0
+        self.follower_output_queue.put((i_prime, j_prime))
+        self.__tracer.record("follower_put", -1)  # before any frame
+
+        ### Step 2
+        p_i = self.__get_p_i(i)
+        if p_i is None:
+            self.follower_output_queue.put(None)
+            return
+        self.P[0] = p_i
+
+        ### Step 3
+        self.D[0][0] = _cost(self.P[0], self.S[0])
+        current = _get_next_direction(
+            i, j, i_prime, j_prime, previous, run_count, self.C, self.MAX_RUN_COUNT
+        )
+        # passed to steps that do not receive a p_i
+        no_p_i = self.P[0]
+
+        while True:
+            # Abort if last of S reached
+            if j == len(self.S) - 1:
+                self.follower_output_queue.put(None)
+                return
+
+            p_i = no_p_i
+            if current & DIR_I:
+                p_i = self.__get_p_i(i + 1)
+                if p_i is None:
+                    self.follower_output_queue.put(None)
+                    return
+
+            ### Steps 4 to 6
+            i, j, run_count, i_prime, j_prime, previous, current = _step(
+                self.D,
+                self.P,
+                self.S,
+                p_i,
+                i,
+                j,
+                current,
+                previous,
+                run_count,
+                self.C,
+                self.MAX_RUN_COUNT,
+                self.w_a,
+                self.w_b,
+                self.w_c,
+            )
+
+            self.follower_output_queue.put((i_prime, j_prime))
+            self.__tracer.record("follower_put", self.__get_frame(i))
+
+    def __get_p_i(self, i: int) -> Optional[np.ndarray]:
+        p_i = self.P_queue.get()
+        if p_i is None:
+            return None
+        self.__tracer.record("follower_get", self.__get_frame(i))
+        self.__tracer.record_depth("feature_queue", self.P_queue)
+        return np.ascontiguousarray(p_i, dtype=np.float64)
+
+    def __log(self, msg: str):
+        eprint(f"[{self.__class__.__name__}] {msg}")
+
+
+def compile_oltw_numba():
+    """
+    Compile the steps ahead of the first frame, on a tiny input.
+    """
+    S = np.zeros((3, 2), dtype=np.float64)
+    D = np.full((2, 2), np.inf, dtype=np.float64)
+    P = np.zeros((2, 2), dtype=np.float64)
+    D[0][0] = _cost(P[0], S[0])
+    _step(D, P, S, P[0], 0, 0, DIR_IJ, 0, 1, 1, 3, 1.0, 1.0, 1.0)
+
+
+@njit(cache=True)
+def _block_abs_diff_sum(a, b, start, n):
+    """
+    Sum of |a[k] - b[k]| for k in start..start+n-1, n <= PW_BLOCKSIZE, added up in
+    the same order as NumPy does.
+    """
+    if n < 8:
+        res = 0.0
+        for k in range(start, start + n):
+            res += abs(a[k] - b[k])
+        return res
+    r0 = abs(a[start] - b[start])
+    r1 = abs(a[start + 1] - b[start + 1])
+    r2 = abs(a[start + 2] - b[start + 2])
+    r3 = abs(a[start + 3] - b[start + 3])
+    r4 = abs(a[start + 4] - b[start + 4])
+    r5 = abs(a[start + 5] - b[start + 5])
+    r6 = abs(a[start + 6] - b[start + 6])
+    r7 = abs(a[start + 7] - b[start + 7])
+    end = start + n
+    k = start + 8
+    while k < end - (n % 8):
+        r0 += abs(a[k] - b[k])
+        r1 += abs(a[k + 1] - b[k + 1])
+        r2 += abs(a[k + 2] - b[k + 2])
+        r3 += abs(a[k + 3] - b[k + 3])
+        r4 += abs(a[k + 4] - b[k + 4])
+        r5 += abs(a[k + 5] - b[k + 5])
+        r6 += abs(a[k + 6] - b[k + 6])
+        r7 += abs(a[k + 7] - b[k + 7])
+        k += 8
+    res = ((r0 + r1) + (r2 + r3)) + ((r4 + r5) + (r6 + r7))
+    while k < end:
+        res += abs(a[k] - b[k])
+        k += 1
+    return res
+
+
+@njit(cache=True)
+def _pairwise_abs_diff_sum(a, b):
+    """
+    Sum of |a - b|, bit-identical to NumPy's pairwise summation: blocks of up to
+    PW_BLOCKSIZE are summed in order, longer ranges are split in two (at a
+    multiple of 8) and the sums of the halves added.
+
+    The splits are walked with a stack rather than recursion, as numba cannot
+    cache recursive functions.
+    """
+    n = len(a)
+    if n <= PW_BLOCKSIZE:
+        return _block_abs_diff_sum(a, b, 0, n)
+    # (start, length) of ranges to sum, length -1 to add the top two sums
+    tasks = np.empty((128, 2), dtype=np.int64)
+    sums = np.empty(64, dtype=np.float64)
+    n_tasks = 1
+    tasks[0, 0] = 0
+    tasks[0, 1] = n
+    n_sums = 0
+    while n_tasks > 0:
+        n_tasks -= 1
+        start = tasks[n_tasks, 0]
+        length = tasks[n_tasks, 1]
+        if length < 0:
+            n_sums -= 1
+            sums[n_sums - 1] = sums[n_sums - 1] + sums[n_sums]
+        elif length <= PW_BLOCKSIZE:
+            sums[n_sums] = _block_abs_diff_sum(a, b, start, length)
+            n_sums += 1
+        else:
+            half = length // 2
+            half -= half % 8
+            # the first half is summed first
+            tasks[n_tasks, 1] = -1
+            tasks[n_tasks + 1, 0] = start + half
+            tasks[n_tasks + 1, 1] = length - half
+            tasks[n_tasks + 2, 0] = start
+            tasks[n_tasks + 2, 1] = half
+            n_tasks += 3
+    return sums[0]
+
+
+@njit(cache=True)
+def _cost(a, b):
+    """
+    Same as shared.cost
+    """
+    return 0.0 + _pairwise_abs_diff_sum(a, b)
+
+
+@njit(cache=True)
+def _get_next_direction(i, j, i_prime, j_prime, previous, run_count, C, max_run_count):
+    if i < C:
+        return DIR_IJ
+    elif run_count > max_run_count:
+        if previous == DIR_I:
+            return DIR_J
+        return DIR_I
+
+    if i_prime < i:
+        return DIR_J
+    elif j_prime < j:
+        return DIR_I
+    return DIR_IJ
+
+
+@njit(cache=True)
+def _expand_row(D, P, S, i, J_start, J_end, w_a, w_b, w_c):
+    """
+    Compute row i of D for columns J_start..J_end (inclusive).
+    """
+    R = D.shape[0]
+    row = D[i % R]
+    prev = row[(J_start - 1) % R] if J_start > 0 else np.inf
+    for j in range(J_start, J_end + 1):
+        d = _cost(P[i % R], S[j])
+        if i == 0:
+            vert = np.inf
+        else:
+            prev_row = D[(i - 1) % R]
+            diag = prev_row[(j - 1) % R] if j > 0 else np.inf
+            vert = min(w_a * d + diag, w_b * d + prev_row[j % R])
+        prev = d + min(vert, w_c * d + prev)
+        row[j % R] = prev
+
+
+@njit(cache=True)
+def _expand_col(D, P, S, j, I_start, I_end, w_a, w_b, w_c):
+    """
+    Compute column j of D for rows I_start..I_end (inclusive).
+    """
+    R = D.shape[0]
+    prev = D[(I_start - 1) % R, j % R] if I_start > 0 else np.inf
+    for i in range(I_start, I_end + 1):
+        d = _cost(S[j], P[i % R])
+        if j == 0:
+            horiz = np.inf
+        else:
+            diag = D[(i - 1) % R, (j - 1) % R] if i > 0 else np.inf
+            horiz = min(w_a * d + diag, w_c * d + D[i % R, (j - 1) % R])
+        prev = d + min(horiz, w_b * d + prev)
+        D[i % R, j % R] = prev
+
+
+@njit(cache=True)
+def _get_i_j_prime(D, i, j, C):
+    R = D.shape[0]
+    i_prime = i
+    j_prime = j
+    min_D = np.inf
+    curr_i = i
+    while curr_i >= 0 and curr_i > (i - C):
+        if D[curr_i % R, j % R] < min_D:
+            i_prime = curr_i
+            j_prime = j
+            min_D = D[curr_i % R, j % R]
+        curr_i -= 1
+    curr_j = j - 1
+    while curr_j >= 0 and curr_j > (j - C):
+        if D[i % R, curr_j % R] < min_D:
+            i_prime = i
+            j_prime = curr_j
+            min_D = D[i % R, curr_j % R]
+        curr_j -= 1
+    return i_prime, j_prime
+
+
+@njit(cache=True)
+def _step(
+    D,
+    P,
+    S,
+    p_i,
+    i,
+    j,
+    current,
+    previous,
+    run_count,
+    C,
+    max_run_count,
+    w_a,
+    w_b,
+    w_c,
+) -> Tuple[int, int, int, int, int, int, int]:
+    """
+    Advance i and/or j in the `current` direction, receiving p_i if i is advanced.
+
+    Returns (i, j, run_count, i_prime, j_prime, previous, current) after the step,
+    where current is the direction of the next step.
+    """
+    R = D.shape[0]
+    if current & DIR_I:
+        i += 1
+        P[i % R] = p_i
+        D[i % R] = np.inf
+        _expand_row(D, P, S, i, max(0, j - C + 1), j, w_a, w_b, w_c)
+
+    if current & DIR_J:
+        j += 1
+        D[:, j % R] = np.inf
+        _expand_col(D, P, S, j, max(0, i - C + 1), i, w_a, w_b, w_c)
+
+    if current == previous and previous != DIR_IJ:
+        run_count += 1
+    else:
+        run_count = 1
+    previous = current
+
+    i_prime, j_prime = _get_i_j_prime(D, i, j, C)
+    current = _get_next_direction(
+        i, j, i_prime, j_prime, previous, run_count, C, max_run_count
+    )
+    return i, j, run_count, i_prime, j_prime, previous, current
@@ -3,3 +3,19 @@ import numpy as np
 
 def cost(a: np.ndarray, b: np.ndarray) -> np.float64:
     return np.sum(np.abs(a - b))
+
+
+def batch_cost(a: np.ndarray, B: np.ndarray) -> np.ndarray:
+    """
+    Cost between a (1D) and every row of B (2D), as one NumPy operation.
+    Element k equals cost(a, B[k]).
+    """
+    return np.sum(np.abs(B - a), axis=1)
+
+
+def pairwise_cost(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+    """
+    Cost between matching rows of A and B (both 2D), as one NumPy operation.
+    Element k equals cost(A[k], B[k]).
+    """
+    return np.sum(np.abs(A - B), axis=1)
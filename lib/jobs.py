@@ -0,0 +1,81 @@
+from .eprint import eprint
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import multiprocessing as mp
+import os
+import queue
+import traceback
+
+
+def get_max_jobs(jobs: int) -> int:
+    """
+    Number of jobs to run at once: `jobs` capped by the CPU count, or the CPU count
+    if `jobs` is 0.
+    """
+    cpu_count = os.cpu_count() or 1
+    if jobs <= 0:
+        return cpu_count
+    return min(jobs, cpu_count)
+
+
+def parse_jobs_arg(argv: List[str]) -> Tuple[List[str], int]:
+    """
+    Take `--jobs <N>` out of argv. Returns (the rest of argv, N), N is 1 if not given.
+    """
+    if "--jobs" not in argv:
+        return argv, 1
+    idx = argv.index("--jobs")
+    if idx + 1 >= len(argv):
+        raise ValueError("--jobs needs a number of jobs")
+    return argv[:idx] + argv[idx + 2 :], int(argv[idx + 1])
+
+
+def run_jobs(jobs: List[Callable[[], Any]], max_jobs: int) -> List[Any]:
+    """
+    Run independent jobs, at most `max_jobs` at once, and return their results in
+    order. With max_jobs of 1 they are run one after another in this process.
+
+    Every job gets its own process, as a job can start processes of its own (which
+    workers of a multiprocessing.Pool cannot). Raises RuntimeError once a job fails,
+    after the running ones are done.
+    """
+    if max_jobs <= 1:
+        return [job() for job in jobs]
+
+    results: List[Any] = [None] * len(jobs)
+    result_queue: "mp.Queue[Tuple[int, bool, Any]]" = mp.Queue()
+    running: Dict[int, mp.Process] = {}
+    next_job = 0
+    error: Optional[str] = None
+    while len(running) > 0 or (next_job < len(jobs) and error is None):
+        while error is None and next_job < len(jobs) and len(running) < max_jobs:
+            proc = mp.Process(
+                target=_run_job, args=(jobs[next_job], next_job, result_queue)
+            )
+            proc.start()
+            running[next_job] = proc
+            next_job += 1
+        try:
+            idx, ok, result = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            # a job that died without a result, e.g. killed
+            for idx, proc in list(running.items()):
+                if not proc.is_alive() and result_queue.empty():
+                    running.pop(idx).join()
+                    error = error or f"Job {idx} exited with code {proc.exitcode}"
+            continue
+        running.pop(idx).join()
+        if ok:
+            results[idx] = result
+        else:
+            error = error or f"Job {idx} failed:\n{result}"
+    if error is not None:
+        raise RuntimeError(error)
+    return results
+
+
+def _run_job(job: Callable[[], Any], idx: int, result_queue: "mp.Queue[Any]"):
+    try:
+        result_queue.put((idx, True, job()))
+    except Exception:
+        eprint(f"Job {idx} failed")
+        result_queue.put((idx, False, traceback.format_exc()))
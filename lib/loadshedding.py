@@ -0,0 +1,118 @@
+from .sharedtypes import (
+    DTWPathElemType,
+    ExtractedFeature,
+    ExtractedFeatureQueue,
+    FollowerOutputQueue,
+)
+from typing import Deque, Dict, List, Optional
+from collections import deque
+import numpy as np
+import queue
+
+
+class SheddingFeatureQueue:
+    """
+    Performance features for the follower, bounding how far it lags behind them.
+
+    Everything queued is taken at every `get`. If more than `max_backlog` features
+    were waiting, they are averaged into one, which the follower then aligns as a
+    single frame of the performance. `get_frame` maps these frames back to the
+    performance frames, each to the last one averaged into it.
+    """
+
+    def __init__(self, P_queue: ExtractedFeatureQueue, max_backlog: int):
+        self.P_queue = P_queue
+        self.max_backlog = max_backlog
+        self.frames_received = 0
+        self.frames_shed = 0  # averaged into another frame
+        self.times_shed = 0
+        self.max_backlog_seen = 0
+        self.__backlog: Deque[Optional[ExtractedFeature]] = deque()
+        self.__ended = False
+        # performance frame of every frame given to the follower
+        self.__frames: List[int] = []
+
+    def get(self) -> Optional[ExtractedFeature]:
+        self.__take_queued()
+        if len(self.__backlog) == 0:
+            x = self.P_queue.get()
+            self.__ended = x is None
+            self.__backlog.append(x)
+        if self.__backlog[0] is None:
+            return None
+
+        n_features = len(self.__backlog) - (1 if self.__ended else 0)
+        self.max_backlog_seen = max(self.max_backlog_seen, n_features)
+        n = n_features if n_features > self.max_backlog else 1
+        features = [self.__backlog.popleft() for _ in range(n)]
+        self.frames_received += n
+        self.__frames.append(self.frames_received - 1)
+        if n == 1:
+            return features[0]
+        self.frames_shed += n - 1
+        self.times_shed += 1
+        return ExtractedFeature(np.mean(features, axis=0))
+
+    def qsize(self) -> int:
+        return len(self.__backlog) + self.P_queue.qsize()
+
+    def get_frame(self, i: int) -> int:
+        """
+        Performance frame of frame i given to the follower.
+        """
+        if i >= len(self.__frames):
+            # the follower's output before it gets any frame
+            return i
+        return self.__frames[i]
+
+    def counters(self) -> Dict[str, int]:
+        """
+        Counters of the frames shed so far, for the trace.
+        """
+        return {
+            "frames_received": self.frames_received,
+            "frames_shed": self.frames_shed,
+            "times_shed": self.times_shed,
+            "max_backlog_seen": self.max_backlog_seen,
+            "max_backlog": self.max_backlog,
+        }
+
+    def stats(self) -> str:
+        """
+        Summary of the frames shed so far.
+        """
+        return (
+            f"{self.frames_received} frames, {self.frames_shed} shed in {self.times_shed} times; "
+            f"max backlog {self.max_backlog_seen} frames (bound {self.max_backlog})"
+        )
+
+    def __take_queued(self):
+        while not self.__ended:
+            try:
+                x = self.P_queue.get_nowait()  # type: ignore
+            except queue.Empty:
+                return
+            self.__ended = x is None
+            self.__backlog.append(x)
+
+
+class SheddingOutputQueue:
+    """
+    Maps the follower's output from the frames of a SheddingFeatureQueue back to
+    performance frames.
+    """
+
+    def __init__(
+        self,
+        follower_output_queue: FollowerOutputQueue,
+        feature_queue: SheddingFeatureQueue,
+    ):
+        self.follower_output_queue = follower_output_queue
+        self.feature_queue = feature_queue
+
+    def put(self, e: Optional[DTWPathElemType]):
+        if e is None:
+            self.follower_output_queue.put(None)
+            return
+        i, j = e
+        self.follower_output_queue.put((self.feature_queue.get_frame(i), j))
@@ -1,8 +1,17 @@
-from .sharedtypes import MultiprocessingConnection
+from .sharedtypes import MultiprocessingConnection, PipelineType, TransportType
 import multiprocessing as mp
-from typing import Optional, Any, List, NewType
+import multiprocessing.synchronize
+from multiprocessing import shared_memory
+import numpy as np
+import os
+import queue
+import threading
+from collections import deque
+from typing import Callable, Deque, Optional, Any, List, NewType, Tuple, Union
 
 AnyOptionalQueue = NewType("AnyOptionalQueue", "mp.Queue[Optional[Any]]")
+Worker = Union[mp.Process, threading.Thread]
+AnyEvent = Union[multiprocessing.synchronize.Event, threading.Event]
 
 
 def consume_queue_into_conn(q: AnyOptionalQueue, conn: MultiprocessingConnection):
@@ -48,3 +57,166 @@ def write_list_to_queue(l: List[Any], q: AnyOptionalQueue):
     for x in l:
         q.put(x)
     q.put(None)
+
+
+def create_queue(
+    transport: TransportType,
+    slot_nbytes: int = 0,
+    pipeline: PipelineType = "process",
+) -> AnyOptionalQueue:
+    """
+    Create a queue to pass items between pipeline stages.
+
+    `slot_nbytes` is the size of the largest ndarray expected, only used by `shm`.
+    Stages of a `thread` pipeline share one process, so they always use a DequeQueue.
+    """
+    if pipeline == "thread":
+        return AnyOptionalQueue(DequeQueue())
+    if transport == "queue":
+        return AnyOptionalQueue(mp.Queue())
+    elif transport == "shm":
+        return AnyOptionalQueue(SharedMemoryQueue(slot_nbytes))
+    raise ValueError(f"Unknown transport: {transport}")
+
+
+def create_worker(target: Callable[[], Any], pipeline: PipelineType) -> Worker:
+    """
+    Create (but do not start) a process or a thread running target.
+    """
+    if pipeline == "process":
+        return mp.Process(target=target)
+    elif pipeline == "thread":
+        return threading.Thread(target=target, daemon=True)
+    raise ValueError(f"Unknown pipeline: {pipeline}")
+
+
+def create_event(pipeline: PipelineType) -> AnyEvent:
+    """
+    Create an event shared between the stages of a pipeline.
+    """
+    if pipeline == "process":
+        return mp.Event()
+    elif pipeline == "thread":
+        return threading.Event()
+    raise ValueError(f"Unknown pipeline: {pipeline}")
+
+
+class DequeQueue:
+    """
+    A queue between threads of one process.
+
+    `deque.append` and `deque.popleft` are atomic, so items are passed without a
+    lock; the semaphore only counts the items so that `get` can block.
+    """
+
+    def __init__(self):
+        self.__items: Deque[Any] = deque()
+        self.__available = threading.Semaphore(0)
+
+    def put(self, x: Any):
+        self.__items.append(x)
+        self.__available.release()
+
+    def get(self) -> Any:
+        self.__available.acquire()
+        return self.__items.popleft()
+
+    def get_nowait(self) -> Any:
+        """
+        Raises queue.Empty if nothing is available.
+        """
+        if not self.__available.acquire(blocking=False):
+            raise queue.Empty
+        return self.__items.popleft()
+
+    def qsize(self) -> int:
+        return len(self.__items)
+
+
+class SharedMemoryQueue:
+    """
+    A queue for one producer and one consumer process that passes ndarrays
+    through a ring of fixed-size slots in shared memory.
+
+    Arrays are copied into the next slot and only (slot, shape, dtype) go through
+    the index channel, so they are never pickled or written through a pipe.
+    Anything else (e.g. the ending None) or any ndarray larger than a slot is
+    passed through the index channel as-is.
+
+    The creating process should call `unlink()` once all users are done.
+    """
+
+    def __init__(self, slot_nbytes: int, n_slots: int = 64):
+        if slot_nbytes <= 0:
+            raise ValueError(f"slot_nbytes must be positive, got {slot_nbytes}")
+        if n_slots <= 0:
+            raise ValueError(f"n_slots must be positive, got {n_slots}")
+        self.slot_nbytes = slot_nbytes
+        self.n_slots = n_slots
+        self.__shm = shared_memory.SharedMemory(create=True, size=slot_nbytes * n_slots)
+        self.__index: "mp.Queue[Tuple[Any, ...]]" = mp.Queue()
+        self.__free_slots = mp.Semaphore(n_slots)
+        self.__next_slot = 0  # only advanced by the producer
+        self.__owner_pid = os.getpid()
+
+    def put(self, x: Any):
+        if (
+            isinstance(x, np.ndarray)
+            and x.nbytes <= self.slot_nbytes
+            and not x.dtype.hasobject
+        ):
+            self.__free_slots.acquire()
+            slot = self.__next_slot
+            self.__next_slot = (self.__next_slot + 1) % self.n_slots
+            dst = np.ndarray(
+                x.shape, x.dtype, self.__shm.buf, offset=slot * self.slot_nbytes
+            )
+            dst[...] = x
+            del dst
+            self.__index.put(("shm", slot, x.shape, x.dtype.str))
+        else:
+            self.__index.put(("obj", x))
+
+    def get(self) -> Any:
+        return self.__read(self.__index.get())
+
+    def get_nowait(self) -> Any:
+        """
+        Raises queue.Empty if nothing is available.
+        """
+        return self.__read(self.__index.get_nowait())
+
+    def qsize(self) -> int:
+        return self.__index.qsize()
+
+    def __read(self, msg: Tuple[Any, ...]) -> Any:
+        if msg[0] == "obj":
+            return msg[1]
+        _, slot, shape, dtype = msg
+        src = np.ndarray(
+            shape, np.dtype(dtype), self.__shm.buf, offset=slot * self.slot_nbytes
+        )
+        x = src.copy()
+        del src
+        self.__free_slots.release()
+        return x
+
+    def unlink(self):
+        """
+        Free the shared memory. Only the creating process may do so.
+        """
+        if os.getpid() != self.__owner_pid:
+            raise RuntimeError("Only the creating process can unlink the queue")
+        self.__shm.close()
+        self.__shm.unlink()
+
+    def __getstate__(self):
+        # only used when starting processes with `spawn`; `fork` inherits the mapping
+        state = self.__dict__.copy()
+        state["_SharedMemoryQueue__shm"] = self.__shm.name
+        return state
+
+    def __setstate__(self, state):
+        shm_name = state["_SharedMemoryQueue__shm"]
+        state["_SharedMemoryQueue__shm"] = shared_memory.SharedMemory(name=shm_name)
+        self.__dict__.update(state)
@@ -1,14 +1,32 @@
-from .scorepickle import ScorePickle
+from .scorefile import ScoreFile, load_score
+from .scorecache import ScoreCache
 from .components.player import Player
 from .components.follower import Follower
 from .components.backend import Backend
-from .mputils import consume_queue_into_conn
-from .components.audiopreprocessor import AudioPreprocessor
+from .mputils import (
+    AnyEvent,
+    AnyOptionalQueue,
+    SharedMemoryQueue,
+    Worker,
+    consume_queue,
+    consume_queue_into_conn,
+    create_event,
+    create_queue,
+    create_worker,
+    write_list_to_queue,
+)
+from .components.audiopreprocessor import AudioPreprocessor, create_slice_queue
 from .components.synthesiser import Synthesiser
 from .args import Arguments
+from .tracing import (
+    LOAD_SHEDDING_TRACER,
+    ONLINE_TRACERS,
+    TRACE_COLLECT_TIMEOUT,
+    TraceCollector,
+)
 from .midi import process_midi_to_note_info
 from .sharedtypes import (
-    ExtractedFeature,
+    ExtractedFeatureMatrix,
     ExtractedFeatureQueue,
     FollowerOutputQueue,
     MultiprocessingConnection,
@@ -17,6 +35,7 @@ from .sharedtypes import (
 from typing import Optional, Tuple, List
 from .eprint import eprint
 import multiprocessing as mp
+import numpy as np
 import time
 
 
@@ -31,23 +50,52 @@ class Runner:
     def start(self):
         self.__log(f"STARTING")
 
-        follower_output_queue: FollowerOutputQueue = mp.Queue()
+        follower_output_queue: FollowerOutputQueue = FollowerOutputQueue(
+            create_queue("queue", pipeline=self.args.pipeline)
+        )
         (
             parent_performance_stream_start_conn,
             child_performance_stream_start_conn,
         ) = mp.Pipe()
-        P_queue: ExtractedFeatureQueue = mp.Queue()
+
+        trace_queue: Optional[AnyOptionalQueue] = None
+        trace_collector: Optional[TraceCollector] = None
+        if self.args.trace_output:
+            trace_queue = create_queue("queue", pipeline=self.args.pipeline)
+            tracer_names = ONLINE_TRACERS
+            if self.__get_follower_max_backlog() > 0:
+                tracer_names += (LOAD_SHEDDING_TRACER,)
+            trace_collector = TraceCollector(trace_queue, tracer_names)
 
         self.__log(f"Begin: preprocess score")
         score_note_onsets, S = self.__preprocess_score()
         self.__log(f"End: preprocess score")
 
+        # performance features have the same number of bins as the score's
+        P_queue: ExtractedFeatureQueue = ExtractedFeatureQueue(
+            create_queue(
+                self.args.transport,
+                S.shape[1] * np.dtype(np.float64).itemsize,
+                self.args.pipeline,
+            )
+        )
+
+        # owned here rather than by the performance processor, which is terminated
+        slice_queue = create_slice_queue(
+            self.args.transport, self.args.frame_len, self.args.pipeline
+        )
+
+        # stops the slicer and feature extractor once the backend is done
+        perf_stop_event = create_event(self.args.pipeline)
+
         self.__log(f"Begin: initialise performance processor")
-        perf_ap = self.__init_performance_processor(P_queue)
+        perf_ap = self.__init_performance_processor(
+            P_queue, slice_queue, trace_queue, perf_stop_event
+        )
         self.__log(f"End: initialise performance processor")
 
         self.__log(f"Begin: initialise follower")
-        follower = self.__init_follower(follower_output_queue, P_queue, S)
+        follower = self.__init_follower(follower_output_queue, P_queue, S, trace_queue)
         self.__log(f"End: initialise follower")
 
         self.__log(f"Begin: initialise backend")
@@ -55,14 +103,17 @@ class Runner:
             follower_output_queue,
             parent_performance_stream_start_conn,
             score_note_onsets,
+            trace_queue,
         )
         self.__log(f"End: initialise backend")
 
-        perf_ap_proc = mp.Process(target=perf_ap.start)
-        follower_proc = mp.Process(target=follower.start)
-        backend_proc = mp.Process(target=backend.start)
+        perf_ap_proc = create_worker(perf_ap.start, self.args.pipeline)
+        follower_proc = create_worker(follower.start, self.args.pipeline)
+        backend_proc = create_worker(backend.start, self.args.pipeline)
 
         # start from the back
+        if trace_collector:
+            trace_collector.start()
         self.__log(f"Starting: backend")
         backend_proc.start()
         self.__log(f"Starting: follower")
@@ -83,13 +134,95 @@ class Runner:
             self.__log("Joined: player")
         backend_proc.join()
         self.__log("Joined: backend")
+        perf_stop_event.set()
         follower_proc.join()
         self.__log("Joined: follower")
-        perf_ap_proc.terminate()  # use terminate as sometimes it hangs forever
+        if trace_collector:
+            trace_collector.join(TRACE_COLLECT_TIMEOUT)
+            trace_collector.write(self.args.trace_output, perf_start_time)
+        if isinstance(perf_ap_proc, mp.Process):
+            perf_ap_proc.terminate()  # use terminate as sometimes it hangs forever
+        else:
+            # threads cannot be terminated but stop at perf_stop_event, within a
+            # slice; daemon threads do not block exit if they still do not
+            perf_ap_proc.join(timeout=1.0)
         self.__log("Joined: performance")
+        if isinstance(P_queue, SharedMemoryQueue):
+            P_queue.unlink()
+        if isinstance(slice_queue, SharedMemoryQueue):
+            slice_queue.unlink()
+
+    def extract_features(
+        self,
+    ) -> Tuple[List[NoteInfo], ExtractedFeatureMatrix, ExtractedFeatureMatrix]:
+        """
+        Return note onsets and features of the score, and features of the whole
+        performance, to be followed with `start_with_features`.
+        """
+        self.__log(f"Begin: preprocess score")
+        score_note_onsets, S = self.__preprocess_score()
+        self.__log(f"End: preprocess score")
+        self.__log(f"Begin: extract performance features")
+        P = self.__extract_features(self.args.perf_wave_path)
+        self.__log(f"End: extract performance features")
+        return (score_note_onsets, S, P)
+
+    def start_with_features(
+        self,
+        score_note_onsets: List[NoteInfo],
+        S: ExtractedFeatureMatrix,
+        P: ExtractedFeatureMatrix,
+    ):
+        """
+        Run only the follower and backend, as threads of this process, on features
+        from `extract_features`, e.g. to follow a performance with different
+        follower or backend settings without extracting features each time.
+        """
+        if self.args.simulate_performance:
+            raise ValueError(
+                "Cannot simulate the performance with precomputed performance features"
+            )
+        self.__log(f"STARTING with precomputed features")
+
+        follower_output_queue: FollowerOutputQueue = FollowerOutputQueue(
+            create_queue("queue", pipeline="thread")
+        )
+        P_queue: ExtractedFeatureQueue = ExtractedFeatureQueue(
+            create_queue("queue", pipeline="thread")
+        )
+        (
+            parent_performance_stream_start_conn,
+            child_performance_stream_start_conn,
+        ) = mp.Pipe()
+
+        follower = self.__init_follower(follower_output_queue, P_queue, S, None)
+        backend = self.__init_backend(
+            follower_output_queue,
+            parent_performance_stream_start_conn,
+            score_note_onsets,
+            None,
+        )
+        follower_thread = create_worker(follower.start, "thread")
+        backend_thread = create_worker(backend.start, "thread")
+
+        backend_thread.start()
+        follower_thread.start()
+        perf_start_time = time.perf_counter()
+        self.__log(f"Starting: performance at {perf_start_time}")
+        child_performance_stream_start_conn.send(perf_start_time)
+        write_list_to_queue(list(P), P_queue)
+
+        backend_thread.join()
+        self.__log("Joined: backend")
+        follower_thread.join()
+        self.__log("Joined: follower")
 
     def __init_performance_processor(
-        self, P_queue: ExtractedFeatureQueue
+        self,
+        P_queue: ExtractedFeatureQueue,
+        slice_queue: ExtractedFeatureQueue,
+        trace_queue: Optional[AnyOptionalQueue],
+        stop_event: AnyEvent,
     ) -> AudioPreprocessor:
         args = self.args
         ap = AudioPreprocessor(
@@ -105,6 +238,12 @@ class Runner:
             args.fmax,
             P_queue,
             args.nsgt_multithreading,
+            transport=args.transport,
+            pipeline=args.pipeline,
+            offline_workers=args.offline_workers,
+            trace_queue=trace_queue,
+            slice_queue=slice_queue,
+            stop_event=stop_event,
         )
 
         return ap
@@ -114,6 +253,7 @@ class Runner:
         follower_output_queue: FollowerOutputQueue,
         performance_stream_start_conn: MultiprocessingConnection,
         score_note_onsets: List[NoteInfo],
+        trace_queue: Optional[AnyOptionalQueue],
     ) -> Backend:
         args = self.args
 
@@ -129,13 +269,18 @@ class Runner:
             args.sample_rate,
             args.backend_output,
             args.backend_backtrack,
+            args.virtual_clock,
+            trace_queue,
+            args.backend_flush_interval,
+            args.backend_udp_batch,
         )
 
     def __init_follower(
         self,
         follower_output_queue: FollowerOutputQueue,
         P_queue: ExtractedFeatureQueue,
-        S: List[ExtractedFeature],
+        S: ExtractedFeatureMatrix,
+        trace_queue: Optional[AnyOptionalQueue],
     ) -> Follower:
         args = self.args
         return Follower(
@@ -149,9 +294,24 @@ class Runner:
             args.w_a,
             args.w_b,
             args.w_c,
+            args.classical_low_memory,
+            trace_queue,
+            args.oltw_engine,
+            self.__get_follower_max_backlog(),
+            args.min_search_window,
+            args.multiscale_radius,
         )
 
-    def __preprocess_score(self) -> Tuple[List[NoteInfo], List[ExtractedFeature]]:
+    def __get_follower_max_backlog(self) -> int:
+        """
+        Performance frames in follower_max_lag, 0 if the follower never sheds them.
+        """
+        args = self.args
+        if args.follower_max_lag <= 0:
+            return 0
+        return max(1, int(args.follower_max_lag * args.sample_rate / args.hop_len))
+
+    def __preprocess_score(self) -> Tuple[List[NoteInfo], ExtractedFeatureMatrix]:
         """
         Return note_onsets and features extracted
         """
@@ -159,10 +319,33 @@ class Runner:
 
         if args.score_pickle_path:
             self.__log(f"Trying to load score features from {args.score_pickle_path}")
-            score_pickle = ScorePickle.load(args.score_pickle_path)
+            score = load_score(args.score_pickle_path)
             self.__log("Loaded score features successfully")
-            return (score_pickle.note_onsets, score_pickle.S)
+            return (score.note_onsets, score.S)
         elif args.score_midi_path:
+            score_cache: Optional[ScoreCache] = None
+            score_cache_key = ""
+            if not args.no_score_cache:
+                score_cache = ScoreCache(
+                    args.score_cache_dir, int(args.score_cache_max_mb * 1024 * 1024)
+                )
+                score_cache_key = ScoreCache.key(
+                    args.score_midi_path,
+                    args.mode,
+                    args.cqt,
+                    args.hop_len,
+                    args.frame_len,
+                    args.fmin,
+                    args.fmax,
+                    args.sample_rate,
+                )
+                cached = score_cache.get(score_cache_key)
+                if cached is not None:
+                    self.__log(
+                        f"Loaded score features from cache {score_cache.path(score_cache_key)}"
+                    )
+                    return (cached.note_onsets, cached.S)
+
             self.__log(f"Score pickle file not supplied, extracting score features")
 
             note_onsets = process_midi_to_note_info(args.score_midi_path)
@@ -172,46 +355,86 @@ class Runner:
             score_wave_path = synthesiser.synthesise()
             self.__log(f"Score midi synthesised to {score_wave_path}")
 
-            S_queue: ExtractedFeatureQueue = ExtractedFeatureQueue(mp.Queue())
-            # need to consume into a connection--queues are likely to fill up and reach their
-            # limit then cause the program to hang!
-            parent_S_conn, child_S_conn = mp.Pipe()
-            consume_S_queue_proc = mp.Process(
-                target=consume_queue_into_conn, args=(S_queue, child_S_conn)
-            )
-            consume_S_queue_proc.start()
-
-            audio_preprocessor = AudioPreprocessor(
-                args.sample_rate,
-                args.hop_len,
-                args.frame_len,
-                score_wave_path,
-                False,
-                0.0,
-                args.mode,
-                args.cqt,
-                args.fmin,
-                args.fmax,
-                S_queue,
-                args.nsgt_multithreading,
-            )
-            audio_preprocessor.start()
-
-            S = parent_S_conn.recv()
-
-            consume_S_queue_proc.join()
+            S = self.__extract_features(score_wave_path)
 
-            score_pickle = ScorePickle(note_onsets, S)
-            self.__log("Dumping score features to pickle")
-            pickle_path = score_pickle.dump(args.score_midi_path)
-            self.__log(f'Score features dumped to "{pickle_path}"')
+            score_file = ScoreFile(
+                note_onsets,
+                S,
+                {
+                    "score_midi_path": args.score_midi_path,
+                    "mode": args.mode,
+                    "cqt": args.cqt,
+                    "hop_len": args.hop_len,
+                    "frame_len": args.frame_len,
+                    "fmin": args.fmin,
+                    "fmax": args.fmax,
+                    "sample_rate": args.sample_rate,
+                },
+            )
+            if score_cache is not None:
+                self.__log("Caching score features")
+                score_path = score_cache.put(score_cache_key, score_file)
+                self.__log(f'Score features cached to "{score_path}"')
+            else:
+                self.__log("Dumping score features to file")
+                score_path = score_file.dump(args.score_midi_path)
+                self.__log(f'Score features dumped to "{score_path}"')
             return (note_onsets, S)
         else:
             raise ValueError(
                 "Either `score_pickle_path` or `score_midi_path` must be set"
             )
 
-    def __init_player_if_required(self) -> Optional[mp.Process]:
+    def __extract_features(self, wave_path: str) -> ExtractedFeatureMatrix:
+        """
+        Extract features of a whole wave file as fast as possible.
+        """
+        args = self.args
+
+        features_queue: ExtractedFeatureQueue = ExtractedFeatureQueue(
+            create_queue("queue", pipeline=args.pipeline)
+        )
+        audio_preprocessor = AudioPreprocessor(
+            args.sample_rate,
+            args.hop_len,
+            args.frame_len,
+            wave_path,
+            False,
+            0.0,
+            args.mode,
+            args.cqt,
+            args.fmin,
+            args.fmax,
+            features_queue,
+            args.nsgt_multithreading,
+            pipeline=args.pipeline,
+            offline_workers=args.offline_workers,
+        )
+
+        if args.pipeline == "thread":
+            # a DequeQueue is unbounded, so it can be consumed afterwards
+            audio_preprocessor.start()
+            return ExtractedFeatureMatrix(
+                np.ascontiguousarray(consume_queue(features_queue))
+            )
+        # need to consume into a connection--queues are likely to fill up and reach their
+        # limit then cause the program to hang!
+        parent_features_conn, child_features_conn = mp.Pipe()
+        consume_features_queue_proc = mp.Process(
+            target=consume_queue_into_conn, args=(features_queue, child_features_conn)
+        )
+        consume_features_queue_proc.start()
+
+        audio_preprocessor.start()
+
+        features = ExtractedFeatureMatrix(
+            np.ascontiguousarray(parent_features_conn.recv())
+        )
+
+        consume_features_queue_proc.join()
+        return features
+
+    def __init_player_if_required(self) -> Optional[Worker]:
         args = self.args
         if args.play_performance_audio:
             if not args.simulate_performance:
@@ -219,7 +442,7 @@ class Runner:
                     "Can only play performance audio when simulate_performance is set to True"
                 )
             player = Player(args.perf_wave_path)
-            player_proc = mp.Process(target=player.play)
+            player_proc = create_worker(player.play, args.pipeline)
             return player_proc
         return None
 
@@ -0,0 +1,65 @@
+from typing import Callable, List, Optional
+import numpy as np
+import time
+
+
+class DeadlineScheduler:
+    """
+    Waits for absolute deadlines, given as offsets (s) from a start time, so that
+    errors in one wait do not accumulate into the next.
+
+    Sleeps until `busy_wait` (s) before each deadline, as sleeping is not entirely
+    precise, then busy-waits for the rest. Records how late each wait returned
+    (jitter) and the deadlines that had already passed when waited for (overruns).
+    """
+
+    def __init__(
+        self,
+        busy_wait: float = 0.0005,
+        clock: Callable[[], float] = time.perf_counter,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.busy_wait = busy_wait
+        self.clock = clock
+        self.sleep = sleep
+        self.start_time: Optional[float] = None
+        self.jitters: List[float] = []
+        self.overruns: List[float] = []
+
+    def start(self, start_time: Optional[float] = None):
+        self.start_time = self.clock() if start_time is None else start_time
+        self.jitters = []
+        self.overruns = []
+
+    def wait_until(self, offset: float):
+        """
+        Wait until start time + offset.
+        """
+        if self.start_time is None:
+            raise ValueError("Scheduler not started")
+        deadline = self.start_time + offset
+        remaining = deadline - self.clock()
+        if remaining < 0:
+            self.overruns.append(-remaining)
+            return
+        if remaining > self.busy_wait:
+            self.sleep(remaining - self.busy_wait)
+        while self.clock() < deadline:
+            pass
+        self.jitters.append(self.clock() - deadline)
+
+    def stats(self) -> str:
+        """
+        Summary of the jitter and overruns so far.
+        """
+        res = f"{len(self.jitters)} deadlines met"
+        if len(self.jitters) > 0:
+            jitters_ms = np.array(self.jitters) * 1000
+            p50, p99 = np.percentile(jitters_ms, [50, 99])
+            res += (
+                f", jitter (ms) p50 {p50:.3f} p99 {p99:.3f} max {jitters_ms.max():.3f}"
+            )
+        res += f"; {len(self.overruns)} overruns"
+        if len(self.overruns) > 0:
+            res += f", max {max(self.overruns) * 1000:.3f} ms late"
+        return res
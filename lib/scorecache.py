@@ -0,0 +1,130 @@
+from typing import List, Optional, Tuple
+from .scorefile import SCORE_FILE_EXT, ScoreFile
+from .sharedtypes import CQTType, ModeType
+from .eprint import eprint
+import hashlib
+import json
+import os
+import tempfile
+
+# bump when the cached features or their format change
+SCORE_CACHE_VERSION = 2
+
+
+class ScoreCache:
+    """
+    On-disk cache of extracted score features, one file per entry named by
+    the hash of the score MIDI and every argument affecting the features.
+
+    Reading an entry bumps its modification time, and the least recently used
+    entries are evicted once the cache grows beyond `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(
+        score_midi_path: str,
+        mode: ModeType,
+        cqt: CQTType,
+        hop_len: int,
+        frame_len: int,
+        fmin: float,
+        fmax: float,
+        sample_rate: int,
+    ) -> str:
+        h = hashlib.sha256()
+        with open(score_midi_path, "rb") as f:
+            h.update(f.read())
+        params = {
+            "version": SCORE_CACHE_VERSION,
+            "mode": mode,
+            "cqt": cqt,
+            "hop_len": hop_len,
+            "frame_len": frame_len,
+            "fmin": fmin,
+            "fmax": fmax,
+            "sample_rate": sample_rate,
+        }
+        h.update(json.dumps(params, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{SCORE_FILE_EXT}")
+
+    def get(self, key: str) -> Optional[ScoreFile]:
+        """
+        Return the cached entry, or None on a miss or an unreadable entry.
+        """
+        p = self.path(key)
+        if not os.path.isfile(p):
+            return None
+        try:
+            score_file = ScoreFile.load(p)
+        except Exception as e:
+            self.__log(f"Discarding unreadable entry {p}: {e}")
+            self.__remove(p)
+            return None
+        os.utime(p)  # mark as recently used
+        return score_file
+
+    def put(self, key: str, score_file: ScoreFile) -> str:
+        """
+        Store an entry, evict least recently used entries and return its path.
+        """
+        p = self.path(key)
+        # write to a temporary file first so that readers never see half an entry
+        fd, tmppath = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            score_file.save(tmppath)
+            os.replace(tmppath, p)
+        finally:
+            self.__remove(tmppath)
+        self.evict(keep=p)
+        return p
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Remove least recently used entries (other than `keep`) until the cache
+        fits in max_bytes.
+        """
+        entries = self.__entries()
+        total = sum(size for _, _, size in entries)
+        for _, p, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            self.__log(f"Evicting {p}")
+            self.__remove(p)
+            total -= size
+
+    def __entries(self) -> List[Tuple[float, str, int]]:
+        """
+        (last used time, path, size in bytes) of every entry
+        """
+        entries: List[Tuple[float, str, int]] = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(SCORE_FILE_EXT):
+                continue
+            p = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(p)
+            except FileNotFoundError:
+                continue  # removed concurrently
+            entries.append((st.st_mtime, p, st.st_size))
+        return entries
+
+    @staticmethod
+    def __remove(p: str):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+    def __log(self, msg: str):
+        eprint(f"[{self.__class__.__name__}] {msg}")
@@ -0,0 +1,149 @@
+from typing import Any, Dict, List, Optional, Union
+from .scorepickle import ScorePickle
+from .sharedtypes import ExtractedFeatureMatrix, NoteInfo
+import numpy as np
+import tempfile
+import json
+import os
+import struct
+
+SCORE_FILE_MAGIC = b"\x93FLIPPYS"
+SCORE_FILE_VERSION = 1
+SCORE_FILE_EXT = ".score"
+# start of the onset table and of the feature matrix are aligned to this
+SCORE_FILE_ALIGN = 64
+NOTE_ONSET_DTYPE = np.dtype([("midi_note_num", "<i4"), ("note_start", "<f8")])
+
+# magic, version, header length
+SCORE_FILE_PREAMBLE = struct.Struct("<8sII")
+
+
+class ScoreFile:
+    """
+    Binary score features: a preamble and a JSON header, followed by the note onset
+    table and the feature matrix as raw little-endian arrays.
+
+        | magic | version | header length | header | onset table | S |
+
+    The header holds the offsets, shapes and dtypes of the arrays plus free-form
+    metadata. `load` memory-maps S, so opening a large score is instant and
+    processes following the same score share its pages.
+    """
+
+    def __init__(
+        self,
+        note_onsets: List[NoteInfo],
+        S: ExtractedFeatureMatrix,
+        meta: Optional[Dict[str, Any]] = None,
+    ):
+        self.note_onsets = note_onsets
+        self.S = S
+        self.meta: Dict[str, Any] = meta if meta is not None else {}
+
+    def dump(self, score_midi_path: str) -> str:
+        tmpdir = tempfile.mkdtemp(prefix="flippy")
+        base_name_no_ext = os.path.splitext(os.path.basename(score_midi_path))[0]
+        tmppath = os.path.join(tmpdir, f"{base_name_no_ext}{SCORE_FILE_EXT}")
+
+        self.save(tmppath)
+
+        return tmppath
+
+    def save(self, file_path: str):
+        onsets = np.array(
+            [(n.midi_note_num, n.note_start) for n in self.note_onsets],
+            dtype=NOTE_ONSET_DTYPE,
+        )
+        S = np.ascontiguousarray(self.S, dtype="<f8")
+        if len(S.shape) != 2:
+            raise ValueError(f"S must be 2D, got shape {S.shape}")
+
+        # the offsets depend on the header length, which depends on the offsets:
+        # reserve room for them first
+        header: Dict[str, Any] = {
+            "onsets_offset": 0,
+            "n_onsets": len(onsets),
+            "S_offset": 0,
+            "S_shape": list(S.shape),
+            "S_dtype": S.dtype.str,
+            "meta": self.meta,
+        }
+        header_len = len(self.__encode_header(header)) + 2 * 20
+        onsets_offset = self.__align(SCORE_FILE_PREAMBLE.size + header_len)
+        header["onsets_offset"] = onsets_offset
+        header["S_offset"] = self.__align(onsets_offset + onsets.nbytes)
+        header_bytes = self.__encode_header(header).ljust(header_len)
+
+        with open(file_path, "wb") as f:
+            f.write(
+                SCORE_FILE_PREAMBLE.pack(
+                    SCORE_FILE_MAGIC, SCORE_FILE_VERSION, header_len
+                )
+            )
+            f.write(header_bytes)
+            f.seek(header["onsets_offset"])
+            f.write(onsets.tobytes())
+            f.seek(header["S_offset"])
+            f.write(S.tobytes())
+
+    @staticmethod
+    def is_score_file(file_path: str) -> bool:
+        with open(file_path, "rb") as f:
+            return f.read(len(SCORE_FILE_MAGIC)) == SCORE_FILE_MAGIC
+
+    @staticmethod
+    def load(file_path: str):
+        """
+        Open a score file with S memory-mapped read-only.
+        """
+        with open(file_path, "rb") as f:
+            magic, version, header_len = SCORE_FILE_PREAMBLE.unpack(
+                f.read(SCORE_FILE_PREAMBLE.size)
+            )
+            if magic != SCORE_FILE_MAGIC:
+                raise ValueError(f"{file_path} is not a score file")
+            if version != SCORE_FILE_VERSION:
+                raise ValueError(
+                    f"Unsupported score file version {version} (expected {SCORE_FILE_VERSION})"
+                )
+            header = json.loads(f.read(header_len))
+            f.seek(header["onsets_offset"])
+            onsets = np.frombuffer(
+                f.read(header["n_onsets"] * NOTE_ONSET_DTYPE.itemsize),
+                dtype=NOTE_ONSET_DTYPE,
+            )
+
+        note_onsets = [
+            NoteInfo(int(midi_note_num), float(note_start))
+            for midi_note_num, note_start in onsets.tolist()
+        ]
+        S_shape = tuple(header["S_shape"])
+        if S_shape[0] == 0:
+            # cannot map an empty region
+            S = np.empty(S_shape, dtype=header["S_dtype"])
+        else:
+            S = np.memmap(
+                file_path,
+                dtype=header["S_dtype"],
+                mode="r",
+                offset=header["S_offset"],
+                shape=S_shape,
+            )
+        return ScoreFile(note_onsets, ExtractedFeatureMatrix(S), header["meta"])
+
+    @staticmethod
+    def __encode_header(header: Dict[str, Any]) -> bytes:
+        return json.dumps(header, sort_keys=True).encode()
+
+    @staticmethod
+    def __align(offset: int) -> int:
+        return -(-offset // SCORE_FILE_ALIGN) * SCORE_FILE_ALIGN
+
+
+def load_score(file_path: str) -> Union[ScoreFile, ScorePickle]:
+    """
+    Load score features from a score file or a legacy pickle.
+    """
+    if ScoreFile.is_score_file(file_path):
+        return ScoreFile.load(file_path)
+    return ScorePickle.load(file_path)
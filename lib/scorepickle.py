@@ -1,12 +1,13 @@
 from typing import List
-from .sharedtypes import ExtractedFeature, NoteInfo
+from .sharedtypes import ExtractedFeatureMatrix, NoteInfo
+import numpy as np
 import tempfile
 import os
 import pickle
 
 
 class ScorePickle:
-    def __init__(self, note_onsets: List[NoteInfo], S: List[ExtractedFeature]):
+    def __init__(self, note_onsets: List[NoteInfo], S: ExtractedFeatureMatrix):
         self.note_onsets = note_onsets
         self.S = S
 
@@ -15,13 +16,20 @@ class ScorePickle:
         base_name_no_ext = os.path.splitext(os.path.basename(score_midi_path))[0]
         tmppath = os.path.join(tmpdir, f"{base_name_no_ext}.pickle")
 
-        with open(tmppath, "wb") as f:
-            pickle.dump(self, f, protocol=4)
+        self.save(tmppath)
 
         return tmppath
 
+    def save(self, file_path: str):
+        with open(file_path, "wb") as f:
+            pickle.dump(self, f, protocol=4)
+
     @staticmethod
     def load(file_path: str):
         with open(file_path, "rb") as f:
             score_pickle: ScorePickle = pickle.load(f)
+            # older pickles hold S as a list of 1D ndarrays
+            score_pickle.S = ExtractedFeatureMatrix(
+                np.ascontiguousarray(score_pickle.S)
+            )
             return score_pickle
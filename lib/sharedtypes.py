@@ -27,13 +27,17 @@ PIndex = int
 SIndex = int
 
 DTWPathElemType = Tuple[PIndex, SIndex]
+# online, with the last performance frame taken by the follower
+FollowerOutputElemType = Union[DTWPathElemType, Tuple[PIndex, SIndex, PIndex]]
 FollowerOutputQueue = NewType(
-    "FollowerOutputQueue", "mp.Queue[Optional[DTWPathElemType]]"
+    "FollowerOutputQueue", "mp.Queue[Optional[FollowerOutputElemType]]"
 )
 MultiprocessingConnection = NewType(
     "MultiprocessingConnection", "mp.connection.Connection"
 )
 ExtractedFeature = NewType("ExtractedFeature", np.ndarray)  # type: ignore
+# C-contiguous 2D ndarray of shape (n_frames, n_bins), one ExtractedFeature per row
+ExtractedFeatureMatrix = NewType("ExtractedFeatureMatrix", np.ndarray)  # type: ignore
 ExtractedFeatureQueue = NewType(
     "ExtractedFeatureQueue", "mp.Queue[Optional[ExtractedFeature]]"
 )
@@ -47,11 +51,14 @@ LibrosaCQTs = Literal[LibrosaCQT, LibrosaPseudoCQT, LibrosaHybridCQT]
 NSGTCQT = Literal["nsgt"]
 
 ModeType = Literal["online", "offline"]
-DTWType = Literal["classical", "oltw"]
+DTWType = Literal["classical", "oltw", "multiscale"]
+OLTWEngineType = Literal["python", "numba"]
 CQTType = Literal[
     "librosa", "librosa_pseudo", "librosa_hybrid", "nsgt"
 ]  # due to limitation of TAP
 BackendType = Literal["alignment", "timestamp"]
+TransportType = Literal["queue", "shm"]
+PipelineType = Literal["process", "thread"]
 
 # Repro & experimental
 AlignResultsT = Dict[int, MatchResult]
@@ -0,0 +1,195 @@
+from .eprint import eprint
+from typing import IO, List, Optional, Tuple
+import queue
+import socket
+import sys
+import threading
+import time
+
+
+class Sink:
+    """
+    Destination of the backend's output lines.
+    Lines may be buffered until `flush`.
+    """
+
+    def write(self, x: str):
+        raise NotImplementedError("Override this")
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class StreamSink(Sink):
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+
+    def write(self, x: str):
+        self.stream.write(f"{x}\n")
+
+    def flush(self):
+        self.stream.flush()
+
+
+class FileSink(Sink):
+    """
+    Writes to a file kept open until closed, truncating it first.
+    """
+
+    def __init__(self, path: str):
+        self.__f = open(path, "w")
+
+    def write(self, x: str):
+        self.__f.write(f"{x}\n")
+
+    def flush(self):
+        self.__f.flush()
+
+    def close(self):
+        self.__f.close()
+
+
+class UDPSink(Sink):
+    """
+    Sends lines through a non-blocking UDP socket, `batch_size` lines per datagram
+    separated by newlines. Datagrams that cannot be sent immediately are dropped.
+    """
+
+    def __init__(self, addr: str, port: int, batch_size: int = 1):
+        self.addr = addr
+        self.port = port
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.__batch: List[str] = []
+        self.__socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__socket.setblocking(False)
+
+    def write(self, x: str):
+        self.__batch.append(x)
+        if len(self.__batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.__batch) == 0:
+            return
+        try:
+            self.__socket.sendto(
+                "\n".join(self.__batch).encode(), (self.addr, self.port)
+            )
+        except BlockingIOError:
+            self.dropped += len(self.__batch)
+        self.__batch = []
+
+    def close(self):
+        self.flush()
+        self.__socket.close()
+        if self.dropped > 0:
+            eprint(f"[{self.__class__.__name__}] Dropped {self.dropped} lines")
+
+
+class TeeSink(Sink):
+    """
+    Writes to all of `sinks`.
+    """
+
+    def __init__(self, sinks: List[Sink]):
+        self.sinks = sinks
+
+    def write(self, x: str):
+        for sink in self.sinks:
+            sink.write(x)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def parse_udp_output(output: str) -> Optional[Tuple[str, int]]:
+    """
+    Return (address, port) of a `udp:<HOSTNAME>:<PORT>` output, None if it is not one.
+    """
+    if not (len(output) > 4 and output[:4] == "udp:"):
+        return None
+    # try to parse UDP IP and port
+    address_port = output[4:].split(":")
+    if len(address_port) != 2:
+        raise ValueError(f"Unknown `backend_output`: {output}")
+    return (str(address_port[0]), int(address_port[1]))
+
+
+def create_sink(output: str, udp_batch_size: int = 1) -> Sink:
+    """
+    Sink for `stdout`, `stderr`, `udp:<HOSTNAME>:<PORT>` (UDP socket and stderr)
+    or a path to a text file.
+    """
+    if output == "stdout":
+        return StreamSink(sys.stdout)
+    elif output == "stderr":
+        return StreamSink(sys.stderr)
+    udp_addr_port = parse_udp_output(output)
+    if udp_addr_port is not None:
+        addr, port = udp_addr_port
+        return TeeSink([StreamSink(sys.stderr), UDPSink(addr, port, udp_batch_size)])
+    return FileSink(output)
+
+
+class SinkWriter:
+    """
+    Writes to a sink from a thread, so that writing a line only appends it to a
+    queue.
+
+    Lines are flushed at most `flush_interval` (s) after they are written, or
+    immediately if it is 0.
+    """
+
+    def __init__(self, sink: Sink, flush_interval: float = 0.0):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.__lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.__thread = threading.Thread(target=self.__write_lines, daemon=True)
+
+    def start(self):
+        self.__thread.start()
+
+    def write(self, x: str):
+        self.__lines.put(x)
+
+    def close(self):
+        """
+        Write the remaining lines and close the sink.
+        """
+        self.__lines.put(None)
+        self.__thread.join()
+
+    def __write_lines(self):
+        # time by which the buffered lines must be flushed, None if there are none
+        flush_deadline: Optional[float] = None
+        while True:
+            timeout = (
+                None
+                if flush_deadline is None
+                else max(0.0, flush_deadline - time.perf_counter())
+            )
+            try:
+                x = self.__lines.get(timeout=timeout)
+            except queue.Empty:
+                self.sink.flush()
+                flush_deadline = None
+                continue
+            if x is None:
+                self.sink.close()
+                return
+            self.sink.write(x)
+            now = time.perf_counter()
+            if flush_deadline is None:
+                flush_deadline = now + self.flush_interval
+            if now >= flush_deadline:
+                self.sink.flush()
+                flush_deadline = None
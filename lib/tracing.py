@@ -0,0 +1,191 @@
+from .mputils import AnyOptionalQueue
+from .eprint import eprint
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import numpy as np
+import threading
+import time
+
+# Points of the pipeline each frame passes through, in order.
+# A frame's sequence number is its index in the performance stream (the last one
+# taken by the follower, if it averaged several into one).
+# Follower outputs are attributed to the frame last received by the follower,
+# and the backend points are keyed by output number, mapped back to frames via
+# the order of the follower outputs.
+TRACE_POINTS = (
+    "slicer_put",
+    "extractor_get",
+    "extractor_put",
+    "follower_get",
+    "follower_put",
+    "backend_get",
+    "backend_put",
+)
+# name, from point, to point
+TRACE_SPANS: List[Tuple[str, str, str]] = [
+    ("slice_queue", "slicer_put", "extractor_get"),
+    ("extract", "extractor_get", "extractor_put"),
+    ("feature_queue", "extractor_put", "follower_get"),
+    ("follow", "follower_get", "follower_put"),
+    ("output_queue", "follower_put", "backend_get"),
+    ("backend", "backend_get", "backend_put"),
+    ("end_to_end", "slicer_put", "backend_put"),
+]
+# Names of the tracers of an online run
+ONLINE_TRACERS = ("Slicer", "FeatureExtractor", "OLTW", "Backend")
+# Name of the tracer of the follower's load shedding counters, if it sheds
+LOAD_SHEDDING_TRACER = "LoadShedding"
+# Time (s) to wait for the records of stages still running once the backend is done
+TRACE_COLLECT_TIMEOUT = 5.0
+
+TraceEvent = Tuple[str, int, float]  # point, sequence number, time (s)
+QueueDepth = Tuple[str, float, int]  # queue name, time (s), depth
+TraceCounters = Dict[str, int]  # counter name, value at the end of the stage
+
+
+class Tracer:
+    """
+    Records the times (s) at which frames pass the points of a pipeline stage and
+    the depths of the queues it reads from, on the `time.perf_counter` clock that
+    is shared between processes, as well as counters of the stage.
+
+    Everything is buffered in memory and sent to `trace_queue` by `flush`, once the
+    stage is done. Without a trace_queue nothing is recorded.
+    """
+
+    def __init__(self, name: str, trace_queue: Optional[AnyOptionalQueue]):
+        self.name = name
+        self.trace_queue = trace_queue
+        self.events: List[TraceEvent] = []
+        self.depths: List[QueueDepth] = []
+        self.counters: TraceCounters = {}
+
+    def record(self, point: str, seq: int):
+        if self.trace_queue is not None:
+            self.events.append((point, seq, time.perf_counter()))
+
+    def record_depth(self, queue_name: str, q: AnyOptionalQueue):
+        if self.trace_queue is not None:
+            try:
+                depth = q.qsize()
+            except NotImplementedError:
+                # not implemented on macOS for multiprocessing queues
+                return
+            self.depths.append((queue_name, time.perf_counter(), depth))
+
+    def record_counter(self, counter_name: str, value: int):
+        if self.trace_queue is not None:
+            self.counters[counter_name] = value
+
+    def flush(self):
+        if self.trace_queue is not None:
+            self.trace_queue.put((self.name, self.events, self.depths, self.counters))
+
+
+class TraceCollector:
+    """
+    Collects the records of every Tracer of a run and summarises the latency of
+    each span of the pipeline, the queue depths over time and the counters of each
+    tracer.
+
+    Records are consumed by a thread from `start` onwards, as a process cannot exit
+    before what it put into a multiprocessing queue is consumed.
+    """
+
+    def __init__(self, trace_queue: AnyOptionalQueue, tracer_names: Tuple[str, ...]):
+        self.trace_queue = trace_queue
+        self.tracer_names = tracer_names
+        self.events: Dict[str, List[TraceEvent]] = {}
+        self.depths: List[QueueDepth] = []
+        self.counters: Dict[str, TraceCounters] = {}
+        self.__thread = threading.Thread(target=self.__collect, daemon=True)
+
+    def start(self):
+        self.__thread.start()
+
+    def join(self, timeout: Optional[float] = None):
+        """
+        Wait up to timeout (s) for the records of every tracer.
+        """
+        self.__thread.join(timeout)
+        if self.__thread.is_alive():
+            missing = set(self.tracer_names) - set(self.events.keys())
+            self.__log(f"No records from: {', '.join(sorted(missing))}")
+
+    def __collect(self):
+        while len(self.events) < len(self.tracer_names):
+            name, events, depths, counters = self.trace_queue.get()
+            self.depths.extend(depths)
+            if len(counters) > 0:
+                self.counters[name] = counters
+            self.events[name] = events
+
+    def frame_times(self) -> Dict[str, Dict[int, float]]:
+        """
+        Time at which each frame first passed each point.
+        """
+        res: Dict[str, Dict[int, float]] = {point: {} for point in TRACE_POINTS}
+        tracer_events = list(self.events.values())
+        # frame of each follower output
+        output_frames = [
+            seq
+            for events in tracer_events
+            for point, seq, _ in events
+            if point == "follower_put"
+        ]
+        for events in tracer_events:
+            for point, seq, t in events:
+                if point in ("backend_get", "backend_put"):
+                    if seq >= len(output_frames):
+                        continue
+                    seq = output_frames[seq]
+                if seq < 0 or point not in res:
+                    continue
+                res[point].setdefault(seq, t)
+        return res
+
+    def report(self, start_time: float) -> Dict[str, Any]:
+        """
+        Latency (ms) percentiles of each span, the depth of each queue over time
+        (s) since start_time and the counters of each tracer that has any.
+        """
+        times = self.frame_times()
+        latency: Dict[str, Dict[str, float]] = {}
+        for span, start_point, end_point in TRACE_SPANS:
+            starts = times[start_point]
+            ends = times[end_point]
+            latencies = np.array(
+                [ends[seq] - starts[seq] for seq in ends.keys() if seq in starts]
+            )
+            latencies *= 1000
+            latency[span] = {"count": len(latencies)}
+            if len(latencies) > 0:
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                latency[span].update(
+                    {"p50": p50, "p95": p95, "p99": p99, "max": latencies.max()}
+                )
+
+        queue_depth: Dict[str, List[Tuple[float, int]]] = {}
+        for queue_name, t, depth in sorted(list(self.depths), key=lambda d: d[1]):
+            queue_depth.setdefault(queue_name, []).append((t - start_time, depth))
+
+        return {
+            "frames": len(times["slicer_put"]),
+            "latency_ms": latency,
+            "queue_depth": queue_depth,
+            "counters": self.counters,
+        }
+
+    def write(self, path: str, start_time: float):
+        report = self.report(start_time)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        for span, stats in report["latency_ms"].items():
+            if stats["count"] > 0:
+                self.__log(
+                    f"{span} (ms): p50 {stats['p50']:.3f} p95 {stats['p95']:.3f} p99 {stats['p99']:.3f} max {stats['max']:.3f}"
+                )
+        self.__log(f"Trace written to {path}")
+
+    def __log(self, msg: str):
+        eprint(f"[{self.__class__.__name__}] {msg}")
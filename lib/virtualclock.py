@@ -0,0 +1,55 @@
+from typing import Callable, Optional
+import time
+
+
+def get_slice_release_time(
+    k: int, hop_len: int, frame_len: int, sample_rate: int
+) -> float:
+    """
+    Time (s) into the performance at which slice k is complete, i.e. once
+    frame_len + k * hop_len samples have been played.
+    """
+    return float(frame_len + k * hop_len) / sample_rate
+
+
+class VirtualClock:
+    """
+    Simulated timeline of a performance streamed faster than real time.
+
+    Slice p cannot be processed before it is released, nor before slice p - 1 is done,
+    so it is done at max(release time of p, time of p - 1) plus the processing time
+    measured on the real clock since the previous tick.
+    """
+
+    def __init__(
+        self,
+        hop_len: int,
+        frame_len: int,
+        sample_rate: int,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.hop_len = hop_len
+        self.frame_len = frame_len
+        self.sample_rate = sample_rate
+        self.clock = clock
+        self.time = 0.0
+        self.__prev_real_time: Optional[float] = None
+
+    def start(self, start_time: Optional[float] = None):
+        self.time = 0.0
+        self.__prev_real_time = self.clock() if start_time is None else start_time
+
+    def tick(self, p: int) -> float:
+        """
+        Advance the clock for output on slice p and return its simulated time (s)
+        into the performance.
+        """
+        if self.__prev_real_time is None:
+            raise ValueError("Virtual clock not started")
+        real_time = self.clock()
+        release_time = get_slice_release_time(
+            p, self.hop_len, self.frame_len, self.sample_rate
+        )
+        self.time = max(release_time, self.time) + (real_time - self.__prev_real_time)
+        self.__prev_real_time = real_time
+        return self.time
@@ -13,13 +13,16 @@ from lib.plotting import plot_cqt_to_file
 from lib.sharedtypes import (
     AlignResultsT,
     ExtractedFeature,
+    ExtractedFeatureMatrix,
     ExtractedFeatureQueue,
+    NoteInfo,
     OverallResultsT,
 )
 from lib.components.synthesiser import Synthesiser
 from lib.constants import DEFAULT_SAMPLE_RATE
 from lib.components.audiopreprocessor import AudioPreprocessor
 from lib.eprint import eprint
+from lib.jobs import get_max_jobs, parse_jobs_arg, run_jobs
 from lib.args import Arguments
 from consts import (
     BACH10_PATH,
@@ -28,8 +31,20 @@ from consts import (
     REPRO_RESULTS_PATH,
 )
 import os
+import functools
 import multiprocessing as mp
-from typing import Any, Dict, List, Tuple, TypeVar, TypedDict, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+    TypedDict,
+    Union,
+)
 import numpy as np
 import sys
 import re
@@ -459,240 +474,265 @@ def bwv846_feature():
             print(f"Finished plotting features for {piece} to {output_plot_path}")
 
 
-def bwv846_align():
+class AlignJob(NamedTuple):
+    action: str  # "align" or "follow"
+    piece: str
+    setting: str  # e.g. "cqt: nsgt"
+    args: List[str]  # Runner arguments apart from `--backend_output`
+    ref_align_path: str
+    output_base_dir: str  # results of all jobs with the same one are aggregated
+
+
+# (note onsets, score features, performance features)
+FeaturesT = Tuple[List[NoteInfo], ExtractedFeatureMatrix, ExtractedFeatureMatrix]
+
+
+def _get_features_key(args: Arguments) -> Tuple[Any, ...]:
+    """
+    Arguments that the score and performance features depend on.
+    """
+    return (
+        args.score_midi_path,
+        args.score_pickle_path,
+        args.perf_wave_path,
+        args.mode,
+        args.cqt,
+        args.hop_len,
+        args.frame_len,
+        args.fmin,
+        args.fmax,
+        args.sample_rate,
+    )
+
+
+def _run_align_job(
+    job: AlignJob, features: Optional[FeaturesT] = None
+) -> AlignResultsT:
+    """
+    Run the job from scratch, or with only the follower and backend if its features
+    are given.
+    """
+    print("=============================================")
+    print(f"Starting to {job.action}: {job.piece} with {job.setting}")
+    print("=============================================")
+    output_align_dir = os.path.join(job.output_base_dir, job.piece)
+    os.makedirs(output_align_dir, exist_ok=True)
+    output_align_path = os.path.join(output_align_dir, "align.txt")
+
+    args = Arguments().parse_args(job.args + ["--backend_output", output_align_path])
+
+    runner = Runner(args)
+    if features is None:
+        runner.start()
+    else:
+        runner.start_with_features(*features)
+
+    align_results_path = os.path.join(output_align_dir, "result.json")
+    align_results = _get_and_write_align_results(
+        output_align_path, job.ref_align_path, align_results_path
+    )
+
+    print("=============================================")
+    print(f"Finished {job.action}ing: {job.piece} with {job.setting}")
+    print("=============================================")
+    return align_results
+
+
+def _run_align_job_group(jobs: List[AlignJob]) -> List[AlignResultsT]:
+    """
+    Run jobs with the same features, extracting them only once.
+    """
+    if len(jobs) == 1:
+        return [_run_align_job(jobs[0])]
+    features = Runner(Arguments().parse_args(jobs[0].args)).extract_features()
+    return [_run_align_job(job, features) for job in jobs]
+
+
+def _run_align_jobs(jobs: List[AlignJob], max_jobs: int, reuse_features: bool = False):
+    """
+    Run the jobs, `max_jobs` at once, then write the overall results of each
+    output_base_dir.
+
+    With `reuse_features`, jobs with the same features are run one after another
+    in one job which extracts the features once. Only for jobs that do not
+    simulate the performance.
+    """
+    if reuse_features:
+        groups: Dict[Tuple[Any, ...], List[int]] = {}
+        for idx, job in enumerate(jobs):
+            key = _get_features_key(Arguments().parse_args(job.args))
+            groups.setdefault(key, []).append(idx)
+        group_results = run_jobs(
+            [
+                functools.partial(_run_align_job_group, [jobs[idx] for idx in idxs])
+                for idxs in groups.values()
+            ],
+            max_jobs,
+        )
+        results: List[AlignResultsT] = [{} for _ in jobs]
+        for idxs, align_results_list in zip(groups.values(), group_results):
+            for idx, align_results in zip(idxs, align_results_list):
+                results[idx] = align_results
+    else:
+        results = run_jobs(
+            [functools.partial(_run_align_job, job) for job in jobs], max_jobs
+        )
+    overall_results_map: Dict[str, OverallResultsT] = {}
+    for job, align_results in zip(jobs, results):
+        overall_results = overall_results_map.setdefault(job.output_base_dir, {})
+        for thres, align_result in align_results.items():
+            if thres not in overall_results:
+                overall_results[thres] = []
+            overall_results[thres].append(align_result)
+    for output_base_dir, overall_results in overall_results_map.items():
+        os.makedirs(output_base_dir, exist_ok=True)
+        _write_overall_results(overall_results, output_base_dir)
+
+
+def _get_bach10_piece_paths() -> List[str]:
+    return [
+        f.path
+        for f in os.scandir(BACH10_PATH)
+        if f.is_dir() and bool(re.search(r"^[0-9]{2}-\w+$", os.path.basename(f.path)))
+    ]
+
+
+def bwv846_align(jobs: int = 1):
     repro_arg = "bwv846_align"
     pieces = ["prelude", "fugue"]
     cqts = ["nsgt", "librosa"]
+    align_jobs: List[AlignJob] = []
     for cqt in cqts:
-        overall_results: OverallResultsT = {}
         output_base_dir = os.path.join(REPRO_RESULTS_PATH, repro_arg, cqt)
-        os.makedirs(output_base_dir, exist_ok=True)
         for piece in pieces:
-            print("=============================================")
-            print(f"Starting to align: {piece} with cqt: {cqt}")
-            print("=============================================")
             score_midi_path = os.path.join(BWV846_PATH, piece, f"{piece}.r.mid")
             perf_wave_path = os.path.join(BWV846_PATH, piece, f"{piece}.wav")
-
-            output_align_dir = os.path.join(output_base_dir, piece)
-            os.makedirs(output_align_dir, exist_ok=True)
-            output_align_path = os.path.join(output_align_dir, "align.txt")
-
-            args = Arguments().parse_args(
-                [
-                    "--mode",
-                    "offline",
-                    "--score_midi_path",
-                    score_midi_path,
-                    "--dtw",
-                    "classical",
-                    "--cqt",
-                    cqt,
-                    "--perf_wave_path",
-                    perf_wave_path,
-                    "--backend_output",
-                    output_align_path,
-                ]
-            )
-
-            runner = Runner(args)
-            runner.start()
-
+            args = [
+                "--mode",
+                "offline",
+                "--score_midi_path",
+                score_midi_path,
+                "--dtw",
+                "classical",
+                "--cqt",
+                cqt,
+                "--perf_wave_path",
+                perf_wave_path,
+            ]
             ref_align_path = os.path.join(BWV846_PATH, piece, f"{piece}.align.txt")
-            align_results_path = os.path.join(output_align_dir, "result.json")
-            align_results = _get_and_write_align_results(
-                output_align_path, ref_align_path, align_results_path
+            align_jobs.append(
+                AlignJob(
+                    "align", piece, f"cqt: {cqt}", args, ref_align_path, output_base_dir
+                )
             )
+    _run_align_jobs(align_jobs, jobs)
 
-            for thres, align_result in align_results.items():
-                if thres not in overall_results:
-                    overall_results[thres] = []
-                overall_results[thres].append(align_result)
 
-            print("=============================================")
-            print(f"Finished aligning: {piece} with cqt: {cqt}")
-            print("=============================================")
-        _write_overall_results(overall_results, output_base_dir)
-
-
-def bwv846_follow():
+def bwv846_follow(jobs: int = 1):
     repro_arg = "bwv846_follow"
     pieces = ["prelude", "fugue"]
     cqts = ["nsgt", "librosa_pseudo"]
+    align_jobs: List[AlignJob] = []
     for cqt in cqts:
-        overall_results: OverallResultsT = {}
         output_base_dir = os.path.join(REPRO_RESULTS_PATH, repro_arg, cqt)
-        os.makedirs(output_base_dir, exist_ok=True)
         for piece in pieces:
-            print("=============================================")
-            print(f"Starting to follow: {piece} with cqt: {cqt}")
-            print("=============================================")
             score_midi_path = os.path.join(BWV846_PATH, piece, f"{piece}.r.mid")
             perf_wave_path = os.path.join(BWV846_PATH, piece, f"{piece}.wav")
-
-            output_align_dir = os.path.join(REPRO_RESULTS_PATH, repro_arg, cqt, piece)
-            os.makedirs(output_align_dir, exist_ok=True)
-            output_align_path = os.path.join(output_align_dir, "align.txt")
-
-            args = Arguments().parse_args(
-                [
-                    "--score_midi_path",
-                    score_midi_path,
-                    "--cqt",
-                    cqt,
-                    "--perf_wave_path",
-                    perf_wave_path,
-                    "--backend_output",
-                    output_align_path,
-                    "--simulate_performance",
-                    "--backend_backtrack",
-                    "--w_a",
-                    "0.5",
-                ]
-            )
-
-            runner = Runner(args)
-            runner.start()
-
+            args = [
+                "--score_midi_path",
+                score_midi_path,
+                "--cqt",
+                cqt,
+                "--perf_wave_path",
+                perf_wave_path,
+                "--simulate_performance",
+                "--backend_backtrack",
+                "--w_a",
+                "0.5",
+            ]
             ref_align_path = os.path.join(BWV846_PATH, piece, f"{piece}.align.txt")
-            align_results_path = os.path.join(output_align_dir, "result.json")
-            align_results = _get_and_write_align_results(
-                output_align_path, ref_align_path, align_results_path
+            align_jobs.append(
+                AlignJob(
+                    "follow",
+                    piece,
+                    f"cqt: {cqt}",
+                    args,
+                    ref_align_path,
+                    output_base_dir,
+                )
             )
-
-            for thres, align_result in align_results.items():
-                if thres not in overall_results:
-                    overall_results[thres] = []
-                overall_results[thres].append(align_result)
-
-            print("=============================================")
-            print(f"Finished following: {piece} with cqt: {cqt}")
-            print("=============================================")
-        _write_overall_results(overall_results, output_base_dir)
+    _run_align_jobs(align_jobs, jobs)
 
 
-def bach10_align():
+def bach10_align(jobs: int = 1):
     repro_arg = "bach10_align"
-    bach10_piece_paths = [
-        f.path
-        for f in os.scandir(BACH10_PATH)
-        if f.is_dir() and bool(re.search(r"^[0-9]{2}-\w+$", os.path.basename(f.path)))
-    ]
+    bach10_piece_paths = _get_bach10_piece_paths()
     cqts = ["nsgt", "librosa"]
+    align_jobs: List[AlignJob] = []
     for cqt in cqts:
-        overall_results: OverallResultsT = {}
         output_base_dir = os.path.join(REPRO_RESULTS_PATH, repro_arg, cqt)
-        os.makedirs(output_base_dir, exist_ok=True)
         for piece_path in bach10_piece_paths:
             piece = os.path.basename(piece_path)
-            print("=============================================")
-            print(f"Starting to align: {piece} with cqt: {cqt}")
-            print("=============================================")
             score_midi_path = os.path.join(piece_path, f"{piece}.mid")
             perf_wave_path = os.path.join(piece_path, f"{piece}.wav")
-
-            output_align_dir = os.path.join(REPRO_RESULTS_PATH, repro_arg, cqt, piece)
-            os.makedirs(output_align_dir, exist_ok=True)
-            output_align_path = os.path.join(output_align_dir, "align.txt")
-
-            args = Arguments().parse_args(
-                [
-                    "--mode",
-                    "offline",
-                    "--score_midi_path",
-                    score_midi_path,
-                    "--dtw",
-                    "classical",
-                    "--cqt",
-                    cqt,
-                    "--hop_len",
-                    "2048",
-                    "--perf_wave_path",
-                    perf_wave_path,
-                    "--backend_output",
-                    output_align_path,
-                ]
-            )
-
-            runner = Runner(args)
-            runner.start()
-
+            args = [
+                "--mode",
+                "offline",
+                "--score_midi_path",
+                score_midi_path,
+                "--dtw",
+                "classical",
+                "--cqt",
+                cqt,
+                "--hop_len",
+                "2048",
+                "--perf_wave_path",
+                perf_wave_path,
+            ]
             ref_align_path = os.path.join(BACH10_PATH, piece, f"{piece}.txt")
-            align_results_path = os.path.join(output_align_dir, "result.json")
-            align_results = _get_and_write_align_results(
-                output_align_path, ref_align_path, align_results_path
+            align_jobs.append(
+                AlignJob(
+                    "align", piece, f"cqt: {cqt}", args, ref_align_path, output_base_dir
+                )
             )
-
-            for thres, align_result in align_results.items():
-                if thres not in overall_results:
-                    overall_results[thres] = []
-                overall_results[thres].append(align_result)
-
-            print("=============================================")
-            print(f"Finished aligning: {piece} with cqt: {cqt}")
-            print("=============================================")
-        _write_overall_results(overall_results, output_base_dir)
+    _run_align_jobs(align_jobs, jobs)
 
 
-def bach10_follow():
+def bach10_follow(jobs: int = 1):
     repro_arg = "bach10_follow"
-    bach10_piece_paths = [
-        f.path
-        for f in os.scandir(BACH10_PATH)
-        if f.is_dir() and bool(re.search(r"^[0-9]{2}-\w+$", os.path.basename(f.path)))
-    ]
+    bach10_piece_paths = _get_bach10_piece_paths()
     cqts = ["nsgt", "librosa_pseudo"]
+    align_jobs: List[AlignJob] = []
     for cqt in cqts:
-        overall_results: OverallResultsT = {}
         output_base_dir = os.path.join(REPRO_RESULTS_PATH, repro_arg, cqt)
-        os.makedirs(output_base_dir, exist_ok=True)
         for piece_path in bach10_piece_paths:
             piece = os.path.basename(piece_path)
-            print("=============================================")
-            print(f"Starting to follow: {piece} with cqt: {cqt}")
-            print("=============================================")
             score_midi_path = os.path.join(piece_path, f"{piece}.mid")
             perf_wave_path = os.path.join(piece_path, f"{piece}.wav")
-
-            output_align_dir = os.path.join(REPRO_RESULTS_PATH, repro_arg, cqt, piece)
-            os.makedirs(output_align_dir, exist_ok=True)
-            output_align_path = os.path.join(output_align_dir, "align.txt")
-
-            args = Arguments().parse_args(
-                [
-                    "--score_midi_path",
-                    score_midi_path,
-                    "--cqt",
-                    cqt,
-                    "--perf_wave_path",
-                    perf_wave_path,
-                    "--backend_output",
-                    output_align_path,
-                    "--simulate_performance",
-                    "--backend_backtrack",
-                    "--w_a",
-                    "0.5",
-                ]
-            )
-
-            runner = Runner(args)
-            runner.start()
-
+            args = [
+                "--score_midi_path",
+                score_midi_path,
+                "--cqt",
+                cqt,
+                "--perf_wave_path",
+                perf_wave_path,
+                "--simulate_performance",
+                "--backend_backtrack",
+                "--w_a",
+                "0.5",
+            ]
             ref_align_path = os.path.join(BACH10_PATH, piece, f"{piece}.txt")
-            align_results_path = os.path.join(output_align_dir, "result.json")
-            align_results = _get_and_write_align_results(
-                output_align_path, ref_align_path, align_results_path
+            align_jobs.append(
+                AlignJob(
+                    "follow",
+                    piece,
+                    f"cqt: {cqt}",
+                    args,
+                    ref_align_path,
+                    output_base_dir,
+                )
             )
-
-            for thres, align_result in align_results.items():
-                if thres not in overall_results:
-                    overall_results[thres] = []
-                overall_results[thres].append(align_result)
-
-            print("=============================================")
-            print(f"Finished following: {piece} with cqt: {cqt}")
-            print("=============================================")
-        _write_overall_results(overall_results, output_base_dir)
+    _run_align_jobs(align_jobs, jobs)
 
 
 def _plot_precision_plot(data: Dict[str, List[Tuple[int, float]]], output_dir: str):
@@ -827,29 +867,31 @@ def playground():
     )
 """
 
-func_map = {
-    # "cqt_frame_time": cqt_frame_time,
-    "cqt_time": cqt_time,
-    "dtw_time": dtw_time,
-    "bwv846_feature": bwv846_feature,
-    "bach10_feature": bach10_feature,
+# every function takes the maximum number of jobs to run at once
+func_map: Dict[str, Callable[[int], None]] = {
+    # "cqt_frame_time": lambda jobs: cqt_frame_time(),
+    "cqt_time": lambda jobs: cqt_time(),
+    "dtw_time": lambda jobs: dtw_time(),
+    "bwv846_feature": lambda jobs: bwv846_feature(),
+    "bach10_feature": lambda jobs: bach10_feature(),
     "bwv846_align": bwv846_align,
     "bach10_align": bach10_align,
     "bwv846_follow": bwv846_follow,
     "bach10_follow": bach10_follow,
-    "bach10_plot_precision": bach10_plot_precision,
-    "bwv846_plot_precision": bwv846_plot_precision,
+    "bach10_plot_precision": lambda jobs: bach10_plot_precision(),
+    "bwv846_plot_precision": lambda jobs: bwv846_plot_precision(),
 }
 
 if __name__ == "__main__":
-    repro_args = sys.argv[1:]
+    repro_args, jobs = parse_jobs_arg(sys.argv[1:])
+    max_jobs = get_max_jobs(jobs)
     if len(repro_args) == 0:
         eprint("No repro arg given--running everything!")
         for name, f in func_map.items():
             print("++++++++++++++++++++++++++++++++++++")
             print(f"Starting: {name}")
             print("++++++++++++++++++++++++++++++++++++")
-            f()
+            f(max_jobs)
             print("++++++++++++++++++++++++++++++++++++")
             print(f"Finished: {name}")
             print("++++++++++++++++++++++++++++++++++++")
@@ -859,7 +901,7 @@ if __name__ == "__main__":
         sys.exit(1)
     repro_arg = repro_args[0]
     if repro_arg in func_map:
-        func_map[repro_arg]()
+        func_map[repro_arg](max_jobs)
     else:
         eprint(f"Unknown repro arg: {repro_arg}. Please see README.md")
         sys.exit(1)
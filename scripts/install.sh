@@ -11,7 +11,7 @@ sudo apt-get install fluidsynth
 # Install Python requirements
 python -m pip install --upgrade pip
 pip install -r requirements.txt
-pip install nsgt
+pip install nsgt==0.18  # nsgt_forward_batch is tested against it
 
 # Install fftw
 wget http://fftw.org/fftw-3.3.9.tar.gz
@@ -0,0 +1,49 @@
+from lib.components.audiopreprocessor import AudioPreprocessor
+from lib.mputils import consume_queue, create_event, create_queue, create_worker
+import numpy as np
+import os
+import soundfile as sf  # type: ignore
+import tempfile
+import unittest
+
+SAMPLE_RATE = 22050
+HOP_LEN = 2048
+DURATION = 5.0  # s
+
+
+class TestAudioPreprocessor(unittest.TestCase):
+    def test_stop_event(self):
+        # the performance is streamed in real time, and stopped after 3 frames
+        rng = np.random.default_rng(42)
+        audio = rng.standard_normal(int(DURATION * SAMPLE_RATE)) * 0.1
+        with tempfile.TemporaryDirectory() as d:
+            wave_path = os.path.join(d, "perf.wav")
+            sf.write(wave_path, audio.astype(np.float32), SAMPLE_RATE)
+
+            features_queue = create_queue("queue", pipeline="thread")
+            stop_event = create_event("thread")
+            ap = AudioPreprocessor(
+                SAMPLE_RATE,
+                HOP_LEN,
+                8192,
+                wave_path,
+                True,
+                0.0,
+                "online",
+                "librosa_pseudo",
+                130.8,
+                4186.0,
+                features_queue,  # type: ignore
+                pipeline="thread",
+                stop_event=stop_event,
+            )
+            ap_thread = create_worker(ap.start, "thread")
+            ap_thread.start()
+            for _ in range(3):
+                self.assertIsNotNone(features_queue.get())
+            stop_event.set()
+            ap_thread.join(timeout=DURATION / 2)
+
+            self.assertFalse(ap_thread.is_alive())
+            # at most a slice more from each of the slicer and feature extractor
+            self.assertLessEqual(len(consume_queue(features_queue)), 2)
@@ -1,10 +1,22 @@
-from lib.components.backend import get_closest_notes_before
+from lib.components.backend import (
+    Backend,
+    NoteOnsetIndex,
+    get_closest_notes_before,
+    get_sorted_note_onsets,
+)
+from lib.mputils import DequeQueue
+from lib.virtualclock import get_slice_release_time
 from typing import List, Optional, Tuple
 from lib.sharedtypes import NoteInfo
 from sortedcontainers import SortedDict  # type: ignore
 
 
 from typing import List
+import multiprocessing as mp
+import numpy as np
+import os
+import tempfile
+import time
 import unittest
 
 
@@ -29,3 +41,143 @@ class TestGetClosestNotesBefore(unittest.TestCase):
         for (inp, want) in testcases:
             got = get_closest_notes_before(sorted_note_onsets, inp)
             self.assertEqual(want, got)
+
+
+class TestNoteOnsetIndex(unittest.TestCase):
+    def test_matches_get_closest_notes_before(self):
+        rng = np.random.default_rng(42)
+        score_note_onsets = [
+            NoteInfo(int(n), float(t))
+            for n, t in zip(
+                rng.integers(40, 90, 200), np.round(rng.uniform(50, 20000, 200), 1)
+            )
+        ]
+        score_note_onsets += [NoteInfo(60, 1000.0), NoteInfo(64, 1000.0)]
+        sorted_note_onsets = get_sorted_note_onsets(score_note_onsets)
+        hop_len = 2048
+        sample_rate = 44100
+        index = NoteOnsetIndex(score_note_onsets, hop_len, sample_rate)
+
+        frames = np.arange(1000)
+        bulk = index.frame_groups(frames)
+        for s in frames.tolist():
+            want = get_closest_notes_before(
+                sorted_note_onsets, float(hop_len * s) / sample_rate * 1000
+            )
+            group = index.frame_group(s)
+            self.assertEqual(group, bulk[s], s)
+            got = [] if group < 0 else index.groups[group]
+            self.assertEqual(want, got, s)
+
+    def test_empty(self):
+        index = NoteOnsetIndex([], 2048, 44100)
+        self.assertEqual(-1, index.frame_group(0))
+        self.assertEqual(-1, index.frame_group(100))
+
+
+class TestBackend(unittest.TestCase):
+    def test_offline_alignment(self):
+        # onsets (ms) and frames of 100 ms
+        score_note_onsets = [
+            NoteInfo(60, 100),
+            NoteInfo(62, 300),
+            NoteInfo(64, 300),
+            NoteInfo(65, 600),
+        ]
+        path = [(0, 0), (1, 1), (2, 1), (3, 2), (4, 3), (4, 2), (5, 4), (6, 6)]
+        # jumping ahead and back
+        jump_path = [(0, 0), (1, 3), (2, 1), (3, 2), (4, 6)]
+        # path, backend_backtrack, want
+        testcases: List[Tuple[List[Tuple[int, int]], bool, List[str]]] = [
+            (
+                path,
+                False,
+                [
+                    "100 100 100 60",
+                    "400 400 300 62",
+                    "400 400 300 64",
+                    "600 600 600 65",
+                ],
+            ),
+            (
+                jump_path,
+                False,
+                ["100 100 300 62", "100 100 300 64", "400 400 600 65"],
+            ),
+            (
+                jump_path,
+                True,
+                [
+                    "100 100 300 62",
+                    "100 100 300 64",
+                    "200 200 100 60",
+                    "400 400 600 65",
+                ],
+            ),
+        ]
+        for path, backend_backtrack, want in testcases:
+            with tempfile.TemporaryDirectory() as d:
+                output_path = os.path.join(d, "align.txt")
+                q = DequeQueue()
+                for e in path:
+                    q.put(e)
+                q.put(None)
+                _, conn = mp.Pipe()
+                backend = Backend(
+                    "offline",
+                    "alignment",
+                    q,
+                    conn,
+                    score_note_onsets,
+                    100,
+                    400,
+                    True,
+                    1000,
+                    output_path,
+                    backend_backtrack,
+                )
+                backend.start()
+                with open(output_path) as f:
+                    got = f.read().splitlines()
+                self.assertEqual(want, got, backend_backtrack)
+
+    def test_online_virtual_clock_consumed_frame(self):
+        # the follower outputs rows well behind the last frame it took
+        score_note_onsets = [NoteInfo(60, 100), NoteInfo(62, 300), NoteInfo(64, 600)]
+        hop_len, frame_len, sample_rate = 100, 400, 1000
+        # (p, s, consumed frame)
+        outputs = [(0, 0, 0), (1, 1, 5), (2, 3, 9), (6, 6, 20)]
+        with tempfile.TemporaryDirectory() as d:
+            output_path = os.path.join(d, "align.txt")
+            q = DequeQueue()
+            for e in outputs:
+                q.put(e)
+            q.put(None)
+            recv_conn, send_conn = mp.Pipe()
+            send_conn.send(time.perf_counter())
+            backend = Backend(
+                "online",
+                "alignment",
+                q,
+                recv_conn,
+                score_note_onsets,
+                hop_len,
+                frame_len,
+                False,
+                sample_rate,
+                output_path,
+                False,
+                virtual_clock=True,
+            )
+            backend.start()
+            with open(output_path) as f:
+                got = [line.split() for line in f.read().splitlines()]
+
+        # est_time, det_time, note_start, midi_note_num
+        want = [["100", "100", "60"], ["200", "300", "62"], ["600", "600", "64"]]
+        self.assertEqual(want, [[l[0], l[2], l[3]] for l in got])
+        for line, consumed in zip(got, [5, 9, 20]):
+            release_time = get_slice_release_time(
+                consumed, hop_len, frame_len, sample_rate
+            )
+            self.assertGreaterEqual(float(line[1]), release_time * 1000, line)
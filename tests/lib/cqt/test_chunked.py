@@ -0,0 +1,32 @@
+from lib.cqt.chunked import extract_chunked, get_chunks
+from lib.cqt.cqt_nsgt import CQTNSGT
+from typing import List, Tuple
+import unittest
+import numpy as np
+
+
+class TestChunked(unittest.TestCase):
+    def test_get_chunks(self):
+        # name, n_samples, frame_len, hop_len, n_chunks, want
+        testcases: List[Tuple[str, int, int, int, int, List[Tuple[int, int]]]] = [
+            ("Shorter than a frame", 3, 4, 2, 2, []),
+            ("One frame", 5, 4, 2, 3, [(0, 4)]),
+            ("Even split", 10, 4, 2, 2, [(0, 6), (4, 10)]),
+            ("Uneven split", 12, 4, 2, 2, [(0, 6), (4, 12)]),
+            ("More chunks than frames", 8, 4, 2, 9, [(0, 4), (2, 6), (4, 8)]),
+            ("Hop longer than frame", 20, 2, 5, 2, [(0, 7), (10, 17)]),
+        ]
+        for name, n_samples, frame_len, hop_len, n_chunks, want in testcases:
+            got = get_chunks(n_samples, frame_len, hop_len, n_chunks)
+            self.assertEqual(want, got, name)
+
+    def test_extract_chunked(self):
+        rng = np.random.default_rng(42)
+        audio = (rng.standard_normal(4096 * 12 + 321) * 0.1).astype(np.float32)
+        extractor = CQTNSGT(4096, 1000)
+        want = extractor.extract(audio)
+        for workers in [1, 2, 3]:
+            got = extract_chunked(extractor, audio, workers)
+            self.assertEqual(len(want), len(got), workers)
+            for w, g in zip(want, got):
+                np.testing.assert_array_equal(w, g, workers)
@@ -0,0 +1,115 @@
+from lib.cqt.cqt_librosa import (
+    LibrosaFullCQT,
+    LibrosaSliceCQT,
+    PseudoCQTKernel,
+    get_frames,
+    get_librosa_params,
+    is_all_pseudo,
+)
+from typing import Any, List, Tuple
+import unittest
+import librosa  # type: ignore
+import numpy as np
+
+# PseudoCQTKernel follows this version of librosa
+LIBROSA_VERSION = "0.8.0"
+
+
+class TestLibrosaSliceCQT(unittest.TestCase):
+    def test_pseudo_kernel_tone(self):
+        fs = 22050
+        fmin, n_bins = get_librosa_params(130.8, 4186.0)
+        extractor = LibrosaSliceCQT("librosa_pseudo", 2048, fmin, n_bins, fs)
+        t = np.arange(8192) / fs
+        # midi note, bin with the most energy
+        testcases: List[Tuple[int, int]] = [(48, 0), (60, 12), (69, 21), (95, 47)]
+        for midi_note, want in testcases:
+            audio = np.sin(2 * np.pi * librosa.midi_to_hz(midi_note) * t)
+            got = extractor.extract(audio.astype(np.float32))
+            self.assertEqual((n_bins,), got.shape, midi_note)
+            self.assertEqual(want, int(np.argmax(got)), midi_note)
+            self.assertAlmostEqual(1.0, float(np.sum(got)), places=5)
+
+    def test_hybrid_kernel_matches_pseudo(self):
+        # with slices this long, librosa computes every hybrid bin with the pseudo CQT
+        fmin, n_bins = get_librosa_params(130.8, 4186.0)
+        pseudo = LibrosaSliceCQT("librosa_pseudo", 2048, fmin, n_bins)
+        hybrid = LibrosaSliceCQT("librosa_hybrid", 2048, fmin, n_bins)
+        rng = np.random.default_rng(42)
+        for _ in range(3):
+            audio = (rng.standard_normal(8192) * 0.1).astype(np.float32)
+            np.testing.assert_array_equal(pseudo.extract(audio), hybrid.extract(audio))
+
+
+class TestPseudoCQTKernel(unittest.TestCase):
+    def test_extract_frames_blocked(self):
+        fmin, n_bins = get_librosa_params(130.8, 4186.0)
+        kernel = PseudoCQTKernel(8192, fmin, n_bins)
+        rng = np.random.default_rng(42)
+        audio = (rng.standard_normal(8192 + 2048 * 9) * 0.1).astype(np.float32)
+        frames = get_frames(audio, 8192, 2048)
+        want = kernel.extract_frames(frames, batch_frames=len(frames))
+        self.assertEqual((10, n_bins), want.shape)
+        for batch_frames in [1, 3, 4]:
+            got = kernel.extract_frames(frames, batch_frames=batch_frames)
+            np.testing.assert_array_equal(want, got, batch_frames)
+
+    @unittest.skipIf(
+        librosa.__version__ != LIBROSA_VERSION,
+        f"PseudoCQTKernel follows librosa {LIBROSA_VERSION}",
+    )
+    def test_matches_librosa(self):
+        fs = 22050
+        fmin, n_bins = get_librosa_params(130.8, 4186.0)
+        rng = np.random.default_rng(42)
+        # cqt, librosa function, slice_len
+        testcases: List[Tuple[str, Any, int]] = [
+            ("librosa_pseudo", librosa.pseudo_cqt, 8192),
+            ("librosa_pseudo", librosa.pseudo_cqt, 2048),
+            ("librosa_hybrid", librosa.hybrid_cqt, 8192),
+            ("librosa_hybrid", librosa.hybrid_cqt, 4096),
+        ]
+        for cqt, cqt_func, slice_len in testcases:
+            name = f"{cqt}, slice_len={slice_len}"
+            # the slices the kernel is used for
+            self.assertTrue(is_all_pseudo(cqt, slice_len, fmin, n_bins, fs), name)
+            kernel = PseudoCQTKernel(slice_len, fmin, n_bins, fs)
+            for _ in range(3):
+                audio = (rng.standard_normal(slice_len) * 0.1).astype(np.float32)
+                want = np.abs(
+                    cqt_func(
+                        audio, sr=fs, hop_length=slice_len, fmin=fmin, n_bins=n_bins
+                    )
+                )[:, 0]
+                got = kernel.extract(audio)
+                np.testing.assert_allclose(
+                    got, want, rtol=1e-5, atol=1e-6 * np.max(want), err_msg=name
+                )
+
+
+class TestLibrosaFullCQT(unittest.TestCase):
+    def test_framed_matches_slices(self):
+        fmin, n_bins = get_librosa_params(130.8, 4186.0)
+        rng = np.random.default_rng(42)
+        audio = (rng.standard_normal(8192 * 6 + 1000) * 0.1).astype(np.float32)
+        # cqt, frame_len, hop_len
+        testcases: List[Tuple[str, int, int]] = [
+            ("librosa_pseudo", 8192, 2048),
+            ("librosa_hybrid", 8192, 2048),
+            ("librosa_pseudo", 4096, 3000),
+            ("librosa_hybrid", 4096, 4096),  # some bins through librosa.cqt
+            ("librosa_pseudo", len(audio) + 1, 2048),  # no frames
+        ]
+        for cqt, frame_len, hop_len in testcases:
+            name = f"{cqt}, frame_len={frame_len}, hop_len={hop_len}"
+            slice_extractor = LibrosaSliceCQT(cqt, hop_len, fmin, n_bins)
+            want = [
+                slice_extractor.extract(audio[i : i + frame_len])
+                for i in range(0, len(audio) - frame_len + 1, hop_len)
+            ]
+
+            got = LibrosaFullCQT(cqt, frame_len, hop_len, fmin, n_bins).extract(audio)
+
+            self.assertEqual(len(want), len(got), name)
+            for w, g in zip(want, got):
+                np.testing.assert_array_equal(w, g, name)
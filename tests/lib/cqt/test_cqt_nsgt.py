@@ -0,0 +1,55 @@
+from lib.cqt.cqt_nsgt import (
+    CQTNSGT,
+    CQTNSGTSlicq,
+    extract_features_nsgt_slicq_batch,
+    get_slicq_engine,
+)
+from typing import List, Tuple
+import unittest
+import numpy as np
+
+
+class TestCQTNSGT(unittest.TestCase):
+    def test_extract_matches_slicq(self):
+        rng = np.random.default_rng(42)
+        # sl_len, tr_len, audio length
+        testcases: List[Tuple[int, int, int]] = [
+            (8192, 2048, 8192 * 4 + 123),
+            (4096, 1000, 4096 * 3),
+            (8192, 4000, 8192 + 3999),
+            (8192, 2048, 8191),  # shorter than a slice
+        ]
+
+        for sl_len, tr_len, audio_len in testcases:
+            name = f"sl_len={sl_len}, tr_len={tr_len}, audio_len={audio_len}"
+            audio = (rng.standard_normal(audio_len) * 0.1).astype(np.float32)
+            slicq = CQTNSGTSlicq(sl_len, tr_len)
+            want = [
+                slicq.extract(audio[hop_start : hop_start + sl_len])
+                for hop_start in range(0, audio_len - sl_len + 1, tr_len)
+            ]
+
+            got = CQTNSGT(sl_len, tr_len).extract(audio)
+
+            self.assertEqual(len(want), len(got), name)
+            for w, g in zip(want, got):
+                np.testing.assert_array_equal(w, g, name)
+
+    def test_batch_fallback(self):
+        # an nsgt engine without the internals of the batched transform
+        class ForwardOnlySlicq:
+            def __init__(self, sl_len: int, tr_len: int):
+                slicq = get_slicq_engine(sl_len, tr_len)
+                self.sl_len = slicq.sl_len
+                self.forward = slicq.forward
+
+        rng = np.random.default_rng(42)
+        audio = (rng.standard_normal(8192 * 4 + 123) * 0.1).astype(np.float32)
+        want = extract_features_nsgt_slicq_batch(
+            get_slicq_engine(8192, 2048), 2048, audio
+        )
+        got = extract_features_nsgt_slicq_batch(
+            ForwardOnlySlicq(8192, 2048), 2048, audio  # type: ignore
+        )
+        self.assertEqual((13, want.shape[1]), got.shape)
+        np.testing.assert_array_equal(want, got)
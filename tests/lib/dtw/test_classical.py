@@ -70,6 +70,25 @@ class TestClassicalDTW(unittest.TestCase):
         ]
 
         for name, P, S, want in testcases:
-            cdtw = ClassicalDTW(P, S, 1.0, 1.0, 1.0)
-            got = cdtw.dtw()
-            self.assertEqual(want, got, name)
+            for low_memory in [False, True]:
+                cdtw = ClassicalDTW(P, S, 1.0, 1.0, 1.0, low_memory)
+                got = cdtw.dtw()
+                self.assertEqual(want, got, f"{name} (low_memory: {low_memory})")
+
+    def test_classical_low_memory(self):
+        rng = np.random.default_rng(42)
+        # (len(P), len(S), (w_a, w_b, w_c))
+        testcases: List[Tuple[int, int, Tuple[float, float, float]]] = [
+            (1, 30, (1.0, 1.0, 1.0)),
+            (30, 1, (1.0, 1.0, 1.0)),
+            (57, 43, (1.0, 1.0, 1.0)),
+            (120, 150, (0.5, 1.0, 2.0)),
+        ]
+        for len_P, len_S, w in testcases:
+            P = list(rng.random((len_P, 12)))
+            S = list(rng.random((len_S, 12)))
+            want = ClassicalDTW(P, S, *w).dtw()
+            got = ClassicalDTW(P, S, *w, low_memory=True).dtw()
+            self.assertEqual(want, got, f"{len_P}x{len_S} with weights {w}")
+            self.assertEqual((0, 0), got[0])
+            self.assertEqual((len_P - 1, len_S - 1), got[-1])
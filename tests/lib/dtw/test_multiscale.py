@@ -0,0 +1,80 @@
+from lib.sharedtypes import ExtractedFeature
+from lib.dtw.classical import ClassicalDTW
+from lib.dtw.multiscale import MultiscaleDTW
+from typing import List, Tuple
+import numpy as np
+import unittest
+
+
+class TestMultiscaleDTW(unittest.TestCase):
+    def test_multiscale_exception(self):
+        # P, S, radius, partial exception str
+        testcases: List[
+            Tuple[List[ExtractedFeature], List[ExtractedFeature], int, str]
+        ] = [
+            (
+                [],
+                [np.array([1, 2, 3], dtype=np.float64)],
+                1,
+                "Empty P",
+            ),
+            (
+                [np.array([1, 2, 3], dtype=np.float64)],
+                [],
+                1,
+                "Empty S",
+            ),
+            (
+                [np.array([[1, 2, 3]], dtype=np.float64)],
+                [np.array([1, 2, 3], dtype=np.float64)],
+                1,
+                "P must be 2D",
+            ),
+            (
+                [np.array([1, 2, 3], dtype=np.float64)],
+                [np.array([[1, 2, 3]], dtype=np.float64)],
+                1,
+                "S must be 2D",
+            ),
+            (
+                [np.array([1, 2, 3], dtype=np.float64)],
+                [np.array([1, 2, 3], dtype=np.float64)],
+                -1,
+                "radius must be positive",
+            ),
+        ]
+        for P, S, radius, excp_str in testcases:
+            with self.assertRaises(Exception, msg=excp_str) as context:
+                mdtw = MultiscaleDTW(P, S, 1.0, 1.0, 1.0, radius)
+                mdtw.dtw()
+            self.assertTrue(excp_str in str(context.exception), excp_str)
+
+    def test_multiscale_full_window(self):
+        # every level is aligned within a window covering all of it, as classical
+        rng = np.random.default_rng(42)
+        # (len(P), len(S), (w_a, w_b, w_c))
+        testcases: List[Tuple[int, int, Tuple[float, float, float]]] = [
+            (1, 1, (1.0, 1.0, 1.0)),
+            (1, 30, (1.0, 1.0, 1.0)),
+            (30, 1, (1.0, 1.0, 1.0)),
+            (57, 43, (1.0, 1.0, 1.0)),
+            (120, 150, (0.5, 1.0, 2.0)),
+        ]
+        for len_P, len_S, w in testcases:
+            # few distinct values, so that there are ties
+            P = list(rng.integers(0, 3, (len_P, 4)).astype(np.float64))
+            S = list(rng.integers(0, 3, (len_S, 4)).astype(np.float64))
+            want = ClassicalDTW(P, S, *w).dtw()
+            got = MultiscaleDTW(P, S, *w, radius=max(len_P, len_S)).dtw()
+            self.assertEqual(want, got, f"{len_P}x{len_S} with weights {w}")
+
+    def test_multiscale_tempo_change(self):
+        # P follows S at varying tempi: a small radius finds the same path
+        rng = np.random.default_rng(42)
+        S = np.repeat(rng.random((100, 12)) ** 4, 4, axis=0)
+        frames = np.concatenate((np.arange(0, 200, 0.8), np.arange(200, 400, 1.5)))
+        P = S[frames.astype(int)] + 0.05 * rng.random((len(frames), 12))
+        want = ClassicalDTW(P, S).dtw()
+        for radius in [5, 10]:
+            got = MultiscaleDTW(P, S, radius=radius).dtw()
+            self.assertEqual(want, got, radius)
@@ -1,7 +1,7 @@
 from lib.dtw.oltw import OLTW
 from lib.sharedtypes import DTWPathElemType, ExtractedFeature
 from lib.mputils import consume_queue, produce_queue
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import unittest
 import multiprocessing as mp
 import numpy as np
@@ -61,11 +61,102 @@ class TestOLTW(unittest.TestCase):
         ]
 
         for name, P, S, want in testcases:
+            # S as a list of features and as a feature matrix
+            for S_in in [S, np.array(S)]:
+                output_queue = mp.Queue()
+                P_queue = produce_queue(P)
+
+                oltw = OLTW(P_queue, S_in, output_queue, 999, 3, 1.0, 1.0, 1.0)
+                oltw.dtw()
+
+                got = consume_queue(output_queue)
+                self.assertEqual(want, got, name)
+
+    def test_oltw_identical_sequences(self):
+        # the band wraps around the circular D and P buffers many times
+        rng = np.random.default_rng(42)
+        S = rng.random((50, 12))
+        for search_window in [1, 3, 10]:
+            output_queue = mp.Queue()
+            P_queue = produce_queue(list(S))
+
+            oltw = OLTW(P_queue, S, output_queue, 3, search_window, 1.0, 1.0, 1.0)
+            oltw.dtw()
+
+            got = consume_queue(output_queue)
+            self.assertEqual([(k, k) for k in range(len(S))], got, search_window)
+            self.assertEqual((search_window + 1, search_window + 1), oltw.D.shape)
+
+    def test_oltw_adaptive_search_window(self):
+        # the best cell always stands out, so the search window shrinks to its minimum
+        rng = np.random.default_rng(42)
+        S = rng.random((200, 12))
+        # search_window, min_search_window
+        testcases: List[Tuple[int, int]] = [(50, 5), (50, 20), (10, 1)]
+        for search_window, min_search_window in testcases:
+            name = f"{search_window}, {min_search_window}"
             output_queue = mp.Queue()
-            P_queue = produce_queue(P)
+            P_queue = produce_queue(list(S))
 
-            oltw = OLTW(P_queue, S, output_queue, 999, 3, 1.0, 1.0, 1.0)
+            oltw = OLTW(
+                P_queue,
+                S,
+                output_queue,
+                3,
+                search_window,
+                min_search_window=min_search_window,
+            )
             oltw.dtw()
 
             got = consume_queue(output_queue)
-            self.assertEqual(want, got, name)
+            self.assertEqual([(k, k) for k in range(len(S))], got, name)
+            self.assertEqual(min_search_window, oltw.C, name)
+            self.assertEqual((search_window + 1, search_window + 1), oltw.D.shape)
+
+    def test_oltw_adaptive_search_window_jump(self):
+        # the performance jumps 100 frames ahead, beyond the shrunk search window
+        rng = np.random.default_rng(42)
+        S = np.repeat(rng.random((150, 12)) ** 4, 4, axis=0)
+        frames = np.concatenate((np.arange(0, 200), np.arange(300, len(S))))
+        P = S[frames] + 0.05 * rng.random((len(frames), 12))
+        search_window, min_search_window = 300, 20
+
+        class WindowRecorder:
+            """
+            Records the search window at every output.
+            """
+
+            def __init__(self):
+                self.oltw: Optional[OLTW] = None
+                self.outputs: List[Tuple[int, int, int]] = []
+
+            def put(self, e: Optional[DTWPathElemType]):
+                if e is not None and self.oltw is not None:
+                    self.outputs.append((*e, self.oltw.C))
+
+        # search_window, min_search_window, whether the path is found again
+        testcases: List[Tuple[int, int, bool]] = [
+            (search_window, min_search_window, True),
+            (min_search_window, 0, False),
+        ]
+        for search_window, min_search_window, want_found in testcases:
+            name = f"{search_window}, {min_search_window}"
+            recorder = WindowRecorder()
+            oltw = OLTW(
+                produce_queue(list(P)),
+                S,
+                recorder,  # type: ignore
+                3,
+                search_window,
+                min_search_window=min_search_window,
+            )
+            recorder.oltw = oltw
+            oltw.dtw()
+
+            before = [C for i, _, C in recorder.outputs if i < 200]
+            after = [C for i, _, C in recorder.outputs if i >= 200]
+            errors = [abs(j - frames[i]) for i, j, _ in recorder.outputs if i >= 300]
+            self.assertEqual(want_found, max(errors) <= 3, name)
+            if min_search_window > 0:
+                self.assertEqual(min_search_window, before[-1], name)
+                self.assertEqual(search_window, max(after), name)
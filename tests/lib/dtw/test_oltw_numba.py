@@ -0,0 +1,43 @@
+from lib.dtw.oltw import OLTW
+from lib.dtw.oltw_numba import OLTWNumba
+from lib.mputils import DequeQueue, consume_queue, produce_queue
+from lib.sharedtypes import DTWPathElemType
+from typing import List, Tuple
+import unittest
+import numpy as np
+
+
+def _follow(oltw_cls, P: np.ndarray, S: np.ndarray, *args) -> List[DTWPathElemType]:
+    output_queue = DequeQueue()
+    oltw_cls(produce_queue(list(P)), S, output_queue, *args).dtw()
+    return consume_queue(output_queue)  # type: ignore
+
+
+class TestOLTWNumba(unittest.TestCase):
+    def test_oltw_numba_constructor(self):
+        with self.assertRaises(ValueError):
+            OLTWNumba(DequeQueue(), [], DequeQueue(), 3, 3)  # type: ignore
+
+    def test_oltw_numba_same_as_oltw(self):
+        rng = np.random.default_rng(42)
+        # n_bins, len(P), len(S), max_run_count, search_window, (w_a, w_b, w_c)
+        testcases: List[Tuple[int, int, int, int, int, Tuple[float, float, float]]] = [
+            (1, 1, 1, 3, 3, (1.0, 1.0, 1.0)),
+            (2, 5, 5, 999, 3, (1.0, 1.0, 1.0)),
+            (12, 60, 50, 3, 1, (1.0, 1.0, 1.0)),
+            (12, 60, 80, 3, 10, (0.5, 1.0, 1.0)),
+            # sums split in NumPy's pairwise summation
+            (150, 80, 60, 2, 20, (1.0, 2.0, 0.5)),
+            (300, 40, 70, 5, 7, (2.0, 1.0, 1.0)),
+        ]
+        for n_bins, n_P, n_S, max_run_count, search_window, w in testcases:
+            S = rng.random((n_S, n_bins))
+            # the score played slower, with noise
+            P = S[(np.arange(n_P) * 0.8).astype(int) % n_S] + 0.1 * rng.random(
+                (n_P, n_bins)
+            )
+            for P_in in [P, np.round(P, 1)]:  # rounded for ties
+                args = (max_run_count, search_window, *w)
+                want = _follow(OLTW, P_in, S, *args)
+                got = _follow(OLTWNumba, P_in, S, *args)
+                self.assertEqual(want, got, (n_bins, n_P, n_S, args))
@@ -0,0 +1,16 @@
+from lib.dtw.shared import batch_cost, cost
+import unittest
+import numpy as np
+from hypothesis import given, settings, strategies as st
+
+
+class TestBatchCost(unittest.TestCase):
+    @given(st.integers(1, 50), st.integers(1, 20), st.integers(0, 2 ** 32 - 1))
+    @settings(max_examples=20)
+    def test_batch_cost_matches_cost(self, n_rows: int, n_bins: int, seed: int):
+        rng = np.random.default_rng(seed)
+        a = rng.random(n_bins)
+        B = rng.random((n_rows, n_bins))
+        want = [cost(a, b) for b in B]
+        got = batch_cost(a, B)
+        self.assertEqual(want, got.tolist())
@@ -0,0 +1,65 @@
+from lib.benchmark import (
+    BenchmarkResult,
+    BenchmarkResultsT,
+    compare_results,
+    get_missing,
+    get_regressions,
+    run_benchmark,
+)
+from typing import List, Tuple
+import unittest
+
+
+def _result(median_s: float, units: int) -> BenchmarkResult:
+    return {
+        "median_s": median_s,
+        "min_s": median_s,
+        "repeat": 1,
+        "units": units,
+        "units_per_s": units / median_s,
+    }
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_benchmark(self):
+        runs: List[int] = []
+
+        def run() -> int:
+            runs.append(1)
+            return 7
+
+        result = run_benchmark(run, 3)
+        self.assertEqual(4, len(runs))  # with the warm-up run
+        self.assertEqual(3, result["repeat"])
+        self.assertEqual(7, result["units"])
+        self.assertLessEqual(result["min_s"], result["median_s"])
+
+    def test_compare_results(self):
+        baseline: BenchmarkResultsT = {
+            "same": _result(1.0, 10),
+            "slower": _result(1.0, 10),
+            "faster": _result(1.0, 10),
+            "more units": _result(1.0, 10),
+            "removed": _result(1.0, 10),
+        }
+        results: BenchmarkResultsT = {
+            "same": _result(1.05, 10),
+            "slower": _result(1.5, 10),
+            "faster": _result(0.5, 10),
+            "more units": _result(2.0, 20),
+            "added": _result(1.0, 10),
+        }
+        want: List[Tuple[str, float]] = [
+            ("same", 1.05),
+            ("slower", 1.5),
+            ("faster", 0.5),
+            ("more units", 1.0),
+        ]
+        got = compare_results(baseline, results)
+        self.assertEqual([name for name, _ in want], [name for name, _ in got])
+        for (_, w), (name, g) in zip(want, got):
+            self.assertAlmostEqual(w, g, msg=name)
+        self.assertEqual(["slower"], [name for name, _ in get_regressions(got, 0.1)])
+        self.assertEqual([], get_regressions(got, 0.6))
+        self.assertEqual(["removed"], get_missing(baseline, results))
+        self.assertEqual([], get_missing(results, results))
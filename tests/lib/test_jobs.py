@@ -0,0 +1,48 @@
+from lib.jobs import get_max_jobs, parse_jobs_arg, run_jobs
+from typing import List, Tuple
+import functools
+import os
+import unittest
+
+
+def _square(x: int) -> int:
+    return x * x
+
+
+def _fail():
+    raise ValueError("failed")
+
+
+class TestJobs(unittest.TestCase):
+    def test_parse_jobs_arg(self):
+        testcases: List[Tuple[List[str], List[str], int]] = [
+            ([], [], 1),
+            (["bach10_follow"], ["bach10_follow"], 1),
+            (["bach10_follow", "--jobs", "4"], ["bach10_follow"], 4),
+            (["--jobs", "0", "bach10_follow"], ["bach10_follow"], 0),
+        ]
+        for argv, want_rest, want_jobs in testcases:
+            rest, jobs = parse_jobs_arg(argv)
+            self.assertEqual(want_rest, rest)
+            self.assertEqual(want_jobs, jobs)
+        with self.assertRaises(ValueError):
+            parse_jobs_arg(["--jobs"])
+
+    def test_get_max_jobs(self):
+        cpu_count = os.cpu_count() or 1
+        self.assertEqual(1, get_max_jobs(1))
+        self.assertEqual(cpu_count, get_max_jobs(0))
+        self.assertEqual(cpu_count, get_max_jobs(cpu_count + 1))
+
+    def test_run_jobs(self):
+        jobs = [functools.partial(_square, x) for x in range(5)]
+        want = [0, 1, 4, 9, 16]
+        for max_jobs in [1, 2, 5]:
+            self.assertEqual(want, run_jobs(jobs, max_jobs))
+
+    def test_run_jobs_failure(self):
+        jobs = [functools.partial(_square, 2), _fail]
+        with self.assertRaises(ValueError):
+            run_jobs(jobs, 1)
+        with self.assertRaises(RuntimeError):
+            run_jobs(jobs, 2)
@@ -0,0 +1,143 @@
+from lib.components.follower import Follower
+from lib.loadshedding import SheddingFeatureQueue, SheddingOutputQueue
+from lib.mputils import DequeQueue, consume_queue, write_list_to_queue
+from lib.tracing import LOAD_SHEDDING_TRACER
+from typing import Any, Deque, Dict, List, Optional
+from collections import deque
+import unittest
+import numpy as np
+import queue
+
+
+class TestLoadShedding(unittest.TestCase):
+    def test_no_backlog(self):
+        P_queue = DequeQueue()
+        shedding_queue = SheddingFeatureQueue(P_queue, 2)  # type: ignore
+        for k in range(3):
+            P_queue.put(np.full(2, float(k)))
+            got = shedding_queue.get()
+            self.assertIsNotNone(got)
+            np.testing.assert_array_equal(np.full(2, float(k)), got)  # type: ignore
+        P_queue.put(None)
+        self.assertIsNone(shedding_queue.get())
+        self.assertIsNone(shedding_queue.get())
+        self.assertEqual(3, shedding_queue.frames_received)
+        self.assertEqual(0, shedding_queue.frames_shed)
+        self.assertEqual([0, 1, 2], [shedding_queue.get_frame(i) for i in range(3)])
+
+    def test_shed(self):
+        P_queue = DequeQueue()
+        shedding_queue = SheddingFeatureQueue(P_queue, 2)  # type: ignore
+        # within the bound: one at a time
+        write_list_to_queue([np.full(2, 0.0), np.full(2, 1.0)], P_queue)  # type: ignore
+        got: List[Optional[np.ndarray]] = [shedding_queue.get() for _ in range(3)]
+        np.testing.assert_array_equal(np.full(2, 0.0), got[0])  # type: ignore
+        np.testing.assert_array_equal(np.full(2, 1.0), got[1])  # type: ignore
+        self.assertIsNone(got[2])
+
+        P_queue = DequeQueue()
+        shedding_queue = SheddingFeatureQueue(P_queue, 2)  # type: ignore
+        # beyond the bound: everything queued is averaged
+        write_list_to_queue([np.full(2, float(k)) for k in range(4)], P_queue)  # type: ignore
+        got = [shedding_queue.get() for _ in range(2)]
+        np.testing.assert_array_equal(np.full(2, 1.5), got[0])  # type: ignore
+        self.assertIsNone(got[1])
+        self.assertEqual(4, shedding_queue.frames_received)
+        self.assertEqual(3, shedding_queue.frames_shed)
+        self.assertEqual(1, shedding_queue.times_shed)
+        self.assertEqual(4, shedding_queue.max_backlog_seen)
+        self.assertEqual(3, shedding_queue.get_frame(0))
+
+    def test_output(self):
+        P_queue = DequeQueue()
+        shedding_queue = SheddingFeatureQueue(P_queue, 1)  # type: ignore
+        follower_output_queue = DequeQueue()
+        output_queue = SheddingOutputQueue(follower_output_queue, shedding_queue)  # type: ignore
+
+        output_queue.put((0, 0))  # before any frame
+        P_queue.put(np.zeros(2))
+        shedding_queue.get()  # frame 0
+        for _ in range(3):
+            P_queue.put(np.zeros(2))
+        shedding_queue.get()  # frames 1 to 3
+        output_queue.put((0, 1))
+        output_queue.put((1, 2))
+        output_queue.put(None)
+        self.assertEqual(
+            [(0, 0), (0, 1), (3, 2)], consume_queue(follower_output_queue)  # type: ignore
+        )
+
+    def test_follower_trace(self):
+        # frames arrive one at a time, except frames 2 to 5 that arrive at once
+        rng = np.random.default_rng(42)
+        S = rng.random((20, 4))
+        bursts: List[List[Optional[np.ndarray]]] = [
+            [S[0]],
+            [S[1]],
+            list(S[2:6]),
+            [S[6]],
+            [S[7]],
+            [None],
+        ]
+
+        class BurstQueue:
+            """
+            Features that arrive in bursts, the next one once everything is taken.
+            """
+
+            def __init__(self):
+                self.queued: Deque[Optional[np.ndarray]] = deque()
+
+            def get(self) -> Optional[np.ndarray]:
+                if len(self.queued) == 0:
+                    self.queued.extend(bursts.pop(0))
+                return self.queued.popleft()
+
+            def get_nowait(self) -> Optional[np.ndarray]:
+                if len(self.queued) == 0:
+                    raise queue.Empty
+                return self.queued.popleft()
+
+            def qsize(self) -> int:
+                return len(self.queued)
+
+        trace_queue = DequeQueue()
+        Follower(
+            "online",
+            "oltw",
+            3,
+            5,
+            DequeQueue(),  # type: ignore
+            BurstQueue(),  # type: ignore
+            S,
+            1.0,
+            1.0,
+            1.0,
+            trace_queue=trace_queue,
+            max_backlog=2,
+        ).start()
+
+        records: Dict[str, Any] = {}
+        while trace_queue.qsize() > 0:
+            name, events, _, counters = trace_queue.get()
+            records[name] = (events, counters)
+        events, _ = records["OLTW"]
+        # traced by performance frame: frame 2 is taken as the burst arrives, frames
+        # 3 to 5 are averaged into one, traced as frame 5
+        self.assertEqual(
+            [0, 1, 2, 5, 6, 7],
+            [seq for point, seq, _ in events if point == "follower_get"],
+        )
+        self.assertEqual(
+            {-1, 1, 2, 5, 6, 7},
+            set(seq for point, seq, _ in events if point == "follower_put"),
+        )
+        _, counters = records[LOAD_SHEDDING_TRACER]
+        want = {
+            "frames_received": 8,
+            "frames_shed": 2,
+            "times_shed": 1,
+            "max_backlog_seen": 3,
+            "max_backlog": 2,
+        }
+        self.assertEqual(want, counters)
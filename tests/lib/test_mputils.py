@@ -1,12 +1,19 @@
-from typing import List
+from typing import Any, List
 from lib.mputils import (
     AnyOptionalQueue,
+    DequeQueue,
+    SharedMemoryQueue,
     consume_queue,
+    create_queue,
+    create_worker,
     produce_queue,
     write_list_to_queue,
 )
+import queue
+import threading
 import unittest
 import multiprocessing as mp
+import numpy as np
 from hypothesis import given, settings, strategies as st
 
 
@@ -33,3 +40,67 @@ class TestMPUtils(unittest.TestCase):
         ll = consume_queue(q)
         producer_proc.join()
         self.assertEqual(l, ll)
+
+
+class TestSharedMemoryQueue(unittest.TestCase):
+    def test_shared_memory_queue(self):
+        rng = np.random.default_rng(42)
+        l: List[Any] = [
+            rng.random(16),
+            rng.random(16).astype(np.float32),
+            rng.random((2, 8)),
+            rng.random(1000),  # larger than a slot
+            "not an ndarray",
+            np.arange(4, dtype=np.int16),
+        ] + [rng.random(16) for _ in range(20)]
+
+        q = SharedMemoryQueue(16 * 8, 4)
+        try:
+            producer_proc = mp.Process(target=write_list_to_queue, args=(l, q))
+            producer_proc.start()
+            ll = consume_queue(q)
+            producer_proc.join()
+        finally:
+            q.unlink()
+
+        self.assertEqual(len(l), len(ll))
+        for x, xx in zip(l, ll):
+            if isinstance(x, np.ndarray):
+                self.assertEqual(x.dtype, xx.dtype)
+                np.testing.assert_array_equal(x, xx)
+            else:
+                self.assertEqual(x, xx)
+
+    def test_create_queue(self):
+        for transport in ["queue", "shm"]:
+            q = create_queue(transport, 8)
+            write_list_to_queue([np.ones(1), np.zeros(1)], q)
+            self.assertEqual([1.0, 0.0], [x[0] for x in consume_queue(q)])
+            if isinstance(q, SharedMemoryQueue):
+                q.unlink()
+
+
+class TestDequeQueue(unittest.TestCase):
+    @given(st.lists(st.integers()))
+    @settings(max_examples=20, deadline=None)
+    def test_threaded_queues(self, l: List[int]):
+        q = DequeQueue()
+        producer_thread = create_worker(lambda: write_list_to_queue(l, q), "thread")
+        self.assertIsInstance(producer_thread, threading.Thread)
+        producer_thread.start()
+        ll = consume_queue(q)
+        producer_thread.join()
+        self.assertEqual(l, ll)
+
+    def test_get_nowait(self):
+        q = DequeQueue()
+        with self.assertRaises(queue.Empty):
+            q.get_nowait()
+        q.put(1)
+        self.assertEqual(1, q.qsize())
+        self.assertEqual(1, q.get_nowait())
+        self.assertEqual(0, q.qsize())
+
+    def test_create_queue_thread_pipeline(self):
+        for transport in ["queue", "shm"]:
+            self.assertIsInstance(create_queue(transport, 8, "thread"), DequeQueue)
@@ -0,0 +1,102 @@
+from lib.args import Arguments
+from lib.components.audiopreprocessor import AudioPreprocessor
+from lib.mputils import consume_queue, create_queue
+from lib.runner import Runner
+from lib.scorefile import ScoreFile
+from lib.sharedtypes import NoteInfo
+from typing import List
+import numpy as np
+import os
+import soundfile as sf  # type: ignore
+import tempfile
+import unittest
+
+SAMPLE_RATE = 22050
+NOTE_LEN = 0.25  # s
+
+
+class TestRunner(unittest.TestCase):
+    def test_start_with_features_matches_start(self):
+        # a performance of tones, followed against the features of itself
+        midi_notes = [60, 64, 67, 72, 67, 64, 60, 62, 65, 69, 65, 62]
+        t = np.arange(int(NOTE_LEN * SAMPLE_RATE)) / SAMPLE_RATE
+        audio = np.concatenate(
+            [np.sin(2 * np.pi * 440.0 * 2 ** ((n - 69) / 12) * t) for n in midi_notes]
+        )
+        note_onsets = [
+            NoteInfo(n, k * NOTE_LEN * 1000) for k, n in enumerate(midi_notes)
+        ]
+        with tempfile.TemporaryDirectory() as d:
+            perf_wave_path = os.path.join(d, "perf.wav")
+            sf.write(perf_wave_path, audio.astype(np.float32), SAMPLE_RATE)
+
+            for mode in ["offline", "online"]:
+                score_path = os.path.join(d, f"score_{mode}.flippy")
+                ScoreFile(note_onsets, self.__get_features(perf_wave_path, mode)).save(
+                    score_path
+                )
+                outputs: List[List[str]] = []
+                for run in ["start", "start_with_features"]:
+                    output_path = os.path.join(d, f"{mode}_{run}.txt")
+                    args = Arguments().parse_args(
+                        [
+                            "--perf_wave_path",
+                            perf_wave_path,
+                            "--score_pickle_path",
+                            score_path,
+                            "--mode",
+                            mode,
+                            "--cqt",
+                            "librosa_pseudo",
+                            "--sample_rate",
+                            str(SAMPLE_RATE),
+                            "--search_window",
+                            "10",
+                            "--pipeline",
+                            "thread",
+                            "--backend_output",
+                            output_path,
+                        ]
+                    )
+                    args.sanitize()
+                    runner = Runner(args)
+                    if run == "start":
+                        runner.start()
+                    else:
+                        runner.start_with_features(*runner.extract_features())
+                    with open(output_path) as f:
+                        outputs.append(self.__without_det_times(f.read()))
+
+                self.assertTrue(len(outputs[0]) > 0, mode)
+                self.assertEqual(outputs[0], outputs[1], mode)
+
+    @staticmethod
+    def __get_features(wave_path: str, mode: str) -> np.ndarray:
+        features_queue = create_queue("queue", pipeline="thread")
+        AudioPreprocessor(
+            SAMPLE_RATE,
+            2048,
+            8192,
+            wave_path,
+            False,
+            0.0,
+            mode,  # type: ignore
+            "librosa_pseudo",
+            130.8,
+            4186.0,
+            features_queue,  # type: ignore
+            pipeline="thread",
+        ).start()
+        return np.array(consume_queue(features_queue))
+
+    @staticmethod
+    def __without_det_times(output: str) -> List[str]:
+        """
+        Lines of MIREX output without their detection times, which online depend on
+        how fast the run was.
+        """
+        res: List[str] = []
+        for line in output.splitlines():
+            est_time, _, note_start, midi_note_num = line.split()
+            res.append(f"{est_time} {note_start} {midi_note_num}")
+        return res
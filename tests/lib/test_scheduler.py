@@ -0,0 +1,61 @@
+from lib.scheduler import DeadlineScheduler
+from typing import List, Tuple
+import unittest
+
+
+class FakeClock:
+    """
+    Clock advancing by a fixed step each time it is read, and by the time slept.
+    """
+
+    def __init__(self, step: float):
+        self.t = 0.0
+        self.step = step
+
+    def __call__(self) -> float:
+        self.t += self.step
+        return self.t
+
+    def sleep(self, secs: float):
+        self.t += secs
+
+
+class TestDeadlineScheduler(unittest.TestCase):
+    def test_wait_until_not_started(self):
+        self.assertRaises(ValueError, DeadlineScheduler().wait_until, 1.0)
+
+    def test_overruns(self):
+        # name, offsets, want overruns
+        testcases: List[Tuple[str, List[float], int]] = [
+            ("All passed", [0.0, 0.5, 1.0], 3),
+            ("None passed", [10.0, 20.0], 0),
+            ("Some passed", [0.0, 10.0, 10.0, 20.0], 2),
+        ]
+        for name, offsets, want in testcases:
+            clock = FakeClock(2.0)
+            scheduler = DeadlineScheduler(clock=clock, sleep=clock.sleep)
+            scheduler.start()
+            for offset in offsets:
+                scheduler.wait_until(offset)
+            self.assertEqual(want, len(scheduler.overruns), name)
+            self.assertEqual(len(offsets) - want, len(scheduler.jitters), name)
+
+    def test_no_drift(self):
+        # slow work between waits must not push later deadlines back; the clock's
+        # step and the period are powers of 2, so that every time is exact
+        step = 2 ** -10
+        period = 2 ** -4
+        clock = FakeClock(step)
+        scheduler = DeadlineScheduler(busy_wait=0.0, clock=clock, sleep=clock.sleep)
+        scheduler.start()
+        start_time = clock.t
+        for k in range(1, 21):
+            if k % 5 == 0:
+                # slow work
+                clock.sleep(period / 2)
+            scheduler.wait_until(k * period)
+            # the deadline is slept until, then the clock is read twice
+            self.assertEqual(start_time + k * period + 2 * step, clock.t, k)
+        self.assertEqual([2 * step] * 20, scheduler.jitters)
+        self.assertEqual(0, len(scheduler.overruns))
+        self.assertIn("20 deadlines met", scheduler.stats())
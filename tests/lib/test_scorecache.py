@@ -0,0 +1,105 @@
+from lib.scorecache import ScoreCache
+from lib.scorefile import ScoreFile
+from lib.sharedtypes import ExtractedFeatureMatrix, NoteInfo
+from os import path
+from typing import Any, Dict, List, Tuple
+import os
+import tempfile
+import unittest
+import numpy as np
+
+
+def get_midi_path(name: str) -> str:
+    return path.join(
+        path.dirname(path.dirname(path.dirname(__file__))),
+        "data",
+        "sample_midis",
+        name,
+    )
+
+
+def get_key(midi_name: str, **overrides: Any) -> str:
+    params: Dict[str, Any] = {
+        "mode": "online",
+        "cqt": "nsgt",
+        "hop_len": 2048,
+        "frame_len": 8192,
+        "fmin": 130.8,
+        "fmax": 4186.0,
+        "sample_rate": 44100,
+    }
+    params.update(overrides)
+    return ScoreCache.key(get_midi_path(midi_name), **params)
+
+
+def get_score_file(n_frames: int) -> ScoreFile:
+    return ScoreFile(
+        [NoteInfo(60, 4.882802734375)],
+        ExtractedFeatureMatrix(
+            np.arange(n_frames * 4, dtype=np.float64).reshape(-1, 4)
+        ),
+    )
+
+
+class TestScoreCache(unittest.TestCase):
+    def test_key(self):
+        key = get_key("short_demo.mid")
+        self.assertEqual(key, get_key("short_demo.mid"))
+
+        # name, key that must differ from `key`
+        testcases: List[Tuple[str, str]] = [
+            ("MIDI", get_key("short_demo_chord.mid")),
+            ("mode", get_key("short_demo.mid", mode="offline")),
+            ("cqt", get_key("short_demo.mid", cqt="librosa")),
+            ("hop_len", get_key("short_demo.mid", hop_len=1024)),
+            ("frame_len", get_key("short_demo.mid", frame_len=4096)),
+            ("fmin", get_key("short_demo.mid", fmin=65.4)),
+            ("fmax", get_key("short_demo.mid", fmax=2093.0)),
+            ("sample_rate", get_key("short_demo.mid", sample_rate=22050)),
+        ]
+        for name, other_key in testcases:
+            self.assertNotEqual(key, other_key, name)
+
+    def test_get_put(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ScoreCache(cache_dir, 1024 * 1024)
+            key = get_key("short_demo.mid")
+            self.assertIsNone(cache.get(key))
+
+            want = get_score_file(10)
+            self.assertEqual(cache.path(key), cache.put(key, want))
+            got = cache.get(key)
+            self.assertIsNotNone(got)
+            self.assertEqual(want.note_onsets, got.note_onsets)
+            np.testing.assert_array_equal(want.S, got.S)
+
+            # an unreadable entry is a miss
+            with open(cache.path(key), "wb") as f:
+                f.write(b"garbage")
+            self.assertIsNone(cache.get(key))
+            self.assertFalse(path.exists(cache.path(key)))
+
+    def test_evict(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            entry_size = os.path.getsize(
+                ScoreCache(cache_dir, 0).put("size", get_score_file(100))
+            )
+            os.remove(path.join(cache_dir, "size.score"))
+
+            # room for two entries
+            cache = ScoreCache(cache_dir, 2 * entry_size)
+            for t, key in enumerate(["a", "b"]):
+                cache.put(key, get_score_file(100))
+                os.utime(cache.path(key), (t, t))
+            # reading "a" makes "b" the least recently used
+            self.assertIsNotNone(cache.get("a"))
+            cache.put("c", get_score_file(100))
+
+            self.assertTrue(path.exists(cache.path("a")))
+            self.assertFalse(path.exists(cache.path("b")))
+            self.assertTrue(path.exists(cache.path("c")))
+
+            # the entry just put is kept even if it alone exceeds the limit
+            cache = ScoreCache(cache_dir, 0)
+            cache.put("d", get_score_file(100))
+            self.assertEqual(["d.score"], os.listdir(cache_dir))
@@ -0,0 +1,68 @@
+from lib.scorefile import ScoreFile, load_score
+from lib.scorepickle import ScorePickle
+from lib.sharedtypes import ExtractedFeatureMatrix, NoteInfo
+from os import path
+from typing import Any, Dict, List, Tuple
+import tempfile
+import unittest
+import numpy as np
+
+
+class TestScoreFile(unittest.TestCase):
+    def test_save_load(self):
+        rng = np.random.default_rng(42)
+        # name, note_onsets, S, meta
+        testcases: List[Tuple[str, List[NoteInfo], np.ndarray, Dict[str, Any]]] = [
+            (
+                "Simple case",
+                [NoteInfo(60, 4.882802734375), NoteInfo(62, 514.6474082031249)],
+                rng.random((10, 84)),
+                {"cqt": "nsgt", "hop_len": 2048},
+            ),
+            ("No notes", [], rng.random((3, 2)), {}),
+            ("No frames", [NoteInfo(60, 0.0)], np.empty((0, 84)), {}),
+            (
+                "Non-contiguous S",
+                [NoteInfo(127, 1e9)],
+                rng.random((84, 20)).T,
+                {"long": "x" * 1000},
+            ),
+        ]
+
+        for name, note_onsets, S, meta in testcases:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                file_path = path.join(tmpdir, "score.score")
+                ScoreFile(note_onsets, ExtractedFeatureMatrix(S), meta).save(file_path)
+
+                got = load_score(file_path)
+                self.assertIsInstance(got, ScoreFile, name)
+                self.assertEqual(note_onsets, got.note_onsets, name)
+                self.assertEqual(meta, got.meta, name)
+                self.assertTrue(got.S.flags["C_CONTIGUOUS"], name)
+                if len(S) > 0:
+                    self.assertFalse(got.S.flags["WRITEABLE"], name)  # memory-mapped
+                np.testing.assert_array_equal(S, got.S, name)
+                del got  # release the memory map before the file is removed
+
+    def test_load_legacy_pickle(self):
+        note_onsets = [NoteInfo(60, 4.882802734375)]
+        S = [np.arange(4, dtype=np.float64), np.ones(4)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = path.join(tmpdir, "score.pickle")
+            ScorePickle(note_onsets, S).save(file_path)
+
+            got = load_score(file_path)
+            self.assertIsInstance(got, ScorePickle)
+            self.assertEqual(note_onsets, got.note_onsets)
+            np.testing.assert_array_equal(np.array(S), got.S)
+
+    def test_load_unsupported_version(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = path.join(tmpdir, "score.score")
+            ScoreFile([], ExtractedFeatureMatrix(np.ones((1, 1)))).save(file_path)
+            with open(file_path, "r+b") as f:
+                f.seek(8)
+                f.write((999).to_bytes(4, "little"))
+            with self.assertRaises(ValueError) as context:
+                ScoreFile.load(file_path)
+            self.assertTrue("Unsupported score file version" in str(context.exception))
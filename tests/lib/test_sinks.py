@@ -0,0 +1,61 @@
+from lib.sinks import FileSink, SinkWriter, UDPSink, parse_udp_output
+from typing import List, Optional, Tuple
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+
+class TestSinks(unittest.TestCase):
+    def test_parse_udp_output(self):
+        testcases: List[Tuple[str, Optional[Tuple[str, int]]]] = [
+            ("stdout", None),
+            ("out.txt", None),
+            ("udp:", None),
+            ("udp:localhost:1234", ("localhost", 1234)),
+            ("udp:127.0.0.1:80", ("127.0.0.1", 80)),
+        ]
+        for output, want in testcases:
+            self.assertEqual(want, parse_udp_output(output), output)
+        self.assertRaises(ValueError, parse_udp_output, "udp:localhost")
+
+    def test_file_sink_writer(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "out.txt")
+            with open(path, "w") as f:
+                f.write("old\n")
+            writer = SinkWriter(FileSink(path), 10.0)
+            writer.start()
+            for x in ["a", "b", "c"]:
+                writer.write(x)
+            writer.close()
+            with open(path) as f:
+                self.assertEqual("a\nb\nc\n", f.read())
+
+    def test_file_sink_writer_flush_interval(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "out.txt")
+            writer = SinkWriter(FileSink(path), 0.05)
+            writer.start()
+            writer.write("a")
+            time.sleep(0.5)
+            # flushed without closing
+            with open(path) as f:
+                self.assertEqual("a\n", f.read())
+            writer.close()
+
+    def test_udp_sink_batches(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(5.0)
+        _, port = receiver.getsockname()
+
+        sink = UDPSink("127.0.0.1", port, 2)
+        for x in ["a", "b", "c"]:
+            sink.write(x)
+        self.assertEqual(b"a\nb", receiver.recv(1024))
+        sink.close()  # flushes the partial batch
+        self.assertEqual(b"c", receiver.recv(1024))
+        self.assertEqual(0, sink.dropped)
+        receiver.close()
@@ -0,0 +1,107 @@
+from lib.mputils import DequeQueue
+from lib.tracing import LOAD_SHEDDING_TRACER, ONLINE_TRACERS, TraceCollector, Tracer
+from typing import Dict
+import unittest
+
+
+class TestTracing(unittest.TestCase):
+    def test_tracer_disabled(self):
+        tracer = Tracer("Slicer", None)
+        tracer.record("slicer_put", 0)
+        tracer.record_depth("slice_queue", DequeQueue())
+        tracer.record_counter("frames", 1)
+        tracer.flush()
+        self.assertEqual([], tracer.events)
+        self.assertEqual([], tracer.depths)
+        self.assertEqual({}, tracer.counters)
+
+    def test_collector(self):
+        q = DequeQueue()
+        collector = TraceCollector(q, ONLINE_TRACERS)
+        collector.start()
+        # two frames, the follower outputs before frame 0, twice after frame 0
+        # and once after frame 1
+        q.put(("Slicer", [("slicer_put", 0, 1.0), ("slicer_put", 1, 2.0)], [], {}))
+        q.put(
+            (
+                "FeatureExtractor",
+                [
+                    ("extractor_get", 0, 1.1),
+                    ("extractor_put", 0, 1.2),
+                    ("extractor_get", 1, 2.1),
+                    ("extractor_put", 1, 2.2),
+                ],
+                [("slice_queue", 1.1, 0), ("slice_queue", 2.1, 1)],
+                {},
+            )
+        )
+        q.put(
+            (
+                "OLTW",
+                [
+                    ("follower_put", -1, 0.5),
+                    ("follower_get", 0, 1.3),
+                    ("follower_put", 0, 1.4),
+                    ("follower_put", 0, 1.45),
+                    ("follower_get", 1, 2.3),
+                    ("follower_put", 1, 2.4),
+                ],
+                [],
+                {},
+            )
+        )
+        q.put(
+            (
+                "Backend",
+                [
+                    ("backend_get", 0, 0.6),
+                    ("backend_put", 0, 0.7),
+                    ("backend_get", 1, 1.5),
+                    ("backend_get", 2, 1.6),
+                    ("backend_put", 2, 1.7),
+                    ("backend_get", 3, 2.5),
+                ],
+                [],
+                {},
+            )
+        )
+        collector.join(1.0)
+
+        want: Dict[str, Dict[int, float]] = {
+            "slicer_put": {0: 1.0, 1: 2.0},
+            "extractor_get": {0: 1.1, 1: 2.1},
+            "extractor_put": {0: 1.2, 1: 2.2},
+            "follower_get": {0: 1.3, 1: 2.3},
+            "follower_put": {0: 1.4, 1: 2.4},
+            "backend_get": {0: 1.5, 1: 2.5},
+            "backend_put": {0: 1.7},
+        }
+        self.assertEqual(want, collector.frame_times())
+
+        report = collector.report(0.5)
+        self.assertEqual(2, report["frames"])
+        self.assertEqual(2, report["latency_ms"]["extract"]["count"])
+        self.assertAlmostEqual(100.0, report["latency_ms"]["extract"]["max"])
+        self.assertEqual(1, report["latency_ms"]["end_to_end"]["count"])
+        self.assertAlmostEqual(700.0, report["latency_ms"]["end_to_end"]["p50"])
+        self.assertEqual(1, report["latency_ms"]["backend"]["count"])
+        self.assertAlmostEqual(200.0, report["latency_ms"]["backend"]["p50"])
+        self.assertEqual(
+            [(0.6, 0), (1.6, 1)],
+            [(round(t, 6), d) for t, d in report["queue_depth"]["slice_queue"]],
+        )
+
+    def test_collector_counters(self):
+        q = DequeQueue()
+        collector = TraceCollector(q, ONLINE_TRACERS + (LOAD_SHEDDING_TRACER,))
+        collector.start()
+        for name in ONLINE_TRACERS:
+            Tracer(name, q).flush()
+        tracer = Tracer(LOAD_SHEDDING_TRACER, q)
+        tracer.record_counter("frames_received", 8)
+        tracer.record_counter("frames_shed", 2)
+        tracer.flush()
+        collector.join(1.0)
+
+        want = {LOAD_SHEDDING_TRACER: {"frames_received": 8, "frames_shed": 2}}
+        self.assertEqual(want, collector.report(0.0)["counters"])
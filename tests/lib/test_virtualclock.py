@@ -0,0 +1,67 @@
+from lib.virtualclock import VirtualClock, get_slice_release_time
+from typing import List, Tuple
+import unittest
+
+
+class FakeClock:
+    """
+    Clock returning preset times.
+    """
+
+    def __init__(self, times: List[float]):
+        self.times = times
+
+    def __call__(self) -> float:
+        return self.times.pop(0)
+
+
+class TestVirtualClock(unittest.TestCase):
+    def test_get_slice_release_time(self):
+        # k, hop_len, frame_len, sample_rate, want
+        testcases: List[Tuple[int, int, int, int, float]] = [
+            (0, 2, 4, 2, 2.0),
+            (1, 2, 4, 2, 3.0),
+            (5, 2, 4, 2, 7.0),
+            (3, 1024, 4096, 1024, 7.0),
+        ]
+        for k, hop_len, frame_len, sample_rate, want in testcases:
+            self.assertEqual(
+                want, get_slice_release_time(k, hop_len, frame_len, sample_rate)
+            )
+
+    def test_tick_not_started(self):
+        self.assertRaises(ValueError, VirtualClock(2, 4, 2).tick, 0)
+
+    def test_tick(self):
+        # slices released at 2.0, 3.0, 4.0... (s)
+        # name, real times (s) at which each p is ticked (starting from 10.0), want
+        testcases: List[Tuple[str, List[Tuple[int, float]], List[float]]] = [
+            (
+                "Faster than real time",
+                [(0, 10.1), (1, 10.2), (2, 10.3)],
+                [2.1, 3.1, 4.1],
+            ),
+            (
+                "Slower than real time",
+                [(0, 11.5), (1, 13.0), (2, 14.5)],
+                [3.5, 5.0, 6.5],
+            ),
+            (
+                "Catching up",
+                [(0, 12.5), (1, 12.6), (2, 12.7), (3, 12.8)],
+                [4.5, 4.6, 4.7, 5.1],
+            ),
+            (
+                "Several outputs per slice",
+                [(0, 10.1), (0, 10.2), (1, 10.3), (1, 10.4)],
+                [2.1, 2.2, 3.1, 3.2],
+            ),
+        ]
+        for name, ticks, want in testcases:
+            clock = VirtualClock(
+                2, 4, 2, FakeClock([real_time for _, real_time in ticks])
+            )
+            clock.start(10.0)
+            got = [clock.tick(p) for p, _ in ticks]
+            for w, g in zip(want, got):
+                self.assertAlmostEqual(w, g, msg=name)